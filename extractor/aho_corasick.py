@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Aho-Corasick 多模式匹配自动机
+一次线性扫描即可找出文本中所有已知关键词的出现位置
+
+特点:
+- 构建一次，匹配耗时只与文本长度和命中数有关，与关键词数量无关
+- 支持中英文等任意 Unicode 字符
+- 如果安装了 pyahocorasick 则使用其 C 实现，否则使用纯 Python 实现
+"""
+
+from typing import Any, Iterable, Iterator, List, Dict, Tuple
+
+# 尝试导入 pyahocorasick（可选加速）
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick 自动机 - 用法: add() 若干关键词 -> build() -> iter()"""
+
+    def __init__(self, items: Iterable[Tuple[str, Any]] = None):
+        """
+        初始化自动机
+
+        Args:
+            items: 可选的 (关键词, 附带值) 序列，传入后会自动 build()
+        """
+        self._size = 0
+        self._built = False
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+        else:
+            # 纯 Python 实现：节点用下标表示，0 为根节点
+            self._goto: List[Dict[str, int]] = [{}]
+            self._fail: List[int] = [0]
+            self._output: List[int] = [-1]  # 节点对应的关键词下标，-1 表示非终止节点
+            self._dict_link: List[int] = [-1]  # 失配链上下一个终止节点
+            self._keys: List[str] = []
+            self._values: List[Any] = []
+
+        if items is not None:
+            for key, value in items:
+                self.add(key, value)
+            self.build()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        查询关键词对应的附带值
+
+        Args:
+            key: 关键词
+            default: 关键词不存在时的返回值
+
+        Returns:
+            附带值或 default
+        """
+        if AHOCORASICK_AVAILABLE:
+            entry = self._automaton.get(key, None)
+            return default if entry is None else entry[1]
+
+        node = 0
+        for ch in key:
+            node = self._goto[node].get(ch)
+            if node is None:
+                return default
+        index = self._output[node]
+        return default if index == -1 else self._values[index]
+
+    def add(self, key: str, value: Any = None):
+        """
+        添加关键词（重复添加时后者覆盖前者的值）
+
+        Args:
+            key: 关键词
+            value: 命中时返回的附带值
+        """
+        if not key:
+            return
+
+        self._built = False
+
+        if AHOCORASICK_AVAILABLE:
+            if key not in self._automaton:
+                self._size += 1
+            self._automaton.add_word(key, (len(key), value))
+            return
+
+        node = 0
+        for ch in key:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+                self._dict_link.append(-1)
+            node = next_node
+
+        if self._output[node] == -1:
+            self._output[node] = len(self._keys)
+            self._keys.append(key)
+            self._values.append(value)
+            self._size += 1
+        else:
+            self._values[self._output[node]] = value
+
+    def build(self):
+        """构建失配链接，之后才能进行匹配"""
+        if AHOCORASICK_AVAILABLE:
+            if self._size:
+                self._automaton.make_automaton()
+            self._built = True
+            return
+
+        # BFS 计算 fail 与 dict_link
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+            self._dict_link[node] = -1
+
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                if fail == child:
+                    fail = 0
+
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._output[fail] != -1 else self._dict_link[fail]
+
+        self._built = True
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        扫描文本，按结束位置顺序返回所有命中（包括重叠命中）
+
+        Args:
+            text: 要扫描的文本
+
+        Yields:
+            (start, end, value)，其中 text[start:end] 为命中的关键词
+        """
+        if not self._size or not text:
+            return
+
+        if not self._built:
+            self.build()
+
+        if AHOCORASICK_AVAILABLE:
+            for end_index, (key_length, value) in self._automaton.iter(text):
+                yield end_index + 1 - key_length, end_index + 1, value
+            return
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_link = self._dict_link
+        keys = self._keys
+        values = self._values
+
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            node = state if output[state] != -1 else dict_link[state]
+            while node != -1:
+                index = output[node]
+                yield i + 1 - len(keys[index]), i + 1, values[index]
+                node = dict_link[node]
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 模型变体基准测试
+用不同的模型 / 推理后端运行 RealtimeBERTAnalyzer（逐条实时分析）和 BERTExtractor（离线批量提取），
+回放 data/ 中的推文，统计模型加载耗时、单条推文延迟（p50 / p95 / p99）、吞吐、峰值内存，
+以及与 extractor/output/*.txt 参考列表的一致度和召回率，汇总成一张表
+
+参考列表:
+- 一致度: 与同一推文文件的 *_bert.txt（当前生产模型的离线结果）的 Jaccard 相似度
+- 召回率: 至少被 --consensus 个参考列表（regex / rule / tfidf / rake / spacy / bert）共同提取到的代币中，
+  变体提取到的比例
+
+每个变体在单独的子进程（spawn）中运行，峰值内存互不影响
+
+用法:
+    python benchmark_ner_models.py                                          # dslim/bert-base-NER 的 pytorch / onnx
+    python benchmark_ner_models.py --variants dslim/distilbert-NER@onnx,dslim/bert-base-NER
+    python benchmark_ner_models.py --extractors realtime --limit 200        # 只测实时分析器，前 200 条
+    python benchmark_ner_models.py --json results.json                      # 同时保存 JSON 结果
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+from utils import load_tweets
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TWEET_GLOB = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'user_tweets_*.json')
+DEFAULT_REFERENCE_DIR = os.path.join(CURRENT_DIR, 'output')
+DEFAULT_VARIANTS = 'dslim/bert-base-NER@pytorch,dslim/bert-base-NER@onnx'
+EXTRACTORS = ('realtime', 'offline')
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """已排序列表的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round((max_rss if sys.platform == 'darwin' else max_rss * 1024) / 1024 / 1024, 1)
+
+
+def parse_variant(variant: str) -> Tuple[str, str]:
+    """
+    解析 "模型名@后端"（后端省略时为 pytorch）
+
+    Returns:
+        (模型名, 后端)
+    """
+    model_name, _, backend = variant.strip().partition('@')
+    return model_name, backend or 'pytorch'
+
+
+def load_references(reference_dir: str, tweet_file: str) -> Dict[str, List[str]]:
+    """
+    读取某个推文文件对应的参考列表
+
+    Args:
+        reference_dir: 参考列表目录
+        tweet_file: 推文文件路径
+
+    Returns:
+        方法名（regex / bert ...）-> 代币列表
+    """
+    stem = os.path.splitext(os.path.basename(tweet_file))[0]
+    references = {}
+    for path in sorted(glob.glob(os.path.join(reference_dir, f'{stem}_*.txt'))):
+        method = os.path.splitext(os.path.basename(path))[0][len(stem) + 1:]
+        with open(path, 'r', encoding='utf-8') as f:
+            references[method] = [line.split('\t')[0].strip() for line in f if line.strip()]
+    return references
+
+
+def score_against_references(tokens: Set[str], references: Dict[str, List[str]], consensus: int) -> Dict:
+    """
+    计算与参考列表的一致度和召回率
+
+    Args:
+        tokens: 变体提取到的代币
+        references: 方法名 -> 代币列表
+        consensus: 至少被几个参考列表提取到才算作召回目标
+
+    Returns:
+        {agreement, recall, consensus_tokens}
+    """
+    tokens = {token.upper() for token in tokens}
+
+    bert_reference = {token.upper() for token in references.get('bert', [])}
+    union = tokens | bert_reference
+    agreement = len(tokens & bert_reference) / len(union) if union else None
+
+    votes: Dict[str, int] = {}
+    for reference in references.values():
+        for token in {token.upper() for token in reference}:
+            votes[token] = votes.get(token, 0) + 1
+    targets = {token for token, count in votes.items() if count >= consensus}
+    recall = len(tokens & targets) / len(targets) if targets else None
+
+    return {'agreement': agreement, 'recall': recall, 'consensus_tokens': len(targets)}
+
+
+def run_variant(model_name: str, backend: str, extractor: str, tweet_files: List[str], limit: int,
+                reference_dir: str, consensus: int) -> Dict:
+    """
+    在当前进程中运行一个变体（由子进程调用）
+
+    Returns:
+        结果字典
+    """
+    quiet = contextlib.redirect_stdout(io.StringIO())  # 分析器 / 提取器逐条打印的调试输出
+
+    start_time = time.perf_counter()
+    with quiet:
+        if extractor == 'realtime':
+            from realtime_bert_analyzer import RealtimeBERTAnalyzer
+            model = RealtimeBERTAnalyzer(use_gpu=False, ner_batch_size=1, ner_backend=backend, ner_model=model_name)
+        else:
+            from bert_extractor import BERTExtractor
+            model = BERTExtractor(use_gpu=False, ner_backend=backend, ner_model=model_name)
+    load_seconds = time.perf_counter() - start_time
+
+    if model.ner_pipeline is None:
+        return {'error': 'model failed to load (is transformers installed?)'}
+
+    latencies = []
+    total_seconds = 0.0
+    tweet_count = 0
+    agreements, recalls = [], []
+
+    for tweet_file in tweet_files:
+        tweets = load_tweets(tweet_file)
+        tweets = tweets[:limit] if limit else tweets
+
+        with quiet:
+            if extractor == 'realtime':
+                from tweet_document import TweetDocument
+                tokens = set()
+                file_start = time.perf_counter()
+                for tweet in tweets:
+                    document = TweetDocument(tweet, model.keyword_scorer)
+                    tweet_start = time.perf_counter()
+                    results = model.extract_tokens(document.combined_text, tweet, document)
+                    latencies.append(time.perf_counter() - tweet_start)
+                    tokens.update(result['symbol'] for result in results)
+                total_seconds += time.perf_counter() - file_start
+            else:
+                from tweet_document import build_combined_text
+                for tweet in tweets:
+                    text = build_combined_text(tweet.get('text', ''), tweet)
+                    tweet_start = time.perf_counter()
+                    model.extract_entities_with_bert(text)
+                    latencies.append(time.perf_counter() - tweet_start)
+                file_start = time.perf_counter()
+                from bert_extractor import OFFLINE_BATCH_SIZE
+                tokens = {token for token, _ in model.extract_from_tweets(tweets, top_n=100,
+                                                                          batch_size=OFFLINE_BATCH_SIZE)}
+                total_seconds += time.perf_counter() - file_start
+
+        tweet_count += len(tweets)
+        references = load_references(reference_dir, tweet_file)
+        if references:
+            scores = score_against_references(tokens, references, consensus)
+            if scores['agreement'] is not None:
+                agreements.append(scores['agreement'])
+            if scores['recall'] is not None:
+                recalls.append(scores['recall'])
+
+    latencies.sort()
+    return {
+        'load_seconds': round(load_seconds, 2),
+        'tweets': tweet_count,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'tweets_per_second': round(tweet_count / total_seconds, 1) if total_seconds else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'agreement': round(sum(agreements) / len(agreements), 3) if agreements else None,
+        'recall': round(sum(recalls) / len(recalls), 3) if recalls else None,
+    }
+
+
+def _variant_process(result_queue, *args):
+    try:
+        result_queue.put(run_variant(*args))
+    except Exception as e:
+        result_queue.put({'error': f'{type(e).__name__}: {e}'})
+
+
+def run_isolated(*args) -> Dict:
+    """在新的子进程中运行一个变体（spawn，不继承父进程的内存）"""
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=_variant_process, args=(result_queue,) + args)
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def print_results(results: List[Dict]):
+    """以表格形式打印结果"""
+    columns = [
+        ('variant', 'Variant'), ('extractor', 'Extractor'), ('load_seconds', 'Load(s)'),
+        ('p50_ms', 'p50(ms)'), ('p95_ms', 'p95(ms)'), ('p99_ms', 'p99(ms)'),
+        ('tweets_per_second', 'Tweets/s'), ('peak_rss_mb', 'PeakRSS(MB)'),
+        ('agreement', 'Agreement'), ('recall', 'Recall'),
+    ]
+    rows = [[str(result.get(key, '') if result.get(key) is not None else '-') for key, _ in columns]
+            for result in results]
+    widths = [max(len(title), *(len(row[i]) for row in rows)) for i, (_, title) in enumerate(columns)]
+
+    print("\n" + "=" * 70)
+    print("NER Model Variant Benchmark")
+    print("=" * 70)
+    print('  '.join(title.rjust(width) for (_, title), width in zip(columns, widths)))
+    for result, row in zip(results, rows):
+        if 'error' in result:
+            print(f"{result['variant']} / {result['extractor']}: {result['error']}")
+        else:
+            print('  '.join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NER model variant latency / recall benchmark')
+    parser.add_argument('--variants', default=DEFAULT_VARIANTS,
+                        help='逗号分隔的 "模型名@后端"（后端为 pytorch / onnx，默认 pytorch）')
+    parser.add_argument('--extractors', default=','.join(EXTRACTORS),
+                        help='逗号分隔: realtime（RealtimeBERTAnalyzer）/ offline（BERTExtractor）')
+    parser.add_argument('--tweets', default=DEFAULT_TWEET_GLOB, help='推文文件的 glob（默认 data/user_tweets_*.json）')
+    parser.add_argument('--references', default=DEFAULT_REFERENCE_DIR, help='参考列表目录（默认 extractor/output）')
+    parser.add_argument('--consensus', type=int, default=2, help='召回目标至少出现在几个参考列表中（默认 2）')
+    parser.add_argument('--limit', type=int, default=None, help='每个推文文件最多回放多少条')
+    parser.add_argument('--json', help='把结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    tweet_files = sorted(glob.glob(args.tweets))
+    if not tweet_files:
+        print(f"[Benchmark] No tweets found for {args.tweets}")
+        return
+
+    extractors = [e.strip() for e in args.extractors.split(',') if e.strip()]
+    unknown = set(extractors) - set(EXTRACTORS)
+    if unknown:
+        parser.error(f"unknown extractors: {', '.join(sorted(unknown))}")
+
+    results = []
+    for variant in [v for v in args.variants.split(',') if v.strip()]:
+        model_name, backend = parse_variant(variant)
+        for extractor in extractors:
+            print(f"[Benchmark] {model_name} ({backend}) / {extractor}...")
+            result = run_isolated(model_name, backend, extractor, tweet_files, args.limit,
+                                  args.references, args.consensus)
+            result.update({'variant': f'{model_name}@{backend}', 'extractor': extractor})
+            results.append(result)
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'tweet_files': tweet_files, 'results': results}, f, indent=2)
+        print(f"\n[Benchmark] Results saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
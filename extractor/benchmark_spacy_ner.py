@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+spaCy NER 批处理基准测试
+对比逐条调用完整管线（tagger / parser / lemmatizer 全部启用）和 SpacyNERExtractor
+（只加载 NER 需要的组件，nlp.pipe 批处理）在 data/ 推文上的吞吐，并检查两者提取的实体完全一致
+
+用法:
+    python benchmark_spacy_ner.py                              # batch_size 256，单进程
+    python benchmark_spacy_ner.py --batch-sizes 64,256,1000    # 多个批大小
+    python benchmark_spacy_ner.py --n-process 4                # nlp.pipe 使用 4 个进程
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import time
+from typing import List
+
+from spacy_ner_extractor import SPACY_AVAILABLE, SpacyNERExtractor
+from utils import load_tweets
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TWEET_GLOB = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'user_tweets_*.json')
+
+
+def per_tweet_entities(nlp, extractor: SpacyNERExtractor, texts: List[str]) -> List[List]:
+    """逐条调用完整管线（改动前的做法）"""
+    return [extractor._doc_entities(nlp(text)) for text in texts]
+
+
+def reference_top_tokens(extractor: SpacyNERExtractor, tweets: List[dict], reference: List[List],
+                         top_n: int = 100) -> List:
+    """
+    用完整管线逐条得到的实体走 extract_from_tweets 的汇总，得到改动前的 Top N
+
+    Args:
+        extractor: SpacyNERExtractor 实例（只借用它的汇总和打分）
+        tweets: 推文列表
+        reference: per_tweet_entities 的结果，与 tweets 一一对应
+        top_n: 提取前N个实体
+
+    Returns:
+        [(token, timestamp), ...]
+    """
+    extractor.iter_entities_with_spacy = lambda texts: iter(reference)  # 实例属性，遮住 nlp.pipe 路径
+    try:
+        return extractor.extract_from_tweets(tweets, top_n=top_n)
+    finally:
+        del extractor.iter_entities_with_spacy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='spaCy NER per-tweet vs nlp.pipe throughput')
+    parser.add_argument('--tweets', default=DEFAULT_TWEET_GLOB, help='推文文件的 glob（默认 data/user_tweets_*.json）')
+    parser.add_argument('--model', default='en_core_web_sm', help='spaCy 模型名称')
+    parser.add_argument('--batch-sizes', default='256', help='逗号分隔的 nlp.pipe 批大小（默认 256）')
+    parser.add_argument('--n-process', type=int, default=1, help='nlp.pipe 的进程数（默认 1）')
+    args = parser.parse_args()
+
+    if not SPACY_AVAILABLE:
+        print("[Benchmark] spaCy not installed: pip install spacy && python -m spacy download en_core_web_sm")
+        return
+
+    tweet_files = sorted(glob.glob(args.tweets))
+    tweets = [tweet for path in tweet_files for tweet in load_tweets(path)]
+    if not tweets:
+        print(f"[Benchmark] No tweets found for {args.tweets}")
+        return
+    texts = [tweet.get('text', '') for tweet in tweets]
+    print(f"[Benchmark] {len(texts)} tweets from {len(tweet_files)} files")
+
+    import spacy
+    full_nlp = spacy.load(args.model)
+    with contextlib.redirect_stdout(io.StringIO()):
+        extractor = SpacyNERExtractor(args.model)
+    print(f"[Benchmark] Full pipeline: {', '.join(full_nlp.pipe_names)}")
+    print(f"[Benchmark] NER pipeline:  {', '.join(extractor.nlp.pipe_names)}")
+
+    per_tweet_entities(full_nlp, extractor, texts[:20])  # 预热
+    start = time.perf_counter()
+    reference = per_tweet_entities(full_nlp, extractor, texts)
+    baseline_seconds = time.perf_counter() - start
+    reference_top = reference_top_tokens(extractor, tweets, reference, top_n=100)
+
+    rows = [('per-tweet, full pipeline', baseline_seconds, True, True)]
+    for batch_size in [int(b) for b in args.batch_sizes.split(',') if b.strip()]:
+        extractor.batch_size = batch_size
+        extractor.n_process = args.n_process
+        start = time.perf_counter()
+        entities = list(extractor.iter_entities_with_spacy(texts))
+        seconds = time.perf_counter() - start
+        rows.append((f'pipe batch={batch_size} n_process={args.n_process}', seconds,
+                     entities == reference, extractor.extract_from_tweets(tweets, top_n=100) == reference_top))
+
+    print("\n" + "=" * 70)
+    print("spaCy NER Throughput")
+    print("=" * 70)
+    print(f"{'Mode':<36}{'Seconds':>9}{'Tweets/s':>10}{'Speedup':>9}  Identical")
+    for mode, seconds, same_entities, same_top in rows:
+        identical = 'yes' if same_entities and same_top else 'NO'
+        print(f"{mode:<36}{seconds:>9.2f}{len(texts) / seconds:>10.1f}{baseline_seconds / seconds:>8.1f}x  {identical}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
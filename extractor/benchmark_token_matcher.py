@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RedisTokenMatcher 规模基准测试
+生成不同规模的 token 注册表（含中文），回放 data/ 中的推文，
+统计全量刷新耗时、内存占用和单条推文匹配延迟（p50 / p99）
+
+用法:
+    python benchmark_token_matcher.py                       # fakeredis，1k / 10k / 100k / 1M
+    python benchmark_token_matcher.py --sizes 1000,10000    # 指定规模
+    python benchmark_token_matcher.py --backend redis-server --port 6399   # 启动本地 redis-server
+    python benchmark_token_matcher.py --json results.json   # 同时保存 JSON 结果
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import redis
+
+from redis_token_matcher import RedisTokenMatcher, iter_archived_texts
+
+# 尝试导入 fakeredis（可选，未安装时使用 --backend redis-server）
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_TWEET_GLOB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '*.json')
+
+SET_KEY = 'nlpmeme:tokens:all'
+KEY_PREFIX = 'nlpmeme:token:'
+
+# 生成 token 名称用的词表
+NAME_WORDS = ['Moon', 'Pepe', 'Inu', 'Doge', 'Cat', 'Frog', 'Based', 'Baby', 'Giga', 'Chad', 'Sol',
+              'Justice', 'For', 'King', 'Queen', 'Rocket', 'Alpha', 'Meme', 'Coin', 'AI', 'Trump',
+              'Elon', 'Shiba', 'Wojak', 'Bonk', 'Fund', 'Dao', 'Protocol', 'Finance', 'Labs']
+
+CASHTAG_PATTERN = re.compile(r'\$([A-Za-z0-9\u4e00-\u9fff]+)')
+
+
+def current_rss_bytes() -> int:
+    """
+    当前进程的常驻内存（Linux 读 /proc，其他平台退化为峰值 RSS）
+
+    Returns:
+        字节数
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """已排序列表的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def load_tweet_texts(pattern: str) -> List[str]:
+    """
+    读取要回放的推文文本
+
+    Args:
+        pattern: 推文文件的 glob
+
+    Returns:
+        非空推文文本列表
+    """
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        texts.extend(text for text in iter_archived_texts(path) if text)
+    return texts
+
+
+def generate_registry(size: int, cjk_ratio: float, seed_symbols: List[str], seed: int = 42) -> Dict[str, Dict]:
+    """
+    生成 token 注册表
+
+    Args:
+        size: token 数量
+        cjk_ratio: 中文 token 占比
+        seed_symbols: 必须包含的符号（推文中真实出现过的 $ 符号，保证回放时有命中）
+        seed: 随机种子
+
+    Returns:
+        token key ("symbol:name") -> token 详情
+    """
+    rng = random.Random(seed)
+    registry = {}
+
+    def add(symbol: str):
+        # 真实注册表中名称基本各不相同：几个常见词 + 符号本身
+        name = ' '.join(rng.sample(NAME_WORDS, rng.randint(1, 2)) + [symbol.capitalize()])
+        token_key = f"{symbol}:{name}"
+        if token_key not in registry:
+            registry[token_key] = {
+                'symbol': symbol,
+                'name': name,
+                'chain': rng.choice(['sol', 'bsc', 'eth', 'base']),
+                'ca': '0x' + ''.join(rng.choice('0123456789abcdef') for _ in range(40)),
+            }
+
+    for symbol in seed_symbols[:max(1, size // 10)]:
+        add(symbol)
+
+    while len(registry) < size:
+        if rng.random() < cjk_ratio:
+            symbol = ''.join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.randint(2, 4)))
+        else:
+            length = rng.randint(3, 8)
+            symbol = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(length))
+            if not symbol[0].isalpha():
+                symbol = rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + symbol[1:]
+        add(symbol)
+
+    return registry
+
+
+def populate_redis(client, registry: Dict[str, Dict], batch_size: int = 10000):
+    """
+    把注册表写入 Redis（与 TokenMonitor 相同的结构: 集合 + 每个 token 一个 hash）
+
+    Args:
+        client: Redis 客户端
+        registry: token key -> token 详情
+        batch_size: 每个 pipeline 写入的 token 数
+    """
+    client.flushdb()
+    items = list(registry.items())
+    for i in range(0, len(items), batch_size):
+        pipe = client.pipeline(transaction=False)
+        for token_key_str, token_data in items[i:i + batch_size]:
+            pipe.sadd(SET_KEY, token_key_str)
+            pipe.hset(f"{KEY_PREFIX}{token_key_str}", mapping=token_data)
+        pipe.execute()
+
+
+def start_redis_server(port: int) -> subprocess.Popen:
+    """
+    启动一个不落盘的本地 redis-server
+
+    Args:
+        port: 端口
+
+    Returns:
+        进程对象
+    """
+    redis_server = shutil.which('redis-server')
+    if not redis_server:
+        raise RuntimeError("redis-server not found in PATH")
+
+    process = subprocess.Popen(
+        [redis_server, '--port', str(port), '--save', '', '--appendonly', 'no'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    client = redis.Redis(host='127.0.0.1', port=port, decode_responses=True)
+    deadline = time.time() + 10
+    while True:
+        try:
+            client.ping()
+            return process
+        except redis.ConnectionError:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError(f"redis-server did not start on port {port}")
+            time.sleep(0.05)
+
+
+def run_size(client, size: int, cjk_ratio: float, texts: List[str], seed_symbols: List[str]) -> Dict:
+    """
+    对一个注册表规模做一轮测试
+
+    Args:
+        client: Redis 客户端
+        size: token 数量
+        cjk_ratio: 中文 token 占比
+        texts: 回放的推文
+        seed_symbols: 推文中出现过的 $ 符号
+
+    Returns:
+        结果字典
+    """
+    print(f"\n[Benchmark] Generating registry of {size} tokens...")
+    registry = generate_registry(size, cjk_ratio, seed_symbols)
+    populate_redis(client, registry)
+    del registry
+    gc.collect()
+
+    # 刷新耗时与内存（匹配器自身的分配，不含 Redis 中的数据）
+    rss_before = current_rss_bytes()
+    matcher = RedisTokenMatcher(
+        redis_set_key=SET_KEY,
+        redis_key_prefix=KEY_PREFIX,
+        subscribe_changes=False,
+        snapshot_path=None,
+        redis_client=client
+    )
+    gc.collect()
+    rss_after = current_rss_bytes()
+    refresh_stats = dict(matcher.last_refresh_stats)
+
+    # 回放推文，逐条计时
+    latencies = []
+    match_count = 0
+    for text in texts:
+        start_time = time.perf_counter()
+        matches = matcher.match_tokens_in_text(text, auto_refresh=False)
+        latencies.append(time.perf_counter() - start_time)
+        match_count += len(matches)
+    latencies.sort()
+
+    result = {
+        'size': size,
+        'tokens': len(matcher.index),
+        'refresh_seconds': refresh_stats.get('duration_seconds'),
+        'index_build_seconds': round(matcher.index.build_seconds, 3),
+        'refresh_kb': round(refresh_stats.get('bytes', 0) / 1024, 1),
+        'matcher_rss_mb': round((rss_after - rss_before) / 1024 / 1024, 1),
+        'tweets': len(texts),
+        'matches': match_count,
+        'p50_us': round(percentile(latencies, 0.50) * 1e6, 1),
+        'p99_us': round(percentile(latencies, 0.99) * 1e6, 1),
+        'mean_us': round(sum(latencies) / len(latencies) * 1e6, 1) if latencies else 0.0,
+    }
+
+    matcher.close()
+    del matcher
+    gc.collect()
+    return result
+
+
+def print_results(results: List[Dict]):
+    """以表格形式打印结果"""
+    columns = [
+        ('size', 'Registry'), ('refresh_seconds', 'Refresh(s)'), ('index_build_seconds', 'Build(s)'),
+        ('matcher_rss_mb', 'RSS(MB)'), ('tweets', 'Tweets'), ('matches', 'Matches'),
+        ('p50_us', 'p50(us)'), ('p99_us', 'p99(us)'), ('mean_us', 'Mean(us)'),
+    ]
+    widths = [max(len(title), *(len(str(r[key])) for r in results)) for key, title in columns]
+
+    print("\n" + "=" * 70)
+    print("RedisTokenMatcher Scaling Benchmark")
+    print("=" * 70)
+    print('  '.join(title.rjust(width) for (_, title), width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[key]).rjust(width) for (key, _), width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RedisTokenMatcher scaling benchmark')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='逗号分隔的注册表规模（默认 1000,10000,100000,1000000）')
+    parser.add_argument('--cjk-ratio', type=float, default=0.1, help='中文 token 占比（默认 0.1）')
+    parser.add_argument('--tweets', default=DEFAULT_TWEET_GLOB, help='回放推文文件的 glob（默认 data/*.json）')
+    parser.add_argument('--backend', choices=['fakeredis', 'redis-server', 'redis'], default='fakeredis',
+                        help='fakeredis（进程内）/ redis-server（启动临时实例）/ redis（连接已有实例，会清空该 db）')
+    parser.add_argument('--host', default='127.0.0.1', help='--backend redis 时的主机')
+    parser.add_argument('--port', type=int, default=6399, help='redis-server / redis 的端口（默认 6399）')
+    parser.add_argument('--db', type=int, default=15, help='--backend redis 时使用的 db（默认 15）')
+    parser.add_argument('--json', help='把结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    texts = load_tweet_texts(args.tweets)
+    if not texts:
+        print(f"[Benchmark] No tweets found for {args.tweets}")
+        return
+    seed_symbols = list(dict.fromkeys(m for text in texts for m in CASHTAG_PATTERN.findall(text)))
+    print(f"[Benchmark] Replaying {len(texts)} tweets ({len(seed_symbols)} distinct cashtags)")
+
+    server_process = None
+    if args.backend == 'fakeredis':
+        if not FAKEREDIS_AVAILABLE:
+            print("[Benchmark] fakeredis not installed: pip install fakeredis, or use --backend redis-server")
+            return
+        client = fakeredis.FakeRedis(decode_responses=True)
+    elif args.backend == 'redis-server':
+        server_process = start_redis_server(args.port)
+        client = redis.Redis(host='127.0.0.1', port=args.port, decode_responses=True)
+    else:
+        client = redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+
+    results = []
+    try:
+        for size in sizes:
+            results.append(run_size(client, size, args.cjk_ratio, texts, seed_symbols))
+    finally:
+        client.flushdb()
+        if server_process:
+            server_process.terminate()
+            server_process.wait()
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'backend': args.backend, 'results': results}, f, indent=2)
+        print(f"\n[Benchmark] Results saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
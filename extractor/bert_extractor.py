@@ -8,33 +8,35 @@
 - 基于深度学习的上下文理解
 - 使用预训练的Transformer模型
 - 可以理解复杂的语义关系
+- 离线处理文件时按子词长度分桶批量推理（process_file 的 batch_size）
 - 需要安装: pip install transformers torch
 """
 
 import re
-from typing import List, Tuple, Dict, Set
+from typing import Iterator, List, Tuple, Dict, Set
 from collections import defaultdict, Counter
 from utils import load_tweets, save_results, parse_timestamp
+from tweet_document import build_combined_text
+from onnx_ner import DEFAULT_NER_MODEL, TRANSFORMERS_AVAILABLE, create_ner_pipeline
 
-# 尝试导入transformers
-try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
-    import torch
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+if not TRANSFORMERS_AVAILABLE:
     print("警告: transformers未安装，将使用基础提取功能")
 
+# 离线批量提取时 BERT 每批推理的推文数（按子词长度分桶，动态 padding）
+OFFLINE_BATCH_SIZE = 32
+
 
 class BERTExtractor:
     """基于BERT的代币提取器"""
     
-    def __init__(self, use_gpu=False):
+    def __init__(self, use_gpu=False, ner_backend='pytorch', ner_model=DEFAULT_NER_MODEL):
         """
         初始化
         
         Args:
             use_gpu: 是否使用GPU加速
+            ner_backend: NER 推理后端，'pytorch' 或 'onnx'（int8 量化，仅 CPU）
+            ner_model: HuggingFace 上的 NER 模型名
         """
         self.ner_pipeline = None
         self.use_gpu = use_gpu
@@ -42,14 +44,9 @@ class BERTExtractor:
         if TRANSFORMERS_AVAILABLE:
             try:
                 # 使用预训练的NER模型
-                device = 0 if use_gpu and torch.cuda.is_available() else -1
-                self.ner_pipeline = pipeline(
-                    "ner",
-                    model="dslim/bert-base-NER",
-                    aggregation_strategy="simple",
-                    device=device
-                )
-                print(f"成功加载BERT NER模型 (device: {'GPU' if device >= 0 else 'CPU'})")
+                self.ner_pipeline, backend_desc = create_ner_pipeline(ner_backend, use_gpu=use_gpu,
+                                                                      model_name=ner_model)
+                print(f"成功加载BERT NER模型 (backend: {backend_desc})")
             except Exception as e:
                 print(f"警告: 无法加载BERT模型: {e}")
                 print("将使用基础提取功能")
@@ -78,11 +75,7 @@ class BERTExtractor:
             return []
         
         try:
-            # 限制文本长度以避免内存问题
-            max_length = 512
-            if len(text) > max_length:
-                text = text[:max_length]
-            
+            # 长文本由 pipeline 按子词切成重叠窗口并合并实体，不在这里截断
             entities = self.ner_pipeline(text)
             return entities
         except Exception as e:
@@ -149,7 +142,61 @@ class BERTExtractor:
         
         return tokens
     
-    def extract_from_tweets(self, tweets: List[dict], top_n=100, use_bert=True) -> List[Tuple[str, str]]:
+    def iter_bert_entities(self, texts: List[str], batch_size: int = 32, bucket_batches: int = 8) -> Iterator[List[Dict]]:
+        """
+        批量提取实体，按输入顺序逐条返回
+        
+        每次取 batch_size * bucket_batches 条文本，按子词长度排序后切成批，
+        长度相近的文本放在同一批，动态 padding 的浪费最小；一个窗口处理完就按原顺序输出，
+        内存占用与推文总数无关
+        
+        Args:
+            texts: 文本列表
+            batch_size: 每批文本数（1 表示逐条推理）
+            bucket_batches: 每个排序窗口包含多少批
+            
+        Yields:
+            每条文本的实体列表
+        """
+        if batch_size <= 1:
+            for text in texts:
+                yield self.extract_entities_with_bert(text)
+            return
+        
+        window = batch_size * max(1, bucket_batches)
+        for window_start in range(0, len(texts), window):
+            window_texts = texts[window_start:window_start + window]
+            lengths = self._token_lengths(window_texts)
+            order = sorted(range(len(window_texts)), key=lambda i: lengths[i])
+            
+            window_entities = [None] * len(window_texts)
+            for batch_start in range(0, len(order), batch_size):
+                batch_indices = order[batch_start:batch_start + batch_size]
+                batch_texts = [window_texts[i] for i in batch_indices]
+                try:
+                    batch_entities = self.ner_pipeline(batch_texts, batch_size=len(batch_texts))
+                except Exception as e:
+                    # 整批失败时逐条重试，只丢弃出错的那条
+                    print(f"BERT批处理错误，逐条重试: {e}")
+                    batch_entities = [self.extract_entities_with_bert(text) for text in batch_texts]
+                for i, entities in zip(batch_indices, batch_entities):
+                    window_entities[i] = entities
+            
+            yield from window_entities
+    
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """
+        文本的子词数（用于按长度分桶；分词器不可用时用字符数）
+        """
+        tokenizer = getattr(self.ner_pipeline, 'tokenizer', None)
+        if tokenizer is None:
+            return [len(text) for text in texts]
+        try:
+            return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']]
+        except Exception:
+            return [len(text) for text in texts]
+    
+    def extract_from_tweets(self, tweets: List[dict], top_n=100, use_bert=True, batch_size=1) -> List[Tuple[str, str]]:
         """
         从推文列表中提取代币信息
         
@@ -157,6 +204,7 @@ class BERTExtractor:
             tweets: 推文列表
             top_n: 提取前N个实体
             use_bert: 是否使用BERT（如果False则仅使用模式匹配）
+            batch_size: BERT 每批推理的推文数（1 表示逐条推理，>1 时按长度分桶批量推理）
             
         Returns:
             [(token, timestamp), ...] 格式的结果
@@ -173,37 +221,28 @@ class BERTExtractor:
         total_tweets = len(tweets)
         print(f"开始处理 {total_tweets} 条推文...")
         
+        # 合并文本：主推文 + 回复内容 + 引用内容
+        combined_texts = [build_combined_text(tweet.get('text', ''), tweet) for tweet in tweets]
+        
+        # BERT 结果按推文顺序流入下面的汇总
+        run_bert = use_bert and self.ner_pipeline is not None
+        bert_results = self.iter_bert_entities(combined_texts, batch_size) if run_bert else None
+        
         for idx, tweet in enumerate(tweets):
             if (idx + 1) % 1000 == 0:
                 print(f"进度: {idx + 1}/{total_tweets}")
             
-            # 获取主推文内容
-            text = tweet.get('text', '')
             timestamp = parse_timestamp(tweet.get('createdAt', ''))
             engagement = tweet.get('favoriteCount', 0) + tweet.get('retweetCount', 0)
-            
-            # 合并文本：主推文 + 回复内容 + 引用内容
-            combined_text = text
-            
-            # 添加 replyToStatus 中的内容
-            if 'replyToStatus' in tweet and tweet['replyToStatus']:
-                reply_text = tweet['replyToStatus'].get('text', '')
-                if reply_text:
-                    combined_text += ' ' + reply_text
-            
-            # 添加 quotedStatus 中的内容
-            if 'quotedStatus' in tweet and tweet['quotedStatus']:
-                quoted_text = tweet['quotedStatus'].get('text', '')
-                if quoted_text:
-                    combined_text += ' ' + quoted_text
+            combined_text = combined_texts[idx]
             
             # 计算上下文相关度（使用合并后的文本）
             context_score = self.calculate_context_score(combined_text)
             
             # 方法1: 使用BERT NER（使用合并文本）
-            if use_bert and self.ner_pipeline:
+            if run_bert:
                 try:
-                    entities = self.extract_entities_with_bert(combined_text)
+                    entities = next(bert_results)
                     for entity in entities:
                         entity_text = entity.get('word', '').strip()
                         confidence = entity.get('score', 0.0)
@@ -370,7 +409,7 @@ class BERTExtractor:
         
         return True
     
-    def process_file(self, input_path: str, output_path: str, top_n=100):
+    def process_file(self, input_path: str, output_path: str, top_n=100, batch_size=OFFLINE_BATCH_SIZE):
         """
         处理单个推文文件
         
@@ -378,6 +417,7 @@ class BERTExtractor:
             input_path: 输入JSON文件路径
             output_path: 输出TXT文件路径
             top_n: 提取前N个实体
+            batch_size: BERT 每批推理的推文数
         """
         print(f"正在处理: {input_path}")
         
@@ -387,7 +427,7 @@ class BERTExtractor:
         
         # 提取实体
         use_bert = self.ner_pipeline is not None
-        results = self.extract_from_tweets(tweets, top_n, use_bert=use_bert)
+        results = self.extract_from_tweets(tweets, top_n, use_bert=use_bert, batch_size=batch_size)
         print(f"基于BERT提取了 {len(results)} 个实体")
         
         # 保存结果
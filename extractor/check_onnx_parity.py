@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 后端一致性检查
+在 data/ 中的推文上分别用 PyTorch 和 ONNX int8 后端运行 dslim/bert-base-NER，
+比较聚合后的实体和最终提取出的代币符号，并统计单条推文推理延迟
+
+int8 量化不是逐位等价的，分数会有微小偏差；检查的是实体边界/类型一致率
+和代币符号一致率，低于阈值时以非零状态退出
+
+用法:
+    python check_onnx_parity.py                          # data/user_tweets_*.json
+    python check_onnx_parity.py --limit 200              # 只取前 200 条
+    python check_onnx_parity.py --min-agreement 0.98     # 代币符号一致率阈值
+    python check_onnx_parity.py --show-diffs 20          # 打印前 20 条不一致的推文
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+from onnx_ner import ONNX_AVAILABLE, TRANSFORMERS_AVAILABLE, create_ner_pipeline
+from realtime_bert_analyzer import RealtimeBERTAnalyzer
+from tweet_document import build_combined_text
+from utils import load_tweets
+
+
+DEFAULT_TWEET_GLOB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'data', 'user_tweets_*.json')
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """已排序列表的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def load_texts(pattern: str, limit: int = None) -> List[str]:
+    """
+    读取推文合并文本（正文 + 回复 + 引用）
+
+    Args:
+        pattern: 推文文件的 glob
+        limit: 最多读取多少条
+
+    Returns:
+        非空文本列表
+    """
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        for tweet in load_tweets(path):
+            text = build_combined_text(tweet.get('text', ''), tweet)
+            if text.strip():
+                texts.append(text)
+    return texts[:limit] if limit else texts
+
+
+def run_backend(ner_pipeline, texts: List[str]) -> Tuple[List[List[Dict]], List[float]]:
+    """
+    逐条推理（与实时检测器的调用方式相同），记录每条的耗时
+
+    Returns:
+        (每条文本的实体列表, 每条耗时秒数)
+    """
+    ner_pipeline(texts[0])  # 预热
+    outputs, latencies = [], []
+    for text in texts:
+        start_time = time.perf_counter()
+        outputs.append(ner_pipeline(text))
+        latencies.append(time.perf_counter() - start_time)
+    return outputs, latencies
+
+
+def entity_keys(entities: List[Dict]) -> Set[Tuple]:
+    """实体的 (类型, 起止位置, 文本)，不含分数"""
+    return {(e['entity_group'], e['start'], e['end'], e['word']) for e in entities}
+
+
+def token_symbols(analyzer: RealtimeBERTAnalyzer, entities: List[Dict]) -> Set[str]:
+    """按分析器的过滤和标准化规则，从实体得到最终的代币符号"""
+    symbols = set()
+    for entity in entities:
+        if entity.get('entity_group', '') not in ('ORG', 'PER', 'MISC'):
+            continue
+        normalized = analyzer._normalize_token(entity.get('word', '').strip())
+        if normalized and analyzer._is_valid_token(normalized):
+            symbols.add(normalized)
+    return symbols
+
+
+def compare(texts: List[str], reference: List[List[Dict]], candidate: List[List[Dict]],
+            show_diffs: int = 0) -> Dict:
+    """
+    比较两个后端的输出
+
+    Returns:
+        统计字典
+    """
+    analyzer = RealtimeBERTAnalyzer(use_bert=False)
+    entity_matches = symbol_matches = 0
+    score_deltas = []
+    shown = 0
+
+    for text, ref, cand in zip(texts, reference, candidate):
+        same_entities = entity_keys(ref) == entity_keys(cand)
+        entity_matches += same_entities
+        if same_entities:
+            ref_scores = {(e['entity_group'], e['start'], e['end']): e['score'] for e in ref}
+            score_deltas.extend(abs(float(e['score']) - float(ref_scores[(e['entity_group'], e['start'], e['end'])]))
+                                for e in cand)
+
+        ref_symbols = token_symbols(analyzer, ref)
+        cand_symbols = token_symbols(analyzer, cand)
+        if ref_symbols == cand_symbols:
+            symbol_matches += 1
+        elif shown < show_diffs:
+            shown += 1
+            print(f"\n[Parity] {text[:120]!r}")
+            print(f"  pytorch only: {sorted(ref_symbols - cand_symbols)}")
+            print(f"  onnx only:    {sorted(cand_symbols - ref_symbols)}")
+
+    score_deltas.sort()
+    total = len(texts)
+    return {
+        'tweets': total,
+        'entity_agreement': entity_matches / total if total else 1.0,
+        'symbol_agreement': symbol_matches / total if total else 1.0,
+        'score_delta_p99': percentile(score_deltas, 0.99),
+        'score_delta_max': score_deltas[-1] if score_deltas else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PyTorch vs ONNX int8 NER parity check')
+    parser.add_argument('--tweets', default=DEFAULT_TWEET_GLOB, help='推文文件的 glob（默认 data/user_tweets_*.json）')
+    parser.add_argument('--limit', type=int, default=None, help='最多检查多少条推文')
+    parser.add_argument('--min-agreement', type=float, default=0.97,
+                        help='代币符号一致率阈值，低于时退出码为 1（默认 0.97）')
+    parser.add_argument('--show-diffs', type=int, default=10, help='打印多少条不一致的推文（默认 10）')
+    args = parser.parse_args()
+
+    if not TRANSFORMERS_AVAILABLE or not ONNX_AVAILABLE:
+        print('[Parity] Requires transformers, torch and optimum[onnxruntime]')
+        return 2
+
+    texts = load_texts(args.tweets, args.limit)
+    if not texts:
+        print(f"[Parity] No tweets found for {args.tweets}")
+        return 2
+    print(f"[Parity] Checking {len(texts)} tweets")
+
+    results = {}
+    for backend in ('pytorch', 'onnx'):
+        ner_pipeline, backend_desc = create_ner_pipeline(backend)
+        outputs, latencies = run_backend(ner_pipeline, texts)
+        latencies.sort()
+        results[backend] = outputs
+        print(f"[Parity] {backend_desc:<16} p50 {percentile(latencies, 0.50) * 1000:7.2f}ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.2f}ms  "
+              f"mean {sum(latencies) / len(latencies) * 1000:7.2f}ms")
+        del ner_pipeline
+
+    stats = compare(texts, results['pytorch'], results['onnx'], args.show_diffs)
+    print("\n" + "=" * 70)
+    print(f"Entities identical:  {stats['entity_agreement']:.2%} of {stats['tweets']} tweets")
+    print(f"Token symbols equal: {stats['symbol_agreement']:.2%}")
+    print(f"Score delta:         p99 {stats['score_delta_p99']:.4f}, max {stats['score_delta_max']:.4f}")
+    print("=" * 70)
+
+    if stats['symbol_agreement'] < args.min_agreement:
+        print(f"[Parity] FAILED: symbol agreement below {args.min_agreement:.2%}")
+        return 1
+    print("[Parity] OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
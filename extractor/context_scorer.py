@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上下文关键词评分器
+一次扫描记录文本中所有关键词的出现位置，之后任意区间的上下文分数都可以直接查表得到
+
+特点:
+- 关键词用 Aho-Corasick 自动机匹配，每条文本只扫描一次
+- 每个出现过的关键词维护一个前缀计数数组，窗口内是否出现只需一次减法
+- 评分规则与逐窗口子串查找一致：窗口内出现的不同关键词数 / 3，上限 1.0
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+from aho_corasick import AhoCorasickAutomaton
+
+
+def lower_preserving_length(text: str) -> str:
+    """
+    转小写且保证长度不变（少数字符小写后会变长，这些字符保持原样），
+    使得小写文本中的位置可以直接对应原文位置
+
+    Args:
+        text: 原文
+
+    Returns:
+        小写文本
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+class ContextScores:
+    """一条文本的关键词位置表，用于查询任意区间的上下文分数"""
+
+    def __init__(self, text_length: int, prefix_counts: Dict[int, Tuple[int, List[int]]], window: int):
+        """
+        Args:
+            text_length: 文本长度
+            prefix_counts: 关键词编号 -> (关键词长度, 前缀计数数组)，
+                           数组第 i 项为起始位置 < i 的出现次数
+            window: 上下文窗口大小（字符数）
+        """
+        self.text_length = text_length
+        self.prefix_counts = prefix_counts
+        self.window = window
+
+    def keyword_count(self, start: int, end: int) -> int:
+        """
+        统计 [start, end) 内完整出现的不同关键词数量
+
+        Args:
+            start: 区间起点
+            end: 区间终点（不含）
+
+        Returns:
+            不同关键词数量
+        """
+        count = 0
+        for keyword_length, prefix in self.prefix_counts.values():
+            last_start = end - keyword_length + 1
+            if last_start > start and prefix[last_start] - prefix[start] > 0:
+                count += 1
+        return count
+
+    def restrict(self, keyword_ids: Iterable[int], text_length: int = None, window: int = None) -> 'ContextScores':
+        """
+        只保留部分关键词、截取文本开头一段的位置表（多个阶段共用一次扫描时使用）
+
+        Args:
+            keyword_ids: 保留的关键词编号
+            text_length: 截取的文本长度（只统计完整落在这一段内的关键词），默认不截取
+            window: 上下文窗口大小，默认不变
+
+        Returns:
+            新的 ContextScores（共享前缀计数数组）
+        """
+        keyword_ids = set(keyword_ids)
+        return ContextScores(
+            self.text_length if text_length is None else min(text_length, self.text_length),
+            {i: counts for i, counts in self.prefix_counts.items() if i in keyword_ids},
+            self.window if window is None else window
+        )
+
+    def score(self, start: int, end: int) -> float:
+        """
+        计算 text[start:end] 处 token 的上下文分数
+
+        Args:
+            start: token 起始位置
+            end: token 结束位置（不含）
+
+        Returns:
+            上下文分数 (0-1)
+        """
+        window_start = max(0, start - self.window)
+        window_end = min(self.text_length, end + self.window)
+        return min(1.0, self.keyword_count(window_start, window_end) / 3.0)
+
+
+class ContextScorer:
+    """上下文关键词评分器 - 每条文本 scan() 一次，之后按位置查询分数"""
+
+    def __init__(self, keywords: Iterable[str], window: int = 50):
+        """
+        初始化评分器
+
+        Args:
+            keywords: 关键词集合（与小写后的文本匹配）
+            window: 上下文窗口大小（字符数）
+        """
+        self.window = window
+        self.keywords = sorted(set(keywords))
+        self.automaton = AhoCorasickAutomaton((kw, i) for i, kw in enumerate(self.keywords))
+
+    def scan(self, text: str) -> ContextScores:
+        """
+        扫描文本，记录所有关键词的出现位置
+
+        Args:
+            text: 原文
+
+        Returns:
+            可按位置查询分数的 ContextScores
+        """
+        text_length = len(text)
+        starts_by_keyword: Dict[int, List[int]] = {}
+        for start, _, keyword_id in self.automaton.iter(lower_preserving_length(text)):
+            starts_by_keyword.setdefault(keyword_id, []).append(start)
+
+        prefix_counts = {}
+        for keyword_id, starts in starts_by_keyword.items():
+            prefix = [0] * (text_length + 1)
+            for start in starts:
+                prefix[start + 1] += 1
+            for i in range(1, text_length + 1):
+                prefix[i] += prefix[i - 1]
+            prefix_counts[keyword_id] = (len(self.keywords[keyword_id]), prefix)
+
+        return ContextScores(text_length, prefix_counts, self.window)
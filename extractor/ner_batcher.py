@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 微批处理
+把多个调用方的推理请求攒成一批再一起推理：凑满 max_batch_size 条、最早的请求
+等待超过 max_wait_ms，或者已知的所有调用方都在排队（不会再有新请求）时立即执行，
+结果按请求分别返回给各调用方
+
+特点:
+- 调用方接口保持同步（submit() 返回 Future，或直接调用等待结果）
+- 单个后台线程执行推理，批内按一次 padded batch 处理
+- 记录实际批大小分布，便于调整批大小和等待时间
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+
+class MicroBatcher:
+    """微批处理器 - 用法: batcher = MicroBatcher(process_batch); result = batcher(item)"""
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0, name: str = 'NER', max_concurrency: int = None):
+        """
+        初始化并启动后台线程
+
+        Args:
+            process_batch: 批处理函数，输入请求列表，返回等长的结果列表
+            max_batch_size: 每批最多请求数
+            max_wait_ms: 最早的请求最多等待多久（毫秒）就开始推理
+            name: 日志中显示的名称
+            max_concurrency: 最多有多少个调用方同时提交（每个调用方等待结果时不会再提交）；
+                             排队请求数达到它时立即推理，不再等到 max_wait_ms。None 表示未知
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrency = max(1, max_concurrency) if max_concurrency else None
+        self.name = name
+
+        self._queue = deque()  # (请求, Future, 入队时间)
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        # 统计
+        self.batch_size_histogram: Dict[int, int] = {}
+        self.batches = 0
+        self.items = 0
+        self.total_wait_seconds = 0.0
+        self.total_process_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        提交一个请求
+
+        Args:
+            item: 请求（例如一条推文文本）
+
+        Returns:
+            完成后包含结果的 Future
+        """
+        future = Future()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError(f"[{self.name} Batcher] Batcher is closed")
+            self._queue.append((item, future, time.monotonic()))
+            self._condition.notify()
+        return future
+
+    def __call__(self, item: Any, timeout: float = None) -> Any:
+        """提交请求并等待结果"""
+        return self.submit(item).result(timeout)
+
+    def _next_batch(self) -> List:
+        """等待并取出下一批请求；停止后且队列为空时返回空列表"""
+        with self._condition:
+            while not self._queue and not self._stopped:
+                self._condition.wait()
+            if not self._queue:
+                return []
+
+            # 从最早的请求入队时算起，最多等待 max_wait；所有调用方都在排队时不再等待
+            deadline = self._queue[0][2] + self.max_wait_seconds
+            fill_size = min(self.max_batch_size, self.max_concurrency or self.max_batch_size)
+            while len(self._queue) < fill_size and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch_size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(batch_size)]
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            items = [item for item, _, _ in batch]
+            start_time = time.monotonic()
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise ValueError(f"process_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                results = None
+            end_time = time.monotonic()
+
+            if results is not None:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_size_histogram[len(batch)] = self.batch_size_histogram.get(len(batch), 0) + 1
+            self.total_wait_seconds += sum(start_time - enqueued_at for _, _, enqueued_at in batch)
+            self.total_process_seconds += end_time - start_time
+
+    def get_stats(self) -> Dict:
+        """
+        获取批处理统计
+
+        Returns:
+            统计信息字典（批大小分布、平均批大小、平均排队 / 推理耗时）
+        """
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_seconds * 1000,
+            'max_concurrency': self.max_concurrency,
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+            'avg_queue_wait_ms': round(self.total_wait_seconds / self.items * 1000, 2) if self.items else 0.0,
+            'avg_batch_process_ms': round(self.total_process_seconds / self.batches * 1000, 2) if self.batches else 0.0,
+            'queued': len(self._queue),
+        }
+
+    def close(self, timeout: float = 5.0):
+        """停止后台线程（已提交的请求会先处理完）"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join(timeout=timeout)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 结果缓存
+转推、引用推文（quotedStatus 文本被拼进合并文本）、断线重连后的重放、客户端触发的重新审计
+都会让同一段文本反复进入分析器；按规范化文本的指纹缓存 NER 结果，重复文本直接跳过推理
+
+特点:
+- 进程内 LRU + TTL（OrderedDict，过期或超出容量时淘汰）
+- 可选 Redis 二级缓存（SETEX），多个检测器进程共享推理结果
+- 指纹基于规范化文本（NFKC / 形近字母折叠 / 空白合并，保留大小写，因为模型区分大小写）
+  和命名空间（模型 + 后端），不同模型的结果不会混用
+- 命中时返回首次推理的结果，实体的 start / end 对应首次出现的那段原文
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from text_normalizer import canonicalize
+
+
+class NERCache:
+    """NER 结果缓存 - 用法: entities = cache.get(text); if entities is None: cache.put(text, run(text))"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600.0, namespace: str = '',
+                 redis_client=None, redis_key_prefix: str = 'nlpmeme:ner:'):
+        """
+        初始化
+
+        Args:
+            max_entries: 进程内最多缓存多少条文本
+            ttl_seconds: 缓存有效期（秒），进程内和 Redis 相同
+            namespace: 默认的指纹命名空间（例如 "dslim/bert-base-NER:ONNX int8, CPU"）；
+                       get / put 可以传入实际使用的模型和后端对应的命名空间
+            redis_client: 共享缓存用的 Redis 客户端（decode_responses=True），None 表示只用进程内缓存
+            redis_key_prefix: Redis key 前缀
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.redis_client = redis_client
+        self.redis_key_prefix = redis_key_prefix
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # 指纹 -> (过期时间, 实体列表)
+        self._lock = threading.Lock()
+
+        # 统计
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.redis_errors = 0
+
+    def fingerprint(self, text: str, namespace: Optional[str] = None) -> str:
+        """
+        文本指纹
+
+        Args:
+            text: 送入模型的文本
+            namespace: 命名空间（None 表示使用初始化时的 namespace）
+
+        Returns:
+            十六进制摘要
+        """
+        normalized = ' '.join(canonicalize(text)[0].split())
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update((self.namespace if namespace is None else namespace).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalized.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, text: str, namespace: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        查找缓存的 NER 结果
+
+        Args:
+            text: 送入模型的文本
+            namespace: 产生结果的模型和后端（None 表示使用初始化时的 namespace）
+
+        Returns:
+            实体列表；未命中时返回 None
+        """
+        key = self.fingerprint(text, namespace)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.local_hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+        entities = self._redis_get(key)
+        if entities is not None:
+            self._store(key, entities, now)
+            with self._lock:
+                self.redis_hits += 1
+            return entities
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, entities: List[Dict], namespace: Optional[str] = None):
+        """
+        保存 NER 结果
+
+        Args:
+            text: 送入模型的文本
+            entities: 模型输出的实体列表
+            namespace: 产生结果的模型和后端（None 表示使用初始化时的 namespace）
+        """
+        key = self.fingerprint(text, namespace)
+        self._store(key, entities, time.monotonic())
+        self._redis_set(key, entities)
+
+    def _store(self, key: str, entities: List[Dict], now: float):
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, entities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _redis_get(self, key: str) -> Optional[List[Dict]]:
+        if self.redis_client is None:
+            return None
+        try:
+            value = self.redis_client.get(self.redis_key_prefix + key)
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+    def _redis_set(self, key: str, entities: List[Dict]):
+        if self.redis_client is None:
+            return
+        try:
+            # 模型输出的分数是 numpy 标量，转成 Python 数值再序列化
+            value = json.dumps(entities, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+            self.redis_client.setex(self.redis_key_prefix + key, max(1, int(self.ttl_seconds)), value)
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _redis_failed(self, error: Exception):
+        with self._lock:
+            self.redis_errors += 1
+            first_error = self.redis_errors == 1
+        if first_error:
+            print(f"[NERCache] Redis error, continuing with the local cache only: {error}")
+
+    def get_stats(self) -> Dict:
+        """
+        获取缓存统计
+
+        Returns:
+            统计信息字典（进程内 / Redis 命中数、未命中数、命中率、淘汰数）
+        """
+        with self._lock:
+            hits = self.local_hits + self.redis_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'shared': self.redis_client is not None,
+                'local_hits': self.local_hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'redis_errors': self.redis_errors,
+            }
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 级联门控
+先看廉价阶段（$ 符号、Redis 已知 token、关键词密度、Twitter entities.symbols）的结果，
+只在文本通过门控或廉价阶段结果不明确时才调用 BERT
+
+判定规则（按顺序）:
+- 关键词密度（context_score）达到 min_context: 运行 NER
+- 密度不够，但廉价阶段命中了代币（推文和加密货币有关，可能还有未识别的名称）: 视为不明确，运行 NER
+- 都没有: 跳过 NER
+
+用法:
+    python ner_cascade.py                            # 回放 data/user_tweets_*.json，比较门控前后的召回
+    python ner_cascade.py --min-context 0.2          # 调整门控阈值
+    python ner_cascade.py --no-ner-on-cheap-hits     # 廉价阶段命中时也不运行 NER
+    python ner_cascade.py --no-redis                 # 不连接 Redis（已知 token 阶段视为没有命中）
+"""
+
+import threading
+from typing import Dict, Iterable, Tuple
+
+from context_scorer import ContextScorer
+from tweet_document import TweetDocument
+
+
+# 门控结果
+RUN_CONTEXT = 'run_context'        # 关键词密度达到阈值
+RUN_AMBIGUOUS = 'run_ambiguous'    # 密度不够但廉价阶段有命中
+SKIP_NO_SIGNAL = 'skip_no_signal'  # 没有任何加密货币信号
+
+# 廉价阶段
+CHEAP_STAGES = ('cashtag', 'known_token', 'twitter_symbol', 'keyword_gate')
+
+
+class NERGate:
+    """NER 级联门控 - 用法: run_ner, reason = gate.decide(document, context_score, known_symbols)"""
+
+    def __init__(self, min_context: float = 0.1, ner_on_cheap_hits: bool = True):
+        """
+        初始化
+
+        Args:
+            min_context: 关键词密度达到多少时运行 NER
+            ner_on_cheap_hits: 密度不够但廉价阶段有命中时是否运行 NER
+        """
+        self.min_context = min_context
+        self.ner_on_cheap_hits = ner_on_cheap_hits
+
+        self._lock = threading.Lock()
+        self.stage_hits: Dict[str, int] = {stage: 0 for stage in CHEAP_STAGES}
+        self.decisions: Dict[str, int] = {RUN_CONTEXT: 0, RUN_AMBIGUOUS: 0, SKIP_NO_SIGNAL: 0}
+
+    def cheap_hits(self, document: TweetDocument, context_score: float,
+                   known_symbols: Iterable[str] = ()) -> Dict[str, bool]:
+        """
+        廉价阶段各自是否命中
+
+        Args:
+            document: 预处理好的推文文档
+            context_score: 关键词密度分数
+            known_symbols: Redis 已知 token 的匹配结果
+
+        Returns:
+            阶段 -> 是否命中
+        """
+        return {
+            'cashtag': bool(document.cashtags),
+            'known_token': any(True for _ in known_symbols),
+            'twitter_symbol': any(document.entity_symbols),
+            'keyword_gate': context_score >= self.min_context,
+        }
+
+    def decide(self, document: TweetDocument, context_score: float,
+               known_symbols: Iterable[str] = ()) -> Tuple[bool, str]:
+        """
+        判断是否需要运行 NER
+
+        Args:
+            document: 预处理好的推文文档
+            context_score: 关键词密度分数
+            known_symbols: Redis 已知 token 的匹配结果
+
+        Returns:
+            (是否运行 NER, 原因)
+        """
+        hits = self.cheap_hits(document, context_score, known_symbols)
+
+        if hits['keyword_gate']:
+            reason = RUN_CONTEXT
+        elif self.ner_on_cheap_hits and any(hits.values()):
+            reason = RUN_AMBIGUOUS
+        else:
+            reason = SKIP_NO_SIGNAL
+
+        with self._lock:
+            for stage, hit in hits.items():
+                self.stage_hits[stage] += hit
+            self.decisions[reason] += 1
+
+        return reason != SKIP_NO_SIGNAL, reason
+
+    def get_stats(self) -> Dict:
+        """
+        获取门控统计
+
+        Returns:
+            统计信息字典（各廉价阶段命中数、NER 运行 / 跳过次数、节省比例）
+        """
+        with self._lock:
+            decisions = dict(self.decisions)
+            stage_hits = dict(self.stage_hits)
+        total = sum(decisions.values())
+        skipped = decisions[SKIP_NO_SIGNAL]
+        return {
+            'min_context': self.min_context,
+            'tweets': total,
+            'stage_hits': stage_hits,
+            'decisions': decisions,
+            'ner_runs': total - skipped,
+            'ner_skipped': skipped,
+            'ner_saved_ratio': round(skipped / total, 3) if total else 0.0,
+        }
+
+
+def replay(tweets, analyzer, gate: NERGate, matcher=None) -> Dict:
+    """
+    回放推文，比较不加门控和加门控时提取出的代币
+
+    Args:
+        tweets: 推文数据字典列表
+        analyzer: RealtimeBERTAnalyzer
+        gate: 要评估的门控
+        matcher: RedisTokenMatcher，提供已知 token 阶段的结果（与 realtime_ca_detector 相同）；
+                 None 表示该阶段没有命中
+
+    Returns:
+        结果字典（门控统计、代币召回率、丢失的代币）
+    """
+    reference_total = retained_total = 0
+    missed: Dict[str, int] = {}
+
+    # 与 realtime_ca_detector 相同：一次扫描两个阶段用到的全部关键词
+    if matcher is not None:
+        scorer = ContextScorer(analyzer.crypto_keywords | matcher.crypto_keywords,
+                               window=matcher.context_scorer.window)
+    else:
+        scorer = analyzer.keyword_scorer
+
+    for tweet in tweets:
+        document = TweetDocument(tweet, scorer)
+        known_symbols = []
+        if matcher is not None:
+            known_symbols = [match['symbol'] for match in matcher.match_document(document, auto_refresh=False)]
+
+        analyzer.ner_gate = None
+        reference = {t['symbol'] for t in analyzer.extract_tokens(document.combined_text, tweet, document,
+                                                                  known_symbols)}
+        analyzer.ner_gate = gate
+        cascaded = {t['symbol'] for t in analyzer.extract_tokens(document.combined_text, tweet, document,
+                                                                 known_symbols)}
+        if not analyzer.ner_pipeline:
+            # 没有模型时分析器不经过门控，这里单独统计门控会怎样判定
+            gate.decide(document, analyzer.calculate_crypto_score(document.combined_text, document),
+                        known_symbols)
+
+        reference_total += len(reference)
+        retained_total += len(reference & cascaded)
+        for symbol in reference - cascaded:
+            missed[symbol] = missed.get(symbol, 0) + 1
+
+    return {
+        'gate': gate.get_stats(),
+        'reference_tokens': reference_total,
+        'retained_tokens': retained_total,
+        'recall': round(retained_total / reference_total, 4) if reference_total else 1.0,
+        'missed': dict(sorted(missed.items(), key=lambda item: -item[1])),
+    }
+
+
+def main():
+    import argparse
+    import contextlib
+    import glob
+    import io
+    import os
+
+    from realtime_bert_analyzer import RealtimeBERTAnalyzer
+    from utils import load_tweets
+
+    default_glob = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'data', 'user_tweets_*.json')
+    parser = argparse.ArgumentParser(description='Replay tweets through the NER cascade and report recall')
+    parser.add_argument('--tweets', default=default_glob, help='推文文件的 glob（默认 data/user_tweets_*.json）')
+    parser.add_argument('--min-context', type=float, default=0.1, help='门控的关键词密度阈值（默认 0.1）')
+    parser.add_argument('--no-ner-on-cheap-hits', action='store_true', help='廉价阶段命中时不运行 NER')
+    parser.add_argument('--ner-backend', choices=['pytorch', 'onnx'], default='pytorch', help='NER 推理后端')
+    parser.add_argument('--limit', type=int, default=None, help='最多回放多少条推文')
+    parser.add_argument('--redis-host', default='127.0.0.1', help='已知 token 注册表所在的 Redis 主机')
+    parser.add_argument('--redis-port', type=int, default=6379, help='Redis 端口（默认 6379）')
+    parser.add_argument('--no-redis', action='store_true', help='不连接 Redis（已知 token 阶段视为没有命中）')
+    args = parser.parse_args()
+
+    tweets = [tweet for path in sorted(glob.glob(args.tweets)) for tweet in load_tweets(path)]
+    tweets = tweets[:args.limit] if args.limit else tweets
+    if not tweets:
+        print(f"[Cascade] No tweets found for {args.tweets}")
+        return
+
+    analyzer = RealtimeBERTAnalyzer(use_gpu=False, ner_batch_size=1, ner_backend=args.ner_backend)
+    if not analyzer.ner_pipeline:
+        print("[Cascade] BERT model not available, recall below only reflects pattern matching")
+    gate = NERGate(min_context=args.min_context, ner_on_cheap_hits=not args.no_ner_on_cheap_hits)
+
+    matcher = None
+    if not args.no_redis:
+        from redis_token_matcher import RedisTokenMatcher
+        matcher = RedisTokenMatcher(redis_host=args.redis_host, redis_port=args.redis_port,
+                                    subscribe_changes=False, background_refresh=False)
+        if matcher.redis_client is None and not len(matcher.index):
+            print("[Cascade] Redis not available, the known-token stage will not fire")
+
+    print(f"[Cascade] Replaying {len(tweets)} tweets...")
+    with contextlib.redirect_stdout(io.StringIO()):  # 分析器逐条打印的调试输出
+        result = replay(tweets, analyzer, gate, matcher)
+    analyzer.close()
+    if matcher is not None:
+        matcher.close()
+
+    stats = result['gate']
+    print("\n" + "=" * 70)
+    print("NER Cascade Replay")
+    print("=" * 70)
+    print(f"Tweets:            {stats['tweets']}")
+    print(f"Stage hits:        {stats['stage_hits']}")
+    print(f"Decisions:         {stats['decisions']}")
+    print(f"NER skipped:       {stats['ner_skipped']} ({stats['ner_saved_ratio']:.1%} of inference saved)")
+    print(f"Token recall:      {result['recall']:.2%} "
+          f"({result['retained_tokens']}/{result['reference_tokens']})")
+    if result['missed']:
+        top_missed = list(result['missed'].items())[:20]
+        print(f"Missed tokens:     {', '.join(f'{symbol} x{count}' for symbol, count in top_missed)}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 NER 推理服务
+按 KOL 分组运行多个检测器进程时，每个进程各自加载一份几百 MB 的 BERT 模型，启动也慢；
+改为由一个守护进程持有模型，检测器通过 Unix socket / 本机 TCP 请求推理
+
+特点:
+- 协议为按行分隔的 JSON：请求 {"id": 1, "text": "..."}，响应 {"id": 1, "entities": [...]}
+  或 {"id": 1, "error": "..."}；{"op": "stats"} 返回服务统计（含服务加载的模型和后端）
+- 所有客户端连接的请求进入同一个 MicroBatcher，跨客户端动态凑批推理
+- 客户端（NERServiceClient）可以像 pipeline 一样调用，返回与 extract_with_bert 相同的实体列表；
+  每个线程一条连接，连接失败（拒绝、重置、连接超时）时快速失败，冷却一段时间后再重连；
+  读响应超时只让这一个请求失败（断开这条连接，下次请求重新连接），不进入冷却期；
+  每次建立连接时先取一次服务统计，记下服务端实际使用的模型和后端（NER 缓存按它区分结果）
+
+用法:
+    python ner_service.py                                   # Unix socket /tmp/foxhole-ner.sock
+    python ner_service.py --address 127.0.0.1:8765          # 本机 TCP
+    python ner_service.py --backend onnx --batch-size 16    # ONNX int8 后端，更大的批
+    python ner_service.py --model dslim/bert-large-NER      # 其他 HuggingFace NER 模型
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+
+from ner_batcher import MicroBatcher
+
+
+DEFAULT_SERVICE_ADDRESS = '/tmp/foxhole-ner.sock'
+
+
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """
+    解析服务地址
+
+    Args:
+        address: "unix:/path"、以 / 开头的 socket 路径，或 "host:port"
+
+    Returns:
+        (socket 地址族, 地址)
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('/') or address.startswith('.'):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def _to_json(value) -> str:
+    # 模型输出的分数是 numpy 标量，转成 Python 数值再序列化
+    return json.dumps(value, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+
+
+class NERService:
+    """NER 推理服务端 - 用法: NERService(ner_pipeline).serve_forever()"""
+
+    def __init__(self, ner_pipeline, address: str = DEFAULT_SERVICE_ADDRESS, batch_size: int = 8,
+                 batch_wait_ms: float = 10.0, model_name: str = None, backend: str = None):
+        """
+        初始化
+
+        Args:
+            ner_pipeline: 已加载的 NER pipeline
+            address: 监听地址（见 parse_address）
+            batch_size: 跨客户端凑批的最大批大小
+            batch_wait_ms: 最早的请求最多等待多久（毫秒）凑批
+            model_name: 加载的模型名（在统计中告知客户端）
+            backend: 实际使用的后端描述（create_ner_pipeline 返回的描述字符串）
+        """
+        self.ner_pipeline = ner_pipeline
+        self.address = address
+        self.model_name = model_name
+        self.backend = backend
+
+        # 先占住地址（已有服务在监听时在这里失败），再启动批处理线程
+        family, bind_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            _remove_stale_socket(bind_address)
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class.allow_reuse_address = True
+        server_class.daemon_threads = True
+        self.server = server_class(bind_address, self._make_handler())
+
+        self.batcher = MicroBatcher(self._run_batch, max_batch_size=batch_size, max_wait_ms=batch_wait_ms,
+                                    name='NER Service')
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    def _run_batch(self, texts: List[str]) -> List[List[Dict]]:
+        return self.ner_pipeline(texts, batch_size=len(texts))
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                with service._lock:
+                    service.connections += 1
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = service.handle_request(line)
+                    self.wfile.write(response.encode('utf-8') + b'\n')
+                    self.wfile.flush()
+
+        return Handler
+
+    def handle_request(self, line: bytes) -> str:
+        """
+        处理一行请求
+
+        Args:
+            line: JSON 请求
+
+        Returns:
+            JSON 响应
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('op') == 'stats':
+                return _to_json({'id': request_id, 'stats': self.get_stats()})
+
+            entities = self.batcher(request['text'])
+            with self._lock:
+                self.requests += 1
+            return _to_json({'id': request_id, 'entities': entities})
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            return _to_json({'id': request_id, 'error': str(e)})
+
+    def get_stats(self) -> Dict:
+        """
+        获取服务统计
+
+        Returns:
+            统计信息字典（连接数、请求数、错误数、批处理统计）
+        """
+        with self._lock:
+            return {
+                'address': self.address,
+                'model': self.model_name,
+                'backend': self.backend,
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'connections': self.connections,
+                'requests': self.requests,
+                'errors': self.errors,
+                'batching': self.batcher.get_stats(),
+            }
+
+    def serve_forever(self):
+        print(f"[NER Service] Listening on {self.address}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """停止监听和批处理线程"""
+        self.server.server_close()
+        self.batcher.close()
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+
+def _remove_stale_socket(path: str):
+    """
+    删除上一个服务异常退出后留下的 socket 文件；已有服务在监听时拒绝启动（不抢占它的路径）
+
+    Args:
+        path: Unix socket 路径
+    """
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.settimeout(1.0)
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)  # 没有进程在监听：残留文件
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"Another NER service is already listening on {path}")
+
+
+class NERServiceUnavailable(ConnectionError):
+    """推理服务不可用（连接失败或处于重连冷却期）"""
+
+
+class NERServiceClient:
+    """NER 推理服务客户端 - 调用方式与 pipeline 相同: entities = client(text)"""
+
+    def __init__(self, address: str = DEFAULT_SERVICE_ADDRESS, timeout: float = 10.0,
+                 retry_interval: float = 30.0):
+        """
+        初始化（不立即连接）
+
+        Args:
+            address: 服务地址（见 parse_address）
+            timeout: 连接和单次请求的超时（秒）
+            retry_interval: 连接失败后多久再尝试重连（秒），期间的请求直接失败（读超时不触发）
+        """
+        self.address = address
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.family, self.connect_address = parse_address(address)
+
+        self._local = threading.local()  # 每个线程一条连接，并发请求在服务端凑批
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._next_id = 0
+        self.service_model = None    # 最近一次握手得到的服务端模型和后端
+        self.service_backend = None
+
+        # 统计
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        if time.monotonic() < self._down_until:
+            raise NERServiceUnavailable(f"NER service at {self.address} is unavailable")
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.connect_address)
+        except OSError as e:
+            sock.close()
+            self._down_until = time.monotonic() + self.retry_interval
+            raise NERServiceUnavailable(f"Cannot connect to NER service at {self.address}: {e}") from e
+
+        conn = (sock, sock.makefile('rb'))
+        try:
+            self._handshake(*conn)
+        except (OSError, ValueError) as e:
+            conn[1].close()
+            sock.close()
+            if isinstance(e, socket.timeout):
+                raise TimeoutError(f"NER service handshake timed out after {self.timeout}s") from e
+            self._down_until = time.monotonic() + self.retry_interval
+            raise NERServiceUnavailable(f"NER service handshake failed at {self.address}: {e}") from e
+        self._local.conn = conn
+        return conn
+
+    def _handshake(self, sock, reader):
+        """新连接上先取一次服务统计，记下服务端的模型和后端"""
+        sock.sendall(_to_json({'id': 0, 'op': 'stats'}).encode('utf-8') + b'\n')
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('NER service closed the connection')
+        stats = json.loads(line).get('stats') or {}
+        with self._lock:
+            self.service_model = stats.get('model')
+            self.service_backend = stats.get('backend')
+
+    @property
+    def namespace(self):
+        """服务端模型和后端对应的缓存命名空间（还没握手或服务没有告知时为 None）"""
+        with self._lock:
+            if self.service_model and self.service_backend:
+                return f"{self.service_model}:{self.service_backend}"
+        return None
+
+    def _disconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def request(self, payload: Dict) -> Dict:
+        """
+        发送一个请求并等待响应
+
+        Args:
+            payload: 请求字典（不含 id）
+
+        Returns:
+            响应字典
+        """
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self.requests += 1
+
+        try:
+            sock, reader = self._connection()
+        except (NERServiceUnavailable, TimeoutError):
+            with self._lock:
+                self.failures += 1
+            raise
+        try:
+            sock.sendall(_to_json(dict(payload, id=request_id)).encode('utf-8') + b'\n')
+            line = reader.readline()
+            if not line:
+                raise ConnectionError('NER service closed the connection')
+            response = json.loads(line)
+        except socket.timeout as e:
+            # 服务端慢（例如排队凑批）：只让这个请求失败；连接上可能还会收到迟到的响应，所以断开重连
+            self._disconnect()
+            with self._lock:
+                self.failures += 1
+                self.timeouts += 1
+            raise TimeoutError(f"NER service request timed out after {self.timeout}s") from e
+        except (OSError, ValueError) as e:
+            self._disconnect()
+            with self._lock:
+                self.failures += 1
+            if isinstance(e, OSError):
+                self._down_until = time.monotonic() + self.retry_interval
+            raise NERServiceUnavailable(f"NER service request failed: {e}") from e
+
+        if 'error' in response:
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError(f"NER service error: {response['error']}")
+        return response
+
+    def __call__(self, inputs: Union[str, List[str]], batch_size: int = None):
+        """
+        与 pipeline 相同的调用方式
+
+        Args:
+            inputs: 一条文本或文本列表
+            batch_size: 忽略（由服务端凑批）
+
+        Returns:
+            一条文本时返回实体列表，文本列表时返回实体列表的列表
+        """
+        if isinstance(inputs, str):
+            return self.request({'text': inputs})['entities']
+        return [self.request({'text': text})['entities'] for text in inputs]
+
+    def ping(self) -> bool:
+        """服务是否可用"""
+        try:
+            self.request({'op': 'stats'})
+            return True
+        except (ConnectionError, TimeoutError, RuntimeError):
+            return False
+
+    def get_stats(self) -> Dict:
+        """
+        获取客户端统计
+
+        Returns:
+            统计信息字典（地址、请求数、失败数、超时数、是否处于重连冷却期）
+        """
+        return {
+            'address': self.address,
+            'model': self.service_model,
+            'backend': self.service_backend,
+            'requests': self.requests,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'available': time.monotonic() >= self._down_until,
+        }
+
+    def close(self):
+        """关闭当前线程的连接"""
+        self._disconnect()
+
+
+def main():
+    import argparse
+
+    from onnx_ner import DEFAULT_NER_MODEL, create_ner_pipeline
+
+    parser = argparse.ArgumentParser(description='Local NER inference service shared by detector processes')
+    parser.add_argument('--address', default=DEFAULT_SERVICE_ADDRESS,
+                        help=f'Unix socket 路径或 host:port（默认 {DEFAULT_SERVICE_ADDRESS}）')
+    parser.add_argument('--model', default=DEFAULT_NER_MODEL, help=f'HuggingFace 上的 NER 模型名（默认 {DEFAULT_NER_MODEL}）')
+    parser.add_argument('--backend', choices=['pytorch', 'onnx'], default='pytorch', help='NER 推理后端')
+    parser.add_argument('--gpu', action='store_true', help='pytorch 后端使用 GPU')
+    parser.add_argument('--batch-size', type=int, default=8, help='跨客户端凑批的最大批大小（默认 8）')
+    parser.add_argument('--batch-wait-ms', type=float, default=10.0, help='最早的请求最多等待多久凑批（默认 10）')
+    args = parser.parse_args()
+
+    # 加载模型（几秒、几百 MB）之前先确认没有其他服务在同一路径上监听
+    family, bind_address = parse_address(args.address)
+    if family == socket.AF_UNIX:
+        try:
+            _remove_stale_socket(bind_address)
+        except (RuntimeError, OSError) as e:
+            print(f"[NER Service] Not starting: {e}")
+            raise SystemExit(1)
+
+    start = time.monotonic()
+    ner_pipeline, backend_desc = create_ner_pipeline(args.backend, use_gpu=args.gpu, model_name=args.model)
+    ner_pipeline("Check out $PEPE, it's mooning!")  # 预热
+    print(f"[NER Service] Model loaded ({args.model}, {backend_desc}, {time.monotonic() - start:.1f}s)")
+
+    service = NERService(ner_pipeline, args.address, batch_size=args.batch_size, batch_wait_ms=args.batch_wait_ms,
+                         model_name=args.model, backend=backend_desc)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[NER Service] Stopped")
+
+
+if __name__ == '__main__':
+    main()
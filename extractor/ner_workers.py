@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 推理进程池
+把 BERT 推理从 WebSocket 监听线程所在的进程移到子进程，慢推理不再占住 GIL、拖慢收包和心跳
+
+特点:
+- 子进程以 forkserver / spawn 方式启动，在初始化函数中自行加载并预热模型，
+  不继承父进程中已在运行的线程（变更流订阅、微批处理、torch 线程池）的锁状态，可以在任意线程中创建
+- 子进程异常退出导致进程池损坏时，打印警告并重建进程池（两次重建之间至少间隔 restart_interval）
+- 每次调用都有超时，子进程卡住时调用方不会一直等待
+- 调用方也可以拿到 concurrent.futures.Future，等待结果或继续做别的事
+"""
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Tuple
+
+
+# 单次推理的默认超时（秒）
+NER_WORKER_TIMEOUT = 30.0
+
+
+def fork_available() -> bool:
+    """当前平台是否支持 fork 启动子进程"""
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def worker_context():
+    """推理子进程的启动方式：有 forkserver 时用 forkserver，否则用 spawn（都不从当前进程 fork）"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class NERProcessPool:
+    """NER 推理进程池 - 用法: pool = NERProcessPool(loader, workers=2); desc = pool.start(); entities = pool(text)"""
+
+    def __init__(self, loader: Callable[[], Tuple], workers: int = 2, threads_per_worker: int = 1,
+                 warmup_text: str = None, restart_interval: float = 30.0):
+        """
+        初始化（子进程在 start() 或第一次提交时启动）
+
+        Args:
+            loader: 在子进程中加载模型的可调用对象，返回 (pipeline, 后端描述)；
+                    需要可以 pickle（例如 functools.partial(create_ner_pipeline, 'onnx')）
+            workers: 子进程数量
+            threads_per_worker: 每个子进程的 torch 计算线程数（避免多个子进程抢占 CPU 核）
+            warmup_text: 子进程初始化时预热用的文本
+            restart_interval: 进程池损坏后两次重建之间的最短间隔（秒），期间的请求直接失败
+        """
+        self.loader = loader
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker
+        self.warmup_text = warmup_text
+        self.restart_interval = restart_interval
+        self.executor = self._create_executor()
+        self._last_restart = None
+
+        # 统计
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=worker_context(),
+            initializer=_init_ner_worker,
+            initargs=(self.loader, self.threads_per_worker, self.warmup_text)
+        )
+
+    def start(self, timeout: float = None) -> str:
+        """
+        立即启动全部子进程并等待模型加载和预热完成（否则子进程在第一次提交时才启动）
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            子进程实际使用的后端描述
+        """
+        futures = [self.executor.submit(_ping_worker) for _ in range(self.workers)]
+        return [future.result(timeout) for future in futures][0]
+
+    def submit(self, text: str) -> Future:
+        """
+        提交一条文本
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            完成后包含实体列表的 Future
+        """
+        submitted_at = time.monotonic()
+        future = self.executor.submit(_run_ner, text)
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(lambda f: self._record(f, submitted_at))
+        return future
+
+    def __call__(self, text: str, timeout: float = NER_WORKER_TIMEOUT) -> List[Dict]:
+        """
+        提交文本并等待结果（进程池损坏时重建一次再重试）
+
+        Args:
+            text: 文本内容
+            timeout: 最长等待秒数
+
+        Returns:
+            实体列表
+        """
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                future = self.submit(text)
+                try:
+                    return future.result(timeout)
+                except TimeoutError:
+                    future.cancel()
+                    with self._lock:
+                        self.timeouts += 1
+                    raise
+            except BrokenProcessPool:
+                if attempt or not self._restart(executor):
+                    raise
+
+    def _restart(self, broken_executor: ProcessPoolExecutor) -> bool:
+        """
+        重建损坏的进程池
+
+        Args:
+            broken_executor: 调用方发现损坏的进程池（其他线程已经重建过时直接返回）
+
+        Returns:
+            是否可以重试（处于重建间隔内时返回 False）
+        """
+        with self._lock:
+            if self.executor is not broken_executor:
+                return True
+            now = time.monotonic()
+            if self._last_restart is not None and now - self._last_restart < self.restart_interval:
+                return False
+            self._last_restart = now
+            self.restarts += 1
+            self.executor = self._create_executor()
+        print(f"[NER Workers] Warning: worker process died, restarted the pool ({self.restarts} restart(s))")
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+        return True
+
+    def _record(self, future: Future, submitted_at: float):
+        elapsed = time.monotonic() - submitted_at
+        with self._lock:
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.total_seconds += elapsed
+
+    def get_stats(self) -> Dict:
+        """
+        获取进程池统计
+
+        Returns:
+            统计信息字典（子进程数、提交 / 完成 / 失败 / 超时数、重建次数、平均往返耗时）
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'threads_per_worker': self.threads_per_worker,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+                'pending': self.submitted - self.completed - self.failed,
+                'avg_roundtrip_ms': round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            }
+
+    def close(self):
+        """停止子进程（未开始的请求会被取消）"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 子进程中的 NER pipeline 和后端描述（由初始化函数加载）
+_worker_pipeline = None
+_worker_backend = None
+
+
+def _init_ner_worker(loader, threads_per_worker: int, warmup_text: str):
+    global _worker_pipeline, _worker_backend
+
+    try:
+        import torch
+        torch.set_num_threads(max(1, threads_per_worker))
+    except ImportError:
+        pass
+
+    _worker_pipeline, _worker_backend = loader()
+    if warmup_text:
+        _worker_pipeline(warmup_text)
+
+
+def _ping_worker() -> str:
+    return _worker_backend
+
+
+def _run_ner(text: str) -> List[Dict]:
+    return _worker_pipeline(text)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NER 模型推理后端
+- pytorch: transformers 默认的 PyTorch eager 推理
+- onnx: 首次使用时把模型导出为 ONNX 并做 int8 动态量化，缓存到磁盘，之后用 onnxruntime 在 CPU 上推理
+
+两种后端都返回 transformers 的 "ner" pipeline（aggregation_strategy="simple"），
+分词、聚合和输出格式完全相同，只替换模型前向计算。
+
+长文本按分词器的 offset 切成重叠窗口（stride），窗口长度取分词器上限、模型位置编码长度和 512
+中最小的一个（很多分词器没有设置上限，model_max_length 是 int(1e30) 哨兵值），一条文本的所有窗口
+作为一批做一次前向计算，重叠部分的实体由 pipeline 合并，不再按字符截断。
+
+transformers / torch / optimum 只在创建 pipeline 时才导入（导入要几秒、几百 MB 内存），
+本模块导入时只检查它们是否已安装，--no-bert 时完全不会加载。
+
+需要安装: pip install "optimum[onnxruntime]"
+"""
+
+import importlib.util
+import os
+import platform
+import time
+from typing import Optional
+
+
+def _module_available(name: str) -> bool:
+    """模块是否已安装（只查找，不导入）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# transformers + torch（必需）、onnxruntime 导出/量化工具（可选）
+TRANSFORMERS_AVAILABLE = _module_available('transformers') and _module_available('torch')
+ONNX_AVAILABLE = _module_available('optimum') and _module_available('onnxruntime')
+
+
+DEFAULT_NER_MODEL = "dslim/bert-base-NER"
+NER_BACKENDS = ('pytorch', 'onnx')
+DEFAULT_ONNX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'onnx')
+
+QUANTIZED_FILE_NAME = 'model_quantized.onnx'
+
+# 长文本的窗口设置：单个窗口最多的子词数、相邻窗口重叠的子词数、一次前向计算最多放多少个窗口
+NER_MAX_WINDOW = 512
+NER_WINDOW_STRIDE = 128
+NER_WINDOW_BATCH_SIZE = 8
+
+
+def onnx_model_dir(model_name: str = DEFAULT_NER_MODEL, cache_dir: str = DEFAULT_ONNX_CACHE_DIR) -> str:
+    """
+    量化模型的缓存目录
+
+    Args:
+        model_name: HuggingFace 模型名
+        cache_dir: 缓存根目录
+
+    Returns:
+        目录路径
+    """
+    return os.path.join(cache_dir, model_name.replace('/', '--') + '-int8')
+
+
+def _quantization_config():
+    """按 CPU 架构选择动态量化配置"""
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    machine = platform.machine().lower()
+    if machine in ('arm64', 'aarch64'):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+
+def export_quantized_onnx(model_name: str = DEFAULT_NER_MODEL, cache_dir: str = DEFAULT_ONNX_CACHE_DIR,
+                          force: bool = False) -> str:
+    """
+    把模型导出为 ONNX 并做 int8 动态量化（已存在时直接复用）
+
+    Args:
+        model_name: HuggingFace 模型名
+        cache_dir: 缓存根目录
+        force: 是否忽略缓存重新导出
+
+    Returns:
+        量化模型所在目录
+    """
+    if not ONNX_AVAILABLE:
+        raise ImportError('optimum[onnxruntime] is not installed')
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from transformers import AutoTokenizer
+
+    output_dir = onnx_model_dir(model_name, cache_dir)
+    if not force and os.path.exists(os.path.join(output_dir, QUANTIZED_FILE_NAME)):
+        return output_dir
+
+    start = time.perf_counter()
+    export_dir = output_dir + '.fp32'
+    model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+
+    # 动态量化：权重 int8，激活在推理时量化，不需要校准数据
+    quantizer = ORTQuantizer.from_pretrained(export_dir)
+    quantizer.quantize(save_dir=output_dir, quantization_config=_quantization_config())
+
+    # 分词器和配置随模型一起保存，之后离线也能加载
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    print(f"[NER] Exported int8 ONNX model to {output_dir} ({time.perf_counter() - start:.1f}s)")
+    return output_dir
+
+
+def ner_window_length(tokenizer, config) -> int:
+    """
+    长文本每个窗口的子词数上限
+
+    Args:
+        tokenizer: 分词器（model_max_length 可能是没有设置上限时的哨兵值）
+        config: 模型配置（max_position_embeddings 为位置编码长度）
+
+    Returns:
+        min(tokenizer.model_max_length, config.max_position_embeddings, NER_MAX_WINDOW)
+    """
+    limits = (getattr(tokenizer, 'model_max_length', None), getattr(config, 'max_position_embeddings', None))
+    return min([NER_MAX_WINDOW] + [limit for limit in limits if isinstance(limit, int) and limit > 0])
+
+
+def configure_windowing(tokenizer, config, stride: int = NER_WINDOW_STRIDE) -> int:
+    """
+    把分词器的 model_max_length 限制到窗口上限（pipeline 按它切窗口）
+
+    Args:
+        tokenizer: 分词器（原地修改）
+        config: 模型配置
+        stride: 请求的相邻窗口重叠子词数
+
+    Returns:
+        实际使用的 stride（必须小于窗口长度，最多取窗口的一半）
+    """
+    window = ner_window_length(tokenizer, config)
+    tokenizer.model_max_length = window
+    return min(stride, window // 2)
+
+
+def create_ner_pipeline(backend: str = 'pytorch', use_gpu: bool = False, model_name: str = DEFAULT_NER_MODEL,
+                        cache_dir: str = DEFAULT_ONNX_CACHE_DIR, stride: int = NER_WINDOW_STRIDE,
+                        window_batch_size: int = NER_WINDOW_BATCH_SIZE):
+    """
+    创建 NER pipeline
+
+    Args:
+        backend: 'pytorch' 或 'onnx'（onnx 只在 CPU 上运行，忽略 use_gpu；依赖缺失时退回 pytorch）
+        use_gpu: pytorch 后端是否使用GPU
+        model_name: HuggingFace 模型名
+        cache_dir: onnx 后端的量化模型缓存根目录
+        stride: 长文本相邻窗口重叠的子词数（超过窗口一半时取窗口的一半）
+        window_batch_size: 默认每次前向计算的窗口数（调用时传 batch_size 可覆盖）
+
+    Returns:
+        (pipeline, 描述字符串)
+    """
+    backend = resolve_backend(backend)
+    if backend not in NER_BACKENDS:
+        raise ValueError(f"Unknown NER backend: {backend} (expected one of {', '.join(NER_BACKENDS)})")
+    if not TRANSFORMERS_AVAILABLE:
+        raise ImportError('transformers is not installed')
+    from transformers import AutoTokenizer, pipeline
+
+    if backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForTokenClassification
+
+        model_dir = export_quantized_onnx(model_name, cache_dir)
+        model = ORTModelForTokenClassification.from_pretrained(model_dir, file_name=QUANTIZED_FILE_NAME)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        stride = configure_windowing(tokenizer, model.config, stride)
+        ner = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple",
+                       stride=stride, batch_size=window_batch_size)
+        return ner, 'ONNX int8, CPU'
+
+    import torch
+    from transformers import AutoModelForTokenClassification
+
+    device = 0 if use_gpu and torch.cuda.is_available() else -1
+    model = AutoModelForTokenClassification.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    stride = configure_windowing(tokenizer, model.config, stride)
+    ner = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple", device=device,
+                   stride=stride, batch_size=window_batch_size)
+    return ner, 'PyTorch, ' + ('GPU' if device >= 0 else 'CPU')
+
+
+def resolve_backend(backend: Optional[str]) -> str:
+    """
+    检查后端依赖，onnx 依赖缺失时退回 pytorch
+
+    Args:
+        backend: 请求的后端（None 表示 pytorch）
+
+    Returns:
+        实际使用的后端
+    """
+    backend = backend or 'pytorch'
+    if backend == 'onnx' and not ONNX_AVAILABLE:
+        print("[NER] optimum[onnxruntime] not installed, falling back to the PyTorch backend")
+        return 'pytorch'
+    return backend
+
+
+if __name__ == '__main__':
+    # 预先导出量化模型: python onnx_ner.py
+    print(export_quantized_onnx(force=True))
@@ -5,54 +5,101 @@
 从推文文本中实时提取代币符号
 """
 
+import functools
 import re
-from typing import List, Set, Dict
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Set, Dict
 from collections import defaultdict
 
-# 尝试导入transformers
-try:
-    from transformers import pipeline
-    import torch
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+from context_scorer import ContextScorer
+from ner_batcher import MicroBatcher
+from ner_service import NERServiceClient
+from ner_workers import NER_WORKER_TIMEOUT, NERProcessPool
+from onnx_ner import DEFAULT_NER_MODEL, TRANSFORMERS_AVAILABLE, create_ner_pipeline
+from tweet_document import TweetDocument
+
+if not TRANSFORMERS_AVAILABLE:
     print("Warning: transformers not installed, using pattern-based extraction only")
 
+# 预热用的样例文本（覆盖 $ 符号、大写词和普通句子）
+WARMUP_TEXTS = [
+    "Check out $PEPE, it's mooning! Contract address: 0x123...",
+    "GM everyone! Ready for another day of trading on Solana",
+]
+
 
 class RealtimeBERTAnalyzer:
     """实时BERT代币分析器"""
     
-    def __init__(self, use_gpu=False, use_bert=True):
+    def __init__(self, use_gpu=False, use_bert=True, ner_batch_size=8, ner_batch_wait_ms=10.0,
+                 ner_backend='pytorch', background_load=False, ner_gate=None, ner_cache=None, ner_workers=0,
+                 ner_service=None, ner_model=DEFAULT_NER_MODEL, ner_callers=1):
         """
         初始化分析器
         
         Args:
             use_gpu: 是否使用GPU加速
             use_bert: 是否使用BERT (False则仅使用模式匹配)
+            ner_batch_size: 并发的 NER 请求最多合并成多大一批（1 表示不合并；不超过 ner_callers）
+            ner_batch_wait_ms: 最早的请求最多等待多久（毫秒）凑批
+            ner_backend: NER 推理后端，'pytorch' 或 'onnx'（int8 量化，仅 CPU）
+            background_load: 是否在后台线程加载并预热模型（加载完成前仅使用模式匹配）
+            ner_gate: NER 级联门控 (NERGate)，None 表示每条推文都运行 BERT
+            ner_cache: NER 结果缓存 (NERCache)，None 表示不缓存
+            ner_workers: NER 推理子进程数（0 表示在当前进程内推理；启用时各子进程自行加载模型，不再使用微批处理）
+            ner_service: 本地 NER 推理服务地址（设置时不在本进程加载模型，服务不可用时退回模式匹配）
+            ner_model: HuggingFace 上的 NER 模型名
+            ner_callers: 同时调用 extract_with_bert 的线程数（只有一个线程时批永远凑不满，不启用微批处理）
         """
         self.ner_pipeline = None
+        self.ner_batcher = None
         self.use_gpu = use_gpu
         self.use_bert = use_bert and TRANSFORMERS_AVAILABLE
+        self.ner_callers = max(1, ner_callers)
+        self.ner_batch_size = max(1, min(ner_batch_size, self.ner_callers))
+        self.ner_batch_wait_ms = ner_batch_wait_ms
+        self.ner_backend = ner_backend
+        self.ner_model = ner_model
+        self.ner_gate = ner_gate
+        self.ner_cache = ner_cache
+        self.ner_workers = max(0, ner_workers)
+        self.ner_pool = None
+        self.ner_service = ner_service
+        self.ner_cache_namespace = None  # 实际加载的模型和后端，模型就绪后才确定
+        
+        # 模型加载状态: disabled / loading / ready / failed
+        self.model_state = 'loading' if self.use_bert else 'disabled'
+        self.model_backend = None
+        self.model_load_seconds = None
+        self.model_warmup_seconds = None
+        self.model_ready_at = None
+        self.pattern_only_tweets = 0  # 模型就绪前只用模式匹配处理的推文数
+        self._stats_lock = threading.Lock()  # 多个分析线程共用计数
+        self._load_started = time.monotonic()
+        self._load_thread = None
+        self._closed = False
+        
+        # 客户端模式：模型由推理服务持有，这里只需要 use_bert（不要求安装 transformers）
+        if ner_service and use_bert:
+            self.use_bert = True
+            self.model_state = 'loading'
+            self._connect_ner_service()
         
         # 尝试加载BERT模型
-        if self.use_bert:
-            try:
-                device = 0 if use_gpu and torch.cuda.is_available() else -1
-                self.ner_pipeline = pipeline(
-                    "ner",
-                    model="dslim/bert-base-NER",
-                    aggregation_strategy="simple",
-                    device=device
-                )
-                print(f"[BERT] Model loaded successfully (device: {'GPU' if device >= 0 else 'CPU'})")
-            except Exception as e:
-                print(f"[BERT] Failed to load model: {e}")
-                print("[BERT] Using pattern-based extraction only")
-                self.ner_pipeline = None
+        elif self.use_bert:
+            if background_load:
+                print("[BERT] Loading model in background, using pattern-based extraction until ready")
+                self._load_thread = threading.Thread(target=self._load_model, daemon=True)
+                self._load_thread.start()
+            else:
+                self._load_model()
         
         # 正则模式
         self.token_pattern = re.compile(r'\$([A-Z][A-Z0-9]{1,10})\b')
         self.upper_token_pattern = re.compile(r'\b([A-Z]{2,10})\b')
+        self.special_char_pattern = re.compile(r'[^\w\s]')
         
         # 加密货币相关关键词
         self.crypto_keywords = {
@@ -61,6 +108,8 @@ class RealtimeBERTAnalyzer:
             'contract', 'address', 'wallet', 'hodl', 'bull', 'bear', 'ath',
             'ca', 'contract address', 'launched', 'fair launch'
         }
+        # 关键词一次扫描（没有传入预处理文档时使用）
+        self.keyword_scorer = ContextScorer(self.crypto_keywords)
         
         # 停用词
         self.stopwords = {
@@ -71,27 +120,159 @@ class RealtimeBERTAnalyzer:
             'WE', 'WHO', 'WHY', 'WHEN', 'WHERE', 'WHICH', 'WHAT', 'THEY',
         }
     
-    def calculate_crypto_score(self, text: str) -> float:
+    def _load_model(self):
+        """加载并预热模型，完成后切换到 BERT + 模式匹配"""
+        try:
+            if self.ner_workers:
+                self._start_ner_pool()
+                return
+            
+            ner_pipeline, backend_desc = create_ner_pipeline(self.ner_backend, use_gpu=self.use_gpu,
+                                                             model_name=self.ner_model)
+            load_seconds = time.monotonic() - self._load_started
+            
+            # 预热：首次推理时的线程池、内存分配等开销在这里付掉，不留给第一条真实推文
+            warmup_start = time.monotonic()
+            ner_pipeline(WARMUP_TEXTS[0])
+            if self.ner_batch_size > 1:
+                warmup_batch = (WARMUP_TEXTS * self.ner_batch_size)[:self.ner_batch_size]
+                ner_pipeline(warmup_batch, batch_size=len(warmup_batch))
+            warmup_seconds = time.monotonic() - warmup_start
+            if self._closed:
+                return
+            
+            # 并发请求合并成一批推理
+            ner_batcher = None
+            if self.ner_batch_size > 1:
+                ner_batcher = MicroBatcher(
+                    self._run_ner_batch,
+                    max_batch_size=self.ner_batch_size,
+                    max_wait_ms=self.ner_batch_wait_ms,
+                    max_concurrency=self.ner_callers
+                )
+            
+            # 切换：先放批处理器再放 pipeline，调用方看到 pipeline 时批处理器已就绪
+            self.ner_cache_namespace = f"{self.ner_model}:{backend_desc}"
+            self.ner_batcher = ner_batcher
+            self.ner_pipeline = ner_pipeline
+            self.model_backend = backend_desc
+            self.model_load_seconds = load_seconds
+            self.model_warmup_seconds = warmup_seconds
+            self.model_ready_at = datetime.now()
+            self.model_state = 'ready'
+            
+            print(f"[BERT] Model loaded successfully (backend: {backend_desc}, "
+                  f"load: {load_seconds:.1f}s, warmup: {warmup_seconds:.2f}s)")
+            if ner_batcher:
+                print(f"[BERT] Micro-batching enabled (batch size: {self.ner_batch_size}, "
+                      f"max wait: {self.ner_batch_wait_ms}ms)")
+            if self.pattern_only_tweets:
+                print(f"[BERT] Switched from pattern-only mode after {self.pattern_only_tweets} tweet(s)")
+        except Exception as e:
+            print(f"[BERT] Failed to load model: {e}")
+            print("[BERT] Using pattern-based extraction only")
+            self.ner_pipeline = None
+            self.model_state = 'failed'
+    
+    def _start_ner_pool(self):
+        """启动推理子进程（模型只在子进程中加载和预热，父进程不加载），完成后切换到进程池"""
+        loader = functools.partial(create_ner_pipeline, self.ner_backend, use_gpu=self.use_gpu,
+                                   model_name=self.ner_model)
+        ner_pool = NERProcessPool(loader, workers=self.ner_workers, warmup_text=WARMUP_TEXTS[0])
+        try:
+            backend_desc = ner_pool.start()
+        except BaseException:
+            ner_pool.close()
+            raise
+        load_seconds = time.monotonic() - self._load_started
+        if self._closed:
+            ner_pool.close()
+            return
+        
+        # 切换：先放进程池再放 pipeline（进程池本身可以像 pipeline 一样调用），调用方看到 pipeline 时进程池已就绪
+        self.ner_cache_namespace = f"{self.ner_model}:{backend_desc}"
+        self.ner_pool = ner_pool
+        self.ner_pipeline = ner_pool
+        self.model_backend = f"{backend_desc}, {self.ner_workers} worker process(es)"
+        self.model_load_seconds = load_seconds
+        self.model_ready_at = datetime.now()
+        self.model_state = 'ready'
+        
+        print(f"[BERT] Model loaded successfully (backend: {self.model_backend}, "
+              f"load and warmup in workers: {load_seconds:.1f}s)")
+        if self.pattern_only_tweets:
+            print(f"[BERT] Switched from pattern-only mode after {self.pattern_only_tweets} tweet(s)")
+    
+    def _connect_ner_service(self):
+        """客户端模式：用推理服务客户端代替 pipeline（服务端凑批，本进程不再使用微批处理和进程池）"""
+        client = NERServiceClient(self.ner_service)
+        if client.ping():
+            print(f"[BERT] Using NER service at {self.ner_service}")
+        else:
+            print(f"[BERT] NER service at {self.ner_service} is unavailable, "
+                  f"using pattern-based extraction until it comes up")
+        self.ner_pipeline = client
+        self.model_backend = f"service at {self.ner_service}"
+        self.model_load_seconds = time.monotonic() - self._load_started
+        self.model_ready_at = datetime.now()
+        self.model_state = 'ready'
+    
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """
+        等待后台模型加载结束
+        
+        Args:
+            timeout: 最长等待秒数（None 表示一直等）
+            
+        Returns:
+            模型是否可用
+        """
+        if self._load_thread:
+            self._load_thread.join(timeout)
+        return self.ner_pipeline is not None
+    
+    def get_model_status(self) -> Dict:
+        """
+        获取模型加载状态
+        
+        Returns:
+            状态字典（状态、后端、加载 / 预热耗时、就绪前仅模式匹配的推文数）
+        """
+        return {
+            'state': self.model_state,
+            'backend': self.model_backend,
+            'load_seconds': round(self.model_load_seconds, 2) if self.model_load_seconds is not None else None,
+            'warmup_seconds': round(self.model_warmup_seconds, 2) if self.model_warmup_seconds is not None else None,
+            'ready_at': self.model_ready_at.isoformat() if self.model_ready_at else None,
+            'pattern_only_tweets': self.pattern_only_tweets,
+        }
+    
+    def calculate_crypto_score(self, text: str, document: TweetDocument = None) -> float:
         """
         计算文本的加密货币相关度分数
         
         Args:
             text: 文本内容
+            document: 预处理好的推文文档（传入时直接复用，text 应为其 combined_text）
             
         Returns:
             分数 (0-1)
         """
-        text_lower = text.lower()
-        word_count = len(text_lower.split())
+        if document is None:
+            document = TweetDocument.from_text(text, self.keyword_scorer)
+        word_count = document.word_count
         
         if word_count == 0:
             return 0.0
         
-        # 统计关键词出现次数
-        keyword_count = sum(1 for keyword in self.crypto_keywords if keyword in text_lower)
+        # 统计关键词出现次数（文档中已扫描过关键词时直接取结果）
+        if document.covers_keywords(self.crypto_keywords):
+            keyword_count = len(document.present_keywords() & self.crypto_keywords)
+        else:
+            keyword_count = sum(1 for keyword in self.crypto_keywords if keyword in document.lower_text)
         
         # $ 符号权重更高
-        dollar_count = text.count('$')
+        dollar_count = document.dollar_count
         
         # 综合指示符数量
         total_indicators = keyword_count + (dollar_count * 2)
@@ -118,23 +299,119 @@ class RealtimeBERTAnalyzer:
             return []
         
         try:
-            # 限制长度避免内存问题
-            max_length = 512
-            if len(text) > max_length:
-                text = text[:max_length]
+            # 长文本由 pipeline 按子词切成重叠窗口并合并实体，不在这里截断
+            # 相同文本（转推、引用、重放）直接取缓存结果（按实际使用的模型和后端区分）
+            namespace = self._cache_namespace()
+            if namespace is not None:
+                entities = self.ner_cache.get(text, namespace)
+                if entities is not None:
+                    return entities
             
-            entities = self.ner_pipeline(text)
+            if self.ner_pool:
+                entities = self.ner_pool(text, timeout=NER_WORKER_TIMEOUT)
+            elif self.ner_batcher:
+                entities = self.ner_batcher(text)
+            else:
+                entities = self.ner_pipeline(text)
+            
+            # 客户端模式下首次请求时才握手得知服务端的模型和后端
+            namespace = namespace or self._cache_namespace()
+            if namespace is not None:
+                self.ner_cache.put(text, entities, namespace)
             return entities
         except Exception as e:
             print(f"[BERT] Error during processing: {e}")
             return []
     
-    def extract_with_patterns(self, text: str) -> Set[str]:
+    def _cache_namespace(self):
+        """
+        NER 缓存的命名空间：实际加载的模型和后端；客户端模式下为服务端告知的模型和后端
+        
+        Returns:
+            命名空间字符串；未启用缓存或还不知道模型和后端时为 None（不读写缓存）
+        """
+        if self.ner_cache is None:
+            return None
+        if isinstance(self.ner_pipeline, NERServiceClient):
+            return self.ner_pipeline.namespace
+        return self.ner_cache_namespace
+    
+    def _run_ner_batch(self, texts: List[str]) -> List[List[Dict]]:
+        """
+        一次推理一批文本（由微批处理线程调用）
+        
+        Args:
+            texts: 文本列表
+            
+        Returns:
+            与输入等长的实体列表
+        """
+        return self.ner_pipeline(texts, batch_size=len(texts))
+    
+    def get_ner_batch_stats(self) -> Dict:
+        """
+        获取 NER 微批处理统计（批大小分布等）
+        
+        Returns:
+            统计信息字典，未启用微批处理时为空
+        """
+        return self.ner_batcher.get_stats() if self.ner_batcher else {}
+    
+    def get_ner_gate_stats(self) -> Dict:
+        """
+        获取 NER 级联门控统计（各廉价阶段命中数、NER 运行 / 跳过次数）
+        
+        Returns:
+            统计信息字典，未配置门控时为空
+        """
+        return self.ner_gate.get_stats() if self.ner_gate else {}
+    
+    def get_ner_cache_stats(self) -> Dict:
+        """
+        获取 NER 结果缓存统计（命中率等）
+        
+        Returns:
+            统计信息字典，未启用缓存时为空
+        """
+        if not self.ner_cache:
+            return {}
+        stats = self.ner_cache.get_stats()
+        stats['namespace'] = self._cache_namespace()
+        return stats
+    
+    def get_ner_pool_stats(self) -> Dict:
+        """
+        获取 NER 推理进程池统计
+        
+        Returns:
+            统计信息字典，未启用进程池时为空
+        """
+        return self.ner_pool.get_stats() if self.ner_pool else {}
+    
+    def get_ner_service_stats(self) -> Dict:
+        """
+        获取推理服务客户端统计
+        
+        Returns:
+            统计信息字典，未使用推理服务时为空
+        """
+        return self.ner_pipeline.get_stats() if isinstance(self.ner_pipeline, NERServiceClient) else {}
+    
+    def close(self):
+        """停止微批处理线程和推理子进程"""
+        self._closed = True
+        if self.ner_pool:
+            self.ner_pool.close()
+        if self.ner_batcher:
+            self.ner_batcher.close()
+    
+    def extract_with_patterns(self, text: str, document: TweetDocument = None) -> Set[str]:
         """
         使用正则模式提取代币符号
         
         Args:
             text: 文本内容
+            document: 预处理好的推文文档（传入时直接使用其中的 $ 符号和大写词）
             
         Returns:
             代币符号集合
@@ -142,24 +419,28 @@ class RealtimeBERTAnalyzer:
         tokens = set()
         
         # $符号标记的代币
-        dollar_tokens = self.token_pattern.findall(text)
+        dollar_tokens = document.cashtags if document else self.token_pattern.findall(text)
         tokens.update([t.upper() for t in dollar_tokens])
         
         # 全大写词汇 (2-10字符)
-        upper_tokens = self.upper_token_pattern.findall(text)
+        upper_tokens = document.upper_runs if document else self.upper_token_pattern.findall(text)
         for token in upper_tokens:
             if self._is_valid_token(token):
                 tokens.add(token)
         
         return tokens
     
-    def extract_tokens(self, text: str, tweet_data: Dict = None) -> List[Dict]:
+    def extract_tokens(self, text: str, tweet_data: Dict = None, document: TweetDocument = None,
+                       known_symbols: Iterable[str] = (), log=print) -> List[Dict]:
         """
         从文本中提取代币符号
         
         Args:
             text: 推文文本
             tweet_data: 完整的推文数据 (可选)
+            document: 预处理好的推文文档 (可选，text 应为其 combined_text)
+            known_symbols: Redis 已知 token 的匹配结果 (可选，供 NER 门控使用)
+            log: 调试输出函数（默认 print；多线程分析时传入每条推文自己的缓冲）
             
         Returns:
             提取的代币列表，每个代币包含: {symbol, confidence, source, context_score}
@@ -167,18 +448,30 @@ class RealtimeBERTAnalyzer:
         results = []
         seen_tokens = set()
         
+        # 文本只预处理一次，下面各方法共用
+        if document is None:
+            document = TweetDocument.from_text(text, self.keyword_scorer)
+        
         # 计算上下文相关度
-        context_score = self.calculate_crypto_score(text)
+        context_score = self.calculate_crypto_score(text, document)
         
         # 【批量版本逻辑】不再使用硬性过滤，context_score只作为评分因素
         # 注释掉原来的早期退出逻辑：
         # if context_score < 0.1:
         #     return results
         
-        print(f"[BERT Analyzer] Context score: {context_score:.2f}")
-        
-        # 方法1: BERT提取（无论context_score多少都执行）
-        if self.ner_pipeline:
+        log(f"[BERT Analyzer] Context score: {context_score:.2f}")
+        
+        # 方法1: BERT提取（配置了门控时只在通过门控或廉价阶段结果不明确时执行；后台加载未完成时跳过）
+        if not self.ner_pipeline and self.model_state == 'loading':
+            with self._stats_lock:
+                self.pattern_only_tweets += 1
+        run_ner = self.ner_pipeline is not None
+        if run_ner and self.ner_gate:
+            run_ner, reason = self.ner_gate.decide(document, context_score, known_symbols)
+            if not run_ner:
+                log(f"[BERT Analyzer] Skipping NER ({reason})")
+        if run_ner:
             try:
                 entities = self.extract_with_bert(text)
                 for entity in entities:
@@ -201,7 +494,7 @@ class RealtimeBERTAnalyzer:
                 pass
         
         # 方法2: 模式匹配（无论context_score多少都执行）
-        pattern_tokens = self.extract_with_patterns(text)
+        pattern_tokens = self.extract_with_patterns(text, document)
         for token in pattern_tokens:
             if token not in seen_tokens:
                 seen_tokens.add(token)
@@ -246,7 +539,7 @@ class RealtimeBERTAnalyzer:
             标准化后的符号
         """
         # 移除特殊字符
-        normalized = re.sub(r'[^\w\s]', '', token)
+        normalized = self.special_char_pattern.sub('', token)
         
         # 移除多余空格
         normalized = ' '.join(normalized.split())
@@ -293,48 +586,44 @@ class RealtimeBERTAnalyzer:
         
         return True
     
-    def analyze_tweet(self, tweet_data: Dict) -> Dict:
+    def analyze_tweet(self, tweet_data: Dict, document: TweetDocument = None,
+                      known_symbols: Iterable[str] = (), log=print) -> Dict:
         """
         分析完整的推文数据
         
         Args:
             tweet_data: 推文数据字典
+            document: 预处理好的推文文档（由检测器构建并在各阶段共享，可选）
+            known_symbols: Redis 已知 token 的匹配结果（可选，供 NER 门控使用）
+            log: 调试输出函数（默认 print；多线程分析时传入每条推文自己的缓冲）
             
         Returns:
             分析结果 {text, tokens, timestamp, metadata}
         """
+        # 预处理推文（正文 + replyToStatus + quotedStatus 合并、分词、关键词扫描）
+        if document is None:
+            document = TweetDocument(tweet_data, self.keyword_scorer)
+        
         # 获取主推文内容
-        text = tweet_data.get('text', '')
+        text = document.text
         
         # DEBUG: 显示正在分析的文本
-        print(f"[BERT Analyzer] Analyzing text: {text[:100]}{'...' if len(text) > 100 else ''}")
+        log(f"[BERT Analyzer] Analyzing text: {text[:100]}{'...' if len(text) > 100 else ''}")
         
         # 合并相关文本内容
-        combined_text = text
-        
-        # 添加 replyToStatus 内容
-        if 'replyToStatus' in tweet_data and tweet_data['replyToStatus']:
-            reply_text = tweet_data['replyToStatus'].get('text', '')
-            if reply_text:
-                combined_text += ' ' + reply_text
-        
-        # 添加 quotedStatus 内容
-        if 'quotedStatus' in tweet_data and tweet_data['quotedStatus']:
-            quoted_text = tweet_data['quotedStatus'].get('text', '')
-            if quoted_text:
-                combined_text += ' ' + quoted_text
+        combined_text = document.combined_text
         
         # 提取代币
-        tokens = self.extract_tokens(combined_text, tweet_data)
+        tokens = self.extract_tokens(combined_text, tweet_data, document, known_symbols, log)
         
         # DEBUG: 显示提取结果
         if tokens:
-            print(f"[BERT Analyzer] Extracted {len(tokens)} token(s):")
+            log(f"[BERT Analyzer] Extracted {len(tokens)} token(s):")
             for token_info in tokens:
-                print(f"  - ${token_info['symbol']} (confidence: {token_info['confidence']:.2f}, "
-                      f"context: {token_info['context_score']:.2f}, source: {token_info['source']})")
+                log(f"  - ${token_info['symbol']} (confidence: {token_info['confidence']:.2f}, "
+                    f"context: {token_info['context_score']:.2f}, source: {token_info['source']})")
         else:
-            print(f"[BERT Analyzer] No tokens extracted")
+            log(f"[BERT Analyzer] No tokens extracted")
         
         # 构建结果
         result = {
@@ -5,17 +5,32 @@ Redis Token 匹配器
 在消息中快速匹配 Redis 中已保存的 token_symbol
 """
 
-import re
+import gc
+import json
+import multiprocessing
+import os
+import threading
+import time
 import redis
-from typing import List, Dict, Set, Tuple
+from typing import Iterable, Iterator, List, Dict, Tuple
 from datetime import datetime
 
+from token_index import TokenIndex, PackedTokenDetails, encode_details
+from context_scorer import ContextScorer
+
+
+# 默认的索引磁盘快照位置（冷启动 / Redis 不可用时从这里加载）
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'token_index.snapshot')
+
 
 class RedisTokenMatcher:
-    """Redis Token 匹配器 - 用正则快速匹配消息中的已知 token"""
+    """Redis Token 匹配器 - 用自动机快速匹配消息中的已知 token"""
     
     def __init__(self, redis_host='127.0.0.1', redis_port=6379, redis_db=0,
-                 redis_set_key='nlpmeme:tokens:all', redis_key_prefix='nlpmeme:token:'):
+                 redis_set_key='nlpmeme:tokens:all', redis_key_prefix='nlpmeme:token:',
+                 refresh_batch_size=1000, redis_stream_key='nlpmeme:tokens:changes',
+                 subscribe_changes=True, snapshot_path=DEFAULT_SNAPSHOT_PATH, redis_client=None,
+                 background_refresh=True):
         """
         初始化匹配器
         
@@ -25,37 +40,106 @@ class RedisTokenMatcher:
             redis_db: Redis 数据库编号
             redis_set_key: 存储所有 token 的集合 key
             redis_key_prefix: Token 详情的 key 前缀
+            refresh_batch_size: 刷新缓存时每批 SSCAN / pipeline HGETALL 的 key 数量
+            redis_stream_key: token 增删变更流的 key（由 TokenMonitor 等写入方发布）
+            subscribe_changes: 是否订阅变更流，实时增量更新缓存
+            snapshot_path: 索引磁盘快照路径，每次全量刷新后写入，启动时先加载；None 表示不使用。
+                           快照记录了来源（Redis 地址、集合 key、key 前缀），来源不一致时不加载
+            redis_client: 已创建的 Redis 客户端（需 decode_responses=True，如基准测试用的 fakeredis），
+                          传入时不再按 host/port 新建连接
+            background_refresh: 启动时有快照则先用快照匹配、在后台从 Redis 全量加载；
+                                False 时同步从 Redis 加载（批量回溯用），Redis 不可用时才退回快照
         """
         self.redis_host = redis_host
         self.redis_port = redis_port
         self.redis_db = redis_db
         self.redis_set_key = redis_set_key
         self.redis_key_prefix = redis_key_prefix
+        self.refresh_batch_size = refresh_batch_size
+        self.redis_stream_key = redis_stream_key
+        self.snapshot_path = snapshot_path
         
         # 连接 Redis
         try:
-            self.redis_client = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                decode_responses=True
-            )
+            if redis_client is not None:
+                self.redis_client = redis_client
+            else:
+                self.redis_client = redis.Redis(
+                    host=redis_host,
+                    port=redis_port,
+                    db=redis_db,
+                    decode_responses=True
+                )
             self.redis_client.ping()
             print(f"[RedisTokenMatcher] Connected to Redis: {redis_host}:{redis_port}")
         except Exception as e:
             print(f"[RedisTokenMatcher] Failed to connect to Redis: {e}")
             self.redis_client = None
         
-        # Token 符号缓存（用于快速匹配）
-        self.token_symbols_cache: Set[str] = set()
-        self.token_details_cache: Dict[str, Dict] = {}
+        # 已知 token 的索引快照（符号、详情、自动机），匹配时只读，刷新时整体替换
+        self.index = TokenIndex()
+        self._index_lock = threading.Lock()  # 串行化快照替换与增量更新
+        
+        # 后台刷新状态
+        self._refresh_lock = threading.Lock()  # 同一时间只做一次全量刷新
+        self._refresh_thread = None
+        self._pending_changes: List[Tuple] = None  # 刷新期间收到的增量，新快照替换前重放
+        
+        # 停用词（避免误匹配常见大写词）
+        self.stopwords = {'THE', 'AND', 'FOR', 'ARE', 'BUT', 'NOT', 'YOU', 'ALL', 
+                          'CAN', 'WAS', 'GET', 'GOT', 'NEW', 'NOW', 'OUT', 'DAY',
+                          'WHO', 'WHY', 'HOW', 'WHAT', 'WHEN', 'WHERE'}
+        
+        # 加密货币相关关键词（英文 + 中文），用于计算 token 周围的上下文分数
+        self.crypto_keywords = {
+            # 英文关键词
+            'crypto', 'token', 'coin', 'blockchain', 'defi', 'nft', 'meme',
+            'launch', 'pump', 'moon', 'buy', 'sell', 'trade', 'dex', 'swap',
+            'contract', 'address', 'ca', 'launched', '$',
+            # 中文关键词
+            '代币', '币', '区块链', '加密', '发布', '上线', '启动', '购买',
+            '买入', '卖出', '交易', '合约', '地址', '登月', 'pump', 'moon',
+            '冲', '涨', '暴涨', '飞', '起飞', '新币', '项目', '发行',
+            'DexScreener', 'dex', 'pancakeswap'
+        }
+        self.context_scorer = ContextScorer(self.crypto_keywords, window=50)
         
         # 上次刷新缓存的时间
         self.last_cache_refresh = None
         self.cache_refresh_interval = 300  # 5分钟刷新一次缓存
         
-        # 加载初始数据
-        self._refresh_cache()
+        # 上次尝试刷新的时间与连续失败次数（失败后按指数退避重试，不在每条推文上重试）
+        self.last_refresh_attempt = None
+        self.refresh_failures = 0
+        self.refresh_retry_interval = 30
+        
+        # 上次刷新的开销统计（耗时、key 数量、传输字节数）
+        self.last_refresh_stats: Dict = {}
+        
+        # 变更流消费状态
+        self.last_change_id = '0-0'
+        self.changes_applied = 0
+        self.change_feed_thread = None
+        self._stop_event = threading.Event()
+        
+        # 先记下变更流位置再全量加载，加载期间发生的变更随后会从流中补上
+        if subscribe_changes and self.redis_client:
+            self.last_change_id = self._get_stream_last_id()
+        
+        # 有磁盘快照时先用它立即开始匹配，全量数据在后台加载；否则同步加载
+        if background_refresh:
+            if self._load_snapshot() and self.redis_client:
+                self._schedule_refresh()
+            else:
+                self._refresh_cache()
+        elif not self._refresh_cache() and self._load_snapshot():
+            print("[RedisTokenMatcher] Warning: Redis unavailable, matching against the on-disk snapshot "
+                  "(may be stale)")
+        
+        # 启动变更流消费线程（同时负责定期全量同步）
+        if subscribe_changes and self.redis_client:
+            self.change_feed_thread = threading.Thread(target=self._change_feed_worker, daemon=True)
+            self.change_feed_thread.start()
     
     def _refresh_cache(self) -> bool:
         """
@@ -64,49 +148,282 @@ class RedisTokenMatcher:
         Returns:
             是否刷新成功
         """
+        self.last_refresh_attempt = datetime.now()
         if not self.redis_client:
+            self.refresh_failures += 1
             return False
         
+        with self._refresh_lock:
+            self.last_refresh_attempt = datetime.now()
+            success = self._load_index()
+        self.refresh_failures = 0 if success else self.refresh_failures + 1
+        return success
+    
+    def _load_index(self) -> bool:
+        """
+        从 Redis 全量加载并构建新快照，构建期间匹配继续使用旧快照
+        
+        Returns:
+            是否加载成功
+        """
+        # 从此刻起收到的增量先记下，新快照替换前重放，避免被全量数据覆盖
+        with self._index_lock:
+            self._pending_changes = []
+        
         try:
             print("[RedisTokenMatcher] Refreshing token cache from Redis...")
             
-            # 获取所有 token keys
-            token_keys = self.redis_client.smembers(self.redis_set_key)
+            start_time = time.perf_counter()
+            key_count = 0
+            byte_count = 0
             
             # 提取 symbol
             new_symbols = set()
-            new_details = {}
+            new_details: Dict[str, bytes] = {}  # 详情立即编码为紧凑 JSON，不保留每个 hash 的 dict
+            new_names = set()  # (token 名称, symbol)
             
-            for token_key_str in token_keys:
-                # token_key_str 格式: "symbol:name"
-                parts = token_key_str.split(':', 1)
-                if len(parts) >= 1:
-                    symbol = parts[0]
-                    # 对英文转大写，中文保持原样
-                    if symbol.encode('utf-8').isalpha() and symbol.isascii():
-                        symbol_normalized = symbol.upper()
-                    else:
-                        symbol_normalized = symbol
+            # 用 SSCAN 分批流式读取 token keys，每批用一次 pipeline 取回全部详情
+            for token_keys in self._iter_token_key_batches():
+                pipe = self.redis_client.pipeline(transaction=False)
+                for token_key_str in token_keys:
+                    pipe.hgetall(f"{self.redis_key_prefix}{token_key_str}")
+                batch_details = pipe.execute()
+                
+                for token_key_str, token_data in zip(token_keys, batch_details):
+                    key_count += 1
+                    byte_count += len(token_key_str.encode('utf-8'))
                     
+                    symbol_normalized = self._symbol_from_token_key(token_key_str)
                     new_symbols.add(symbol_normalized)
+                    new_names.add((self._name_from_token_key(token_key_str), symbol_normalized))
                     
-                    # 获取详细信息
-                    redis_key = f"{self.redis_key_prefix}{token_key_str}"
-                    token_data = self.redis_client.hgetall(redis_key)
                     if token_data:
-                        new_details[symbol_normalized] = token_data
+                        new_names.add((token_data.get('name'), symbol_normalized))
+                        byte_count += sum(len(field.encode('utf-8')) + len(value.encode('utf-8'))
+                                          for field, value in token_data.items())
+                        new_details[symbol_normalized] = encode_details(token_data)
+            
+            new_index = TokenIndex(new_symbols, PackedTokenDetails.from_encoded(new_details), names=new_names)
+            del new_details
+            
+            # 原子替换快照
+            with self._index_lock:
+                for op, symbol_normalized, token_data in self._pending_changes:
+                    if op == 'add':
+                        new_index = new_index.with_added(symbol_normalized, token_data)
+                    else:
+                        new_index = new_index.with_removed(symbol_normalized)
+                self.index = new_index
+                self._pending_changes = None
+            
+            self._save_snapshot(new_index)
             
-            self.token_symbols_cache = new_symbols
-            self.token_details_cache = new_details
             self.last_cache_refresh = datetime.now()
+            self.last_refresh_stats = {
+                'duration_seconds': round(time.perf_counter() - start_time, 3),
+                'keys': key_count,
+                'bytes': byte_count,
+            }
             
-            print(f"[RedisTokenMatcher] Cache refreshed: {len(self.token_symbols_cache)} tokens loaded")
+            print(f"[RedisTokenMatcher] Cache refreshed: {len(new_index)} tokens loaded "
+                  f"({key_count} keys, {byte_count / 1024:.1f} KB, "
+                  f"{self.last_refresh_stats['duration_seconds']:.2f}s, "
+                  f"index built in {new_index.build_seconds:.2f}s)")
             return True
             
         except Exception as e:
+            with self._index_lock:
+                self._pending_changes = None
             print(f"[RedisTokenMatcher] Failed to refresh cache: {e}")
             return False
     
+    def _load_snapshot(self) -> bool:
+        """
+        从磁盘快照加载索引（mmap，详情按需读取）
+        
+        Returns:
+            是否加载成功
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        
+        try:
+            index = TokenIndex.load_snapshot(self.snapshot_path, self._snapshot_source())
+        except Exception as e:
+            print(f"[RedisTokenMatcher] Failed to load index snapshot: {e}")
+            return False
+        
+        with self._index_lock:
+            self.index = index
+        
+        print(f"[RedisTokenMatcher] Loaded {len(index)} tokens from snapshot {self.snapshot_path} "
+              f"(saved {index.built_at.isoformat()}, index built in {index.build_seconds:.2f}s)")
+        return True
+    
+    def _save_snapshot(self, index: TokenIndex):
+        """把索引写入磁盘快照，失败只打印日志"""
+        if not self.snapshot_path:
+            return
+        
+        try:
+            index.save_snapshot(self.snapshot_path, self._snapshot_source())
+        except Exception as e:
+            print(f"[RedisTokenMatcher] Failed to save index snapshot: {e}")
+    
+    def _snapshot_source(self) -> Dict:
+        """快照的数据来源（指向其他 Redis 或 key 命名空间的匹配器不会加载这份快照）"""
+        return {
+            'redis': f"{self.redis_host}:{self.redis_port}/{self.redis_db}",
+            'set_key': self.redis_set_key,
+            'key_prefix': self.redis_key_prefix,
+        }
+    
+    def _schedule_refresh(self):
+        """在后台线程中刷新缓存（已有刷新在进行时直接返回）"""
+        with self._index_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh_cache, daemon=True)
+            self._refresh_thread.start()
+    
+    @staticmethod
+    def _normalize_symbol(symbol: str) -> str:
+        """对英文转大写，中文保持原样"""
+        if symbol.encode('utf-8').isalpha() and symbol.isascii():
+            return symbol.upper()
+        return symbol
+    
+    def _symbol_from_token_key(self, token_key_str: str) -> str:
+        """从 "symbol:name" 格式的 token key 中取出标准化后的 symbol"""
+        return self._normalize_symbol(token_key_str.split(':', 1)[0])
+    
+    @staticmethod
+    def _name_from_token_key(token_key_str: str) -> str:
+        """从 "symbol:name" 格式的 token key 中取出 name（没有时返回空字符串）"""
+        parts = token_key_str.split(':', 1)
+        return parts[1] if len(parts) == 2 else ''
+    
+    def _get_stream_last_id(self) -> str:
+        """
+        获取变更流中最后一条消息的 ID
+        
+        Returns:
+            消息 ID，流不存在或为空时返回 '0-0'
+        """
+        try:
+            entries = self.redis_client.xrevrange(self.redis_stream_key, count=1)
+            return entries[0][0] if entries else '0-0'
+        except Exception as e:
+            print(f"[RedisTokenMatcher] Failed to read change stream position: {e}")
+            return '0-0'
+    
+    def _change_feed_worker(self):
+        """变更流消费线程：阻塞读取增删事件并立即应用，到期时做一次全量同步兜底"""
+        print(f"[RedisTokenMatcher] Subscribed to change stream: {self.redis_stream_key}")
+        
+        while not self._stop_event.is_set():
+            if self._should_refresh_cache():
+                self._schedule_refresh()
+            
+            try:
+                entries = self.redis_client.xread(
+                    {self.redis_stream_key: self.last_change_id},
+                    count=self.refresh_batch_size,
+                    block=1000
+                )
+            except Exception as e:
+                print(f"[RedisTokenMatcher] Failed to read change stream: {e}")
+                self._stop_event.wait(5)
+                continue
+            
+            for _, messages in entries or []:
+                for message_id, fields in messages:
+                    try:
+                        self._apply_change(fields)
+                    except Exception as e:
+                        print(f"[RedisTokenMatcher] Failed to apply change {message_id}: {e}")
+                    self.last_change_id = message_id
+        
+        print("[RedisTokenMatcher] Change stream consumer stopped")
+    
+    def _apply_change(self, fields: Dict):
+        """
+        把一条变更事件应用到本地缓存
+        
+        Args:
+            fields: 事件字段 {op: add/remove, key: "symbol:name", 以及 add 时的 token 详情}
+        """
+        op = fields.get('op')
+        token_key_str = fields.get('key', '')
+        if not token_key_str:
+            return
+        
+        symbol_normalized = self._symbol_from_token_key(token_key_str)
+        
+        if op == 'add':
+            token_data = {k: v for k, v in fields.items() if k not in ('op', 'key')}
+            if not token_data.get('name') and self._name_from_token_key(token_key_str):
+                token_data['name'] = self._name_from_token_key(token_key_str)
+            self._update_index(op, symbol_normalized, token_data)
+            self.changes_applied += 1
+            print(f"[RedisTokenMatcher] Token added via change stream: {symbol_normalized}")
+        
+        elif op == 'remove':
+            # 同一 symbol 可能对应多个 token key，仍有其他 key 时保留
+            symbol = token_key_str.split(':', 1)[0]
+            if self._symbol_has_token_keys(symbol):
+                return
+            
+            self._update_index(op, symbol_normalized, None)
+            self.changes_applied += 1
+            print(f"[RedisTokenMatcher] Token removed via change stream: {symbol_normalized}")
+    
+    def _update_index(self, op: str, symbol_normalized: str, token_data: Dict = None):
+        """
+        生成包含一条增量的新快照并替换
+        
+        Args:
+            op: 'add' 或 'remove'
+            symbol_normalized: 标准化后的符号
+            token_data: add 时的 token 详情
+        """
+        with self._index_lock:
+            if op == 'add':
+                self.index = self.index.with_added(symbol_normalized, token_data)
+            else:
+                self.index = self.index.with_removed(symbol_normalized)
+            
+            if self._pending_changes is not None:
+                self._pending_changes.append((op, symbol_normalized, token_data))
+    
+    def _symbol_has_token_keys(self, symbol: str) -> bool:
+        """检查 Redis 集合中是否还有以该 symbol 开头的 token key"""
+        pattern = ''.join(f'\\{ch}' if ch in '*?[]\\' else ch for ch in symbol) + ':*'
+        for _ in self.redis_client.sscan_iter(self.redis_set_key, match=pattern, count=self.refresh_batch_size):
+            return True
+        return False
+    
+    def _iter_token_key_batches(self):
+        """
+        用 SSCAN 分批遍历 token 集合，避免一次 SMEMBERS 取回全部 key
+        （SSCAN 可能重复返回同一元素，这里顺便去重）
+        
+        Yields:
+            每批最多 refresh_batch_size 个 token key（格式: "symbol:name"）
+        """
+        seen = set()
+        batch = []
+        for token_key_str in self.redis_client.sscan_iter(self.redis_set_key, count=self.refresh_batch_size):
+            if token_key_str in seen:
+                continue
+            seen.add(token_key_str)
+            batch.append(token_key_str)
+            if len(batch) >= self.refresh_batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
     def _should_refresh_cache(self) -> bool:
         """
         判断是否需要刷新缓存
@@ -114,10 +431,19 @@ class RedisTokenMatcher:
         Returns:
             是否需要刷新
         """
+        now = datetime.now()
+        
+        # 上次刷新失败（如 Redis 不可用）：等退避时间过去再重试
+        if self.refresh_failures and self.last_refresh_attempt:
+            backoff = min(self.cache_refresh_interval,
+                          self.refresh_retry_interval * 2 ** (self.refresh_failures - 1))
+            return (now - self.last_refresh_attempt).total_seconds() >= backoff
+        
         if not self.last_cache_refresh:
-            return True
+            # 首次加载还在进行时不重复调度
+            return not self._refresh_lock.locked()
         
-        elapsed = (datetime.now() - self.last_cache_refresh).total_seconds()
+        elapsed = (now - self.last_cache_refresh).total_seconds()
         return elapsed >= self.cache_refresh_interval
     
     def match_tokens_in_text(self, text: str, auto_refresh=True) -> List[Dict]:
@@ -134,164 +460,233 @@ class RedisTokenMatcher:
         if not text:
             return []
         
-        # 检查是否需要刷新缓存
-        if auto_refresh and self._should_refresh_cache():
-            self._refresh_cache()
+        # 检查是否需要刷新缓存（在后台进行，不阻塞本次匹配；订阅了变更流时由消费线程负责）
+        if auto_refresh and not self.is_change_feed_running() and self._should_refresh_cache():
+            self._schedule_refresh()
+        
+        # 整次匹配使用同一个快照
+        return self._match_in_index(self.index, text)
+    
+    def match_document(self, document, auto_refresh=True) -> List[Dict]:
+        """
+        在预处理好的推文文档上匹配（复用文档中的规范化文本和关键词位置）
         
-        if not self.token_symbols_cache:
+        Args:
+            document: TweetDocument，匹配其正文
+            auto_refresh: 是否自动刷新缓存
+            
+        Returns:
+            匹配到的 token 列表（与 match_tokens_in_text(document.text) 相同）
+        """
+        if not document.text:
+            return []
+        
+        if auto_refresh and not self.is_change_feed_running() and self._should_refresh_cache():
+            self._schedule_refresh()
+        
+        return self._match_in_index(
+            self.index,
+            document.text,
+            canonical=(document.canonical_text, document.canonical_positions),
+            context_scores=document.context_scores(self.context_scorer.keywords, self.context_scorer.window)
+        )
+    
+    def _match_in_index(self, index: TokenIndex, text: str, canonical: Tuple = None,
+                        context_scores=None) -> List[Dict]:
+        """
+        在指定快照上匹配文本（不访问 Redis，可在子进程中调用）
+        
+        Args:
+            index: 索引快照
+            text: 要匹配的文本
+            canonical: 已算好的规范化文本 (文本, 位置映射)，可选
+            context_scores: 已算好的关键词位置表，可选
+            
+        Returns:
+            匹配到的 token 列表
+        """
+        if not text or not len(index):
             return []
         
+        # 一次线性扫描找出所有已知符号的出现位置，再按三种方法分类
+        dollar_hits, word_hits, chinese_hits = index.find_hits(text, canonical)
+        
         matched_tokens = []
         
-        # 方法1: 匹配 $SYMBOL 格式（支持中文和英文）
-        dollar_pattern = re.compile(r'\$([A-Za-z0-9\u4e00-\u9fff]+)', re.IGNORECASE)
-        dollar_matches = dollar_pattern.findall(text)
+        # 方法1: 匹配 $SYMBOL 格式（支持中文和英文，索引中已确认存在）
+        for _, _, match, symbol in dollar_hits:
+            token_info = {
+                'symbol': match,  # 保持原样（中文不变）
+                'matched_text': f'${match}',
+                'match_type': 'dollar_sign',
+                'confidence': 0.9,  # $SYMBOL 格式置信度高
+                'source': 'redis_matcher'
+            }
+            
+            # 添加详细信息
+            token_details = index.get_details(symbol)
+            if token_details:
+                token_info.update(token_details)
+            
+            matched_tokens.append(token_info)
         
-        for match in dollar_matches:
-            # 对英文符号转大写，中文保持原样
-            if match.encode('utf-8').isalpha() and match.isascii():
-                symbol_normalized = match.upper()
-            else:
-                symbol_normalized = match
+        # 一次扫描记录关键词位置，每个出现位置的上下文分数都可直接查询
+        if context_scores is None and (word_hits or chinese_hits):
+            context_scores = self.context_scorer.scan(text)
+        
+        # 方法2: 匹配纯英文大写单词（需要更严格的条件）
+        for symbol_upper, context_score in self._best_context_scores(word_hits, context_scores).items():
+            # 跳过停用词和已匹配的
+            if symbol_upper in self.stopwords:
+                continue
+            if any(t['symbol'] == symbol_upper for t in matched_tokens):
+                continue
             
-            # 检查缓存时也要考虑原文
-            if symbol_normalized in self.token_symbols_cache or match in self.token_symbols_cache:
+            # 只有上下文分数够高才添加（避免误报）
+            if context_score >= 0.3:
                 token_info = {
-                    'symbol': match,  # 保持原样（中文不变）
-                    'matched_text': f'${match}',
-                    'match_type': 'dollar_sign',
-                    'confidence': 0.9,  # $SYMBOL 格式置信度高
+                    'symbol': symbol_upper,
+                    'matched_text': symbol_upper,
+                    'match_type': 'word',
+                    'confidence': 0.6 + context_score * 0.3,  # 根据上下文调整置信度
+                    'context_score': context_score,
                     'source': 'redis_matcher'
                 }
                 
-                # 添加详细信息（尝试两种形式）
-                if symbol_normalized in self.token_details_cache:
-                    token_info.update(self.token_details_cache[symbol_normalized])
-                elif match in self.token_details_cache:
-                    token_info.update(self.token_details_cache[match])
+                # 添加详细信息
+                token_details = index.get_details(symbol_upper)
+                if token_details:
+                    token_info.update(token_details)
                 
                 matched_tokens.append(token_info)
         
-        # 方法2: 匹配纯英文大写单词（需要更严格的条件）
-        word_pattern = re.compile(r'\b([A-Z][A-Z0-9]{1,10})\b')
-        word_matches = word_pattern.findall(text)
+        # 方法3: 匹配中文 token（直接匹配，不需要 $ 符号）
+        for symbol, context_score in self._best_context_scores(chinese_hits, context_scores).items():
+            # 跳过已匹配的
+            if any(t['symbol'] == symbol for t in matched_tokens):
+                continue
+            
+            # 中文 token 降低阈值（0.0），允许无上下文匹配
+            # 注意：这会增加误报率，建议在生产环境调整为 0.1 或 0.2
+            if context_score >= 0.0:
+                token_info = {
+                    'symbol': symbol,
+                    'matched_text': symbol,
+                    'match_type': 'chinese_word',
+                    'confidence': 0.7 + context_score * 0.2,  # 基础置信度 0.7
+                    'context_score': context_score,
+                    'source': 'redis_matcher'
+                }
+                
+                # 添加详细信息
+                token_details = index.get_details(symbol)
+                if token_details:
+                    token_info.update(token_details)
+                
+                matched_tokens.append(token_info)
         
-        # 停用词（避免误匹配常见大写词）
-        stopwords = {'THE', 'AND', 'FOR', 'ARE', 'BUT', 'NOT', 'YOU', 'ALL', 
-                    'CAN', 'WAS', 'GET', 'GOT', 'NEW', 'NOW', 'OUT', 'DAY',
-                    'WHO', 'WHY', 'HOW', 'WHAT', 'WHEN', 'WHERE'}
+        # 方法4: 匹配 token 名称（如 "Justice For KitKat"，不带 ticker 的提及）
+        name_hits = index.find_name_hits(text, canonical)
+        if name_hits and context_scores is None:
+            context_scores = self.context_scorer.scan(text)
         
-        for match in word_matches:
-            symbol_upper = match.upper()
-            
-            # 跳过停用词和已匹配的
-            if symbol_upper in stopwords:
-                continue
-            if any(t['symbol'] == symbol_upper for t in matched_tokens):
+        best_name_hits: Dict[str, Tuple[float, str]] = {}
+        for start, end, symbol in name_hits:
+            context_score = context_scores.score(start, end)
+            if context_score > best_name_hits.get(symbol, (-1.0, ''))[0]:
+                best_name_hits[symbol] = (context_score, text[start:end])
+        
+        for symbol, (context_score, matched_text) in best_name_hits.items():
+            # 跳过已匹配的
+            if any(t['symbol'] == symbol for t in matched_tokens):
                 continue
             
-            if symbol_upper in self.token_symbols_cache:
-                # 检查上下文（周围是否有加密货币相关词汇）
-                context_score = self._calculate_context_score(text, match)
+            # 多词名称本身足够特殊；单词名称与普通单词容易混淆，要求和大写单词相同的上下文分数
+            if len(matched_text.split()) > 1 or context_score >= 0.3:
+                token_info = {
+                    'symbol': symbol,
+                    'matched_text': matched_text,
+                    'match_type': 'name',
+                    'confidence': 0.7 + context_score * 0.2,
+                    'context_score': context_score,
+                    'source': 'redis_matcher'
+                }
                 
-                # 只有上下文分数够高才添加（避免误报）
-                if context_score >= 0.3:
-                    token_info = {
-                        'symbol': symbol_upper,
-                        'matched_text': match,
-                        'match_type': 'word',
-                        'confidence': 0.6 + context_score * 0.3,  # 根据上下文调整置信度
-                        'context_score': context_score,
-                        'source': 'redis_matcher'
-                    }
-                    
-                    # 添加详细信息
-                    if symbol_upper in self.token_details_cache:
-                        token_info.update(self.token_details_cache[symbol_upper])
-                    
-                    matched_tokens.append(token_info)
-        
-        # 方法3: 匹配中文 token（直接匹配，不需要 $ 符号）
-        # 遍历所有已知的中文 token，看是否在文本中出现
-        for symbol in self.token_symbols_cache:
-            # 判断是否为中文 token（包含中文字符）
-            if re.search(r'[\u4e00-\u9fff]', symbol):
-                # 跳过已匹配的
-                if any(t['symbol'] == symbol for t in matched_tokens):
-                    continue
+                # 添加详细信息
+                token_details = index.get_details(symbol)
+                if token_details:
+                    token_info.update(token_details)
                 
-                # 检查是否在文本中
-                if symbol in text:
-                    # 计算上下文分数
-                    context_score = self._calculate_context_score(text, symbol)
-                    
-                    # 中文 token 降低阈值（0.0），允许无上下文匹配
-                    # 注意：这会增加误报率，建议在生产环境调整为 0.1 或 0.2
-                    if context_score >= 0.0:
-                        token_info = {
-                            'symbol': symbol,
-                            'matched_text': symbol,
-                            'match_type': 'chinese_word',
-                            'confidence': 0.7 + context_score * 0.2,  # 基础置信度 0.7
-                            'context_score': context_score,
-                            'source': 'redis_matcher'
-                        }
-                        
-                        # 添加详细信息
-                        if symbol in self.token_details_cache:
-                            token_info.update(self.token_details_cache[symbol])
-                        
-                        matched_tokens.append(token_info)
+                matched_tokens.append(token_info)
         
         return matched_tokens
     
-    def _calculate_context_score(self, text: str, token: str, window=50) -> float:
+    def match_many(self, texts: Iterable[str], processes: int = None, chunksize: int = 64) -> List[List[Dict]]:
         """
-        计算 token 周围的上下文相关度（支持中英文）
+        批量匹配（用于历史推文回溯），结果与输入顺序一致
         
         Args:
-            text: 完整文本
-            token: 要检查的 token
-            window: 上下文窗口大小（字符数）
+            texts: 文本序列
+            processes: 进程数，默认 CPU 核数；1 表示在当前进程中顺序匹配
+            chunksize: 每次分发给子进程的文本数量
             
         Returns:
-            上下文分数 (0-1)
+            每条文本的匹配结果列表
         """
-        # 加密货币相关关键词（英文 + 中文）
-        crypto_keywords = {
-            # 英文关键词
-            'crypto', 'token', 'coin', 'blockchain', 'defi', 'nft', 'meme',
-            'launch', 'pump', 'moon', 'buy', 'sell', 'trade', 'dex', 'swap',
-            'contract', 'address', 'ca', 'launched', '$',
-            # 中文关键词
-            '代币', '币', '区块链', '加密', '发布', '上线', '启动', '购买',
-            '买入', '卖出', '交易', '合约', '地址', '登月', 'pump', 'moon',
-            '冲', '涨', '暴涨', '飞', '起飞', '新币', '项目', '发行',
-            'DexScreener', 'dex', 'pancakeswap'
-        }
+        return list(self.iter_match_many(texts, processes=processes, chunksize=chunksize))
+    
+    def iter_match_many(self, texts: Iterable[str], processes: int = None,
+                        chunksize: int = 64) -> Iterator[List[Dict]]:
+        """
+        流式批量匹配，按输入顺序逐条返回结果
         
-        # 找到 token 在文本中的位置
-        text_lower = text.lower()
-        token_lower = token.lower()
+        所有子进程共享调用时的同一个冻结快照：进程池通过 fork 创建，
+        快照直接继承父进程内存（写时复制），不需要序列化，也不访问 Redis。
+        不支持 fork 的平台退化为当前进程内顺序匹配。
         
-        try:
-            pos = text_lower.index(token_lower)
-            
-            # 提取上下文
-            start = max(0, pos - window)
-            end = min(len(text), pos + len(token) + window)
-            context = text_lower[start:end]
-            
-            # 计算关键词密度
-            keyword_count = sum(1 for kw in crypto_keywords if kw in context)
-            
-            # 归一化分数
-            score = min(1.0, keyword_count / 3.0)
+        Args:
+            texts: 文本序列（可以是生成器）
+            processes: 进程数，默认 CPU 核数；1 表示在当前进程中顺序匹配
+            chunksize: 每次分发给子进程的文本数量
             
-            return score
+        Yields:
+            每条文本的匹配结果列表
+        """
+        index = self.index
+        processes = processes or os.cpu_count() or 1
+        
+        if processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            for text in texts:
+                yield self._match_in_index(index, text)
+            return
+        
+        # 冻结现有对象，避免子进程 GC 扫描时触碰共享页面导致复制
+        gc.freeze()
+        try:
+            context = multiprocessing.get_context('fork')
+            with context.Pool(processes, initializer=_init_match_worker, initargs=(self, index)) as pool:
+                yield from pool.imap(_match_worker, texts, chunksize)
+        finally:
+            gc.unfreeze()
+    
+    @staticmethod
+    def _best_context_scores(hits: List[Tuple[int, int, str, str]], context_scores) -> Dict[str, float]:
+        """
+        对每个出现位置计算上下文分数，同一符号取最高分
+        
+        Args:
+            hits: 按位置排序的 (原文起点, 原文终点, 规范文本中的匹配, 符号) 列表
+            context_scores: 文本的 ContextScores
             
-        except ValueError:
-            return 0.0
+        Returns:
+            符号 -> 最高上下文分数（按首次出现顺序）
+        """
+        best_scores: Dict[str, float] = {}
+        for start, end, _, symbol in hits:
+            score = context_scores.score(start, end)
+            if score > best_scores.get(symbol, -1.0):
+                best_scores[symbol] = score
+        return best_scores
     
     def get_token_details(self, symbol: str) -> Dict:
         """
@@ -306,8 +701,9 @@ class RedisTokenMatcher:
         symbol_upper = symbol.upper()
         
         # 先检查缓存
-        if symbol_upper in self.token_details_cache:
-            return self.token_details_cache[symbol_upper]
+        token_details = self.index.get_details(symbol_upper)
+        if token_details:
+            return token_details
         
         # 缓存中没有，尝试从 Redis 获取
         if not self.redis_client:
@@ -334,6 +730,16 @@ class RedisTokenMatcher:
         """强制刷新缓存"""
         self._refresh_cache()
     
+    def is_change_feed_running(self) -> bool:
+        """变更流消费线程是否在运行"""
+        return self.change_feed_thread is not None and self.change_feed_thread.is_alive()
+    
+    def close(self):
+        """停止变更流消费线程"""
+        self._stop_event.set()
+        if self.change_feed_thread:
+            self.change_feed_thread.join(timeout=5)
+    
     def get_cache_stats(self) -> Dict:
         """
         获取缓存统计信息
@@ -341,16 +747,120 @@ class RedisTokenMatcher:
         Returns:
             统计信息字典
         """
+        index = self.index
         return {
-            'total_tokens': len(self.token_symbols_cache),
+            'total_tokens': len(index),
             'last_refresh': self.last_cache_refresh.isoformat() if self.last_cache_refresh else None,
             'cache_age_seconds': (datetime.now() - self.last_cache_refresh).total_seconds() if self.last_cache_refresh else None,
-            'redis_connected': self.redis_client is not None
+            'redis_connected': self.redis_client is not None,
+            'refresh_stats': self.last_refresh_stats,
+            'last_refresh_attempt': self.last_refresh_attempt.isoformat() if self.last_refresh_attempt else None,
+            'refresh_failures': self.refresh_failures,
+            'change_feed_running': self.is_change_feed_running(),
+            'changes_applied': self.changes_applied,
+            'delta_tokens': len(index.added_symbols) + len(index.removed_symbols),
+            'snapshot_age_seconds': (datetime.now() - index.built_at).total_seconds(),
+            'snapshot_build_seconds': round(index.build_seconds, 3),
+            'index_source': index.source,
+            'details_bytes': getattr(index.details, 'nbytes', None),
+            'refresh_in_progress': self._refresh_lock.locked(),
+            'last_change_id': self.last_change_id,
         }
 
 
+# 进程池子进程中的匹配器与快照（fork 时从父进程继承）
+_worker_matcher: RedisTokenMatcher = None
+_worker_index: TokenIndex = None
+
+
+def _init_match_worker(matcher: RedisTokenMatcher, index: TokenIndex):
+    global _worker_matcher, _worker_index
+    _worker_matcher = matcher
+    _worker_index = index
+
+
+def _match_worker(text: str) -> List[Dict]:
+    return _worker_matcher._match_in_index(_worker_index, text)
+
+
+def iter_archived_texts(path: str) -> Iterator[str]:
+    """
+    读取历史推文文本（用于回溯匹配）
+    
+    支持两种格式:
+    - data/user_tweets_*.json: 推文 JSON 数组
+    - data/ws.json: 每行一条日志，取 raw_twitter_message 中的推文
+    
+    Args:
+        path: 文件路径
+        
+    Yields:
+        推文文本
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first_char = f.read(1)
+        f.seek(0)
+        
+        if first_char == '[':
+            for tweet in json.load(f):
+                yield tweet.get('text', '')
+            return
+        
+        for line in f:
+            try:
+                log_entry = json.loads(line)
+            except ValueError:
+                continue
+            if log_entry.get('log_type') != 'raw_twitter_message':
+                continue
+            
+            message = log_entry.get('message') or log_entry.get('raw_data') or {}
+            if message.get('type') == 'tweet':
+                yield message.get('text', '')
+            elif message.get('type') == 'user-update':
+                status = (message.get('data') or {}).get('status') or {}
+                if status.get('text'):
+                    yield status['text']
+
+
+def backfill(paths: List[str], processes: int = None):
+    """
+    对历史推文批量回溯匹配已知 token
+    
+    Args:
+        paths: 推文文件列表
+        processes: 进程数，默认 CPU 核数
+    """
+    # 同步从 Redis 加载后再冻结索引（不在后台刷新线程运行时 fork），Redis 不可用时才用磁盘快照
+    matcher = RedisTokenMatcher(subscribe_changes=False, background_refresh=False)
+    
+    for path in paths:
+        start_time = time.perf_counter()
+        tweet_count = 0
+        match_count = 0
+        symbol_counts: Dict[str, int] = {}
+        
+        for matches in matcher.iter_match_many(iter_archived_texts(path), processes=processes):
+            tweet_count += 1
+            match_count += len(matches)
+            for match in matches:
+                symbol_counts[match['symbol']] = symbol_counts.get(match['symbol'], 0) + 1
+        
+        elapsed = time.perf_counter() - start_time
+        print(f"\n[Backfill] {path}: {tweet_count} tweets, {match_count} matches "
+              f"in {elapsed:.2f}s ({tweet_count / elapsed if elapsed else 0:.0f} tweets/s)")
+        for symbol, count in sorted(symbol_counts.items(), key=lambda x: x[1], reverse=True)[:20]:
+            print(f"  - {symbol}: {count}")
+
+
 if __name__ == '__main__':
     """测试模块"""
+    import sys
+    
+    # 回溯模式: python redis_token_matcher.py --backfill data/user_tweets_*.json data/ws.json
+    if len(sys.argv) > 2 and sys.argv[1] == '--backfill':
+        backfill(sys.argv[2:])
+        sys.exit(0)
     
     # 创建匹配器
     matcher = RedisTokenMatcher()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线提取统一入口
+每个推文文件只解析一次，然后在进程池中并行运行选中的提取器（regex / rule / tfidf / rake / spacy / bert），
+输出与各提取器 main() 相同的 output/<文件名>_<方法>.txt，并汇总每个提取器的耗时
+
+特点:
+- 推文在父进程中解析，子进程以 fork 方式继承（不支持 fork 的平台随初始化参数传入，每个子进程只反序列化一次）
+- 每个提取器在一个子进程中只创建一次（模型只加载一次），依次处理所有推文文件
+- 耗时拆分为: 解析 JSON、创建提取器（加载模型）、提取、写文件
+
+用法:
+    python run_extractors.py                                # 所有提取器，data/user_tweets_*.json
+    python run_extractors.py --extractors regex,rule,tfidf  # 只运行部分提取器
+    python run_extractors.py --workers 2 --json timing.json # 最多 2 个子进程，同时保存耗时
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from ner_workers import fork_available
+from utils import deduplicate_results, load_tweets, save_results
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TWEET_GLOB = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'user_tweets_*.json')
+DEFAULT_OUTPUT_DIR = os.path.join(CURRENT_DIR, 'output')
+
+# 方法名（也是输出文件后缀）-> (模块, 类, 构造参数)，与各提取器 main() 一致
+EXTRACTORS = {
+    'regex': ('regex_extractor', 'RegexExtractor', {}),
+    'rule': ('rule_based_extractor', 'RuleBasedExtractor', {}),
+    'tfidf': ('tfidf_extractor', 'TFIDFExtractor', {'top_n': 100}),
+    'rake': ('keyword_extractor', 'RAKEExtractor', {}),
+    'spacy': ('spacy_ner_extractor', 'SpacyNERExtractor', {}),
+    'bert': ('bert_extractor', 'BERTExtractor', {'use_gpu': False}),
+}
+
+
+def output_path_for(tweet_file: str, method: str, output_dir: str) -> str:
+    """某个推文文件在某个方法下的输出路径"""
+    stem = os.path.splitext(os.path.basename(tweet_file))[0]
+    return os.path.join(output_dir, f'{stem}_{method}.txt')
+
+
+def extract(method: str, extractor, tweets: List[Dict]):
+    """
+    以与各提取器 process_file 相同的参数运行提取
+
+    Args:
+        method: 方法名
+        extractor: 提取器实例
+        tweets: 推文列表
+
+    Returns:
+        [(token, timestamp), ...]
+    """
+    if method == 'regex':
+        return deduplicate_results(extractor.extract_from_tweets(tweets))
+    if method == 'rule':
+        return extractor.extract_from_tweets(tweets, min_confidence=0.3)
+    if method == 'tfidf':
+        return extractor.extract_from_tweets(tweets)
+    if method == 'bert':
+        from bert_extractor import OFFLINE_BATCH_SIZE
+        return extractor.extract_from_tweets(tweets, top_n=100, use_bert=extractor.ner_pipeline is not None,
+                                             batch_size=OFFLINE_BATCH_SIZE)
+    return extractor.extract_from_tweets(tweets, top_n=100)
+
+
+# 子进程中的推文（文件路径 -> 推文列表），由初始化函数设置
+_worker_tweets: Dict[str, List[Dict]] = {}
+
+
+def _init_worker(tweets_by_file: Dict[str, List[Dict]]):
+    global _worker_tweets
+    _worker_tweets = tweets_by_file
+
+
+def run_method(method: str, output_dir: str, verbose: bool = False) -> Dict:
+    """
+    在当前进程中用一个提取器处理所有推文文件（由子进程调用）
+
+    Args:
+        method: 方法名
+        output_dir: 输出目录
+        verbose: 是否保留提取器自身的打印输出
+
+    Returns:
+        耗时字典 {method, init_seconds, files: [...], extract_seconds, write_seconds, tweets, tokens}
+    """
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    module_name, class_name, kwargs = EXTRACTORS[method]
+
+    with log:
+        start = time.perf_counter()
+        extractor = getattr(importlib.import_module(module_name), class_name)(**kwargs)
+        init_seconds = time.perf_counter() - start
+
+        files = []
+        for tweet_file, tweets in _worker_tweets.items():
+            start = time.perf_counter()
+            results = extract(method, extractor, tweets)
+            extract_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            save_results(results, output_path_for(tweet_file, method, output_dir))
+            write_seconds = time.perf_counter() - start
+
+            files.append({'file': os.path.basename(tweet_file), 'tweets': len(tweets), 'tokens': len(results),
+                          'extract_seconds': extract_seconds, 'write_seconds': write_seconds})
+
+    return {
+        'method': method,
+        'pid': os.getpid(),
+        'init_seconds': init_seconds,
+        'extract_seconds': sum(f['extract_seconds'] for f in files),
+        'write_seconds': sum(f['write_seconds'] for f in files),
+        'tweets': sum(f['tweets'] for f in files),
+        'tokens': sum(f['tokens'] for f in files),
+        'files': files,
+    }
+
+
+def run_all(tweets_by_file: Dict[str, List[Dict]], methods: List[str], output_dir: str, workers: int,
+            verbose: bool = False) -> List[Dict]:
+    """
+    在进程池中并行运行提取器
+
+    Args:
+        tweets_by_file: 文件路径 -> 已解析的推文列表
+        methods: 方法名列表
+        output_dir: 输出目录
+        workers: 子进程数
+        verbose: 是否保留提取器自身的打印输出
+
+    Returns:
+        各提取器的耗时字典（按 methods 顺序）
+    """
+    context = multiprocessing.get_context('fork' if fork_available() else 'spawn')
+    results: Dict[str, Dict] = {}
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context,
+                             initializer=_init_worker, initargs=(tweets_by_file,)) as executor:
+        futures = {executor.submit(run_method, method, output_dir, verbose): method for method in methods}
+        for future in as_completed(futures):
+            method = futures[future]
+            try:
+                results[method] = future.result()
+                print(f"[Runner] {method} done ({results[method]['init_seconds'] + results[method]['extract_seconds']:.2f}s)")
+            except Exception as e:
+                results[method] = {'method': method, 'error': f'{type(e).__name__}: {e}'}
+                print(f"[Runner] {method} failed: {results[method]['error']}")
+    return [results[method] for method in methods]
+
+
+def print_timing(results: List[Dict], parse_seconds: float, wall_seconds: float):
+    """打印每个提取器的耗时"""
+    print("\n" + "=" * 70)
+    print("Offline Extraction Timing")
+    print("=" * 70)
+    print(f"{'Extractor':<10}{'Init(s)':>9}{'Extract(s)':>12}{'Write(s)':>10}{'Tweets/s':>10}{'Tokens':>8}")
+    serial_seconds = parse_seconds
+    for result in results:
+        if 'error' in result:
+            print(f"{result['method']:<10}  failed: {result['error']}")
+            continue
+        serial_seconds += result['init_seconds'] + result['extract_seconds'] + result['write_seconds']
+        rate = result['tweets'] / result['extract_seconds'] if result['extract_seconds'] else 0.0
+        print(f"{result['method']:<10}{result['init_seconds']:>9.2f}{result['extract_seconds']:>12.2f}"
+              f"{result['write_seconds']:>10.3f}{rate:>10.0f}{result['tokens']:>8}")
+    print("-" * 70)
+    print(f"Parse JSON (once): {parse_seconds:.2f}s")
+    print(f"Wall time:         {wall_seconds:.2f}s (sum of extractor time: {serial_seconds:.2f}s)")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline extractors in parallel over shared parsed tweets')
+    parser.add_argument('--extractors', default=','.join(EXTRACTORS),
+                        help=f"逗号分隔的提取器（默认全部: {', '.join(EXTRACTORS)}）")
+    parser.add_argument('--tweets', default=DEFAULT_TWEET_GLOB, help='推文文件的 glob（默认 data/user_tweets_*.json）')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help='输出目录（默认 extractor/output）')
+    parser.add_argument('--workers', type=int, default=None, help='子进程数（默认 min(提取器数, CPU 核数)）')
+    parser.add_argument('--verbose', action='store_true', help='显示各提取器自身的输出')
+    parser.add_argument('--json', help='把耗时保存为 JSON 文件')
+    args = parser.parse_args()
+
+    methods = [m.strip() for m in args.extractors.split(',') if m.strip()]
+    unknown = set(methods) - set(EXTRACTORS)
+    if unknown:
+        parser.error(f"unknown extractors: {', '.join(sorted(unknown))}")
+
+    tweet_files = sorted(glob.glob(args.tweets))
+    if not tweet_files:
+        print(f"[Runner] No tweets found for {args.tweets}")
+        return
+    os.makedirs(args.output, exist_ok=True)
+
+    wall_start = time.perf_counter()
+    tweets_by_file = {path: load_tweets(path) for path in tweet_files}
+    parse_seconds = time.perf_counter() - wall_start
+    print(f"[Runner] Parsed {sum(len(t) for t in tweets_by_file.values())} tweets "
+          f"from {len(tweet_files)} files in {parse_seconds:.2f}s")
+
+    workers = args.workers or min(len(methods), os.cpu_count() or 1)
+    print(f"[Runner] Running {', '.join(methods)} in {workers} worker processes...")
+    results = run_all(tweets_by_file, methods, args.output, workers, args.verbose)
+    wall_seconds = time.perf_counter() - wall_start
+
+    print_timing(results, parse_seconds, wall_seconds)
+    print(f"Results written to {args.output}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'tweet_files': tweet_files, 'parse_seconds': parse_seconds,
+                       'wall_seconds': wall_seconds, 'results': results}, f, indent=2)
+        print(f"[Runner] Timing saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,38 +8,46 @@
 - 使用预训练的语言模型
 - 识别组织、产品等命名实体
 - 可以识别多词实体
+- 只加载 NER 需要的组件，用 nlp.pipe 批量处理（可多进程）
 - 需要安装: pip install spacy && python -m spacy download en_core_web_sm
 """
 
+import importlib.util
 import re
-from typing import List, Tuple, Dict, Set
+from typing import Iterator, List, Tuple, Dict, Set
 from collections import defaultdict, Counter
 from utils import load_tweets, save_results, parse_timestamp
 
-# 尝试导入spacy
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
+# 检查spacy是否已安装（导入较慢，创建提取器时才导入）
+SPACY_AVAILABLE = importlib.util.find_spec('spacy') is not None
+if not SPACY_AVAILABLE:
     print("警告: spaCy未安装，将使用基础NER功能")
 
+# NER 用不到的组件（加载时排除；ner 只依赖 tok2vec / transformer）
+NON_NER_COMPONENTS = ['tagger', 'morphologizer', 'parser', 'senter', 'attribute_ruler', 'lemmatizer']
+
 
 class SpacyNERExtractor:
     """基于spaCy的命名实体识别提取器"""
     
-    def __init__(self, model_name='en_core_web_sm'):
+    def __init__(self, model_name='en_core_web_sm', batch_size=256, n_process=1):
         """
         初始化
         
         Args:
             model_name: spaCy模型名称
+            batch_size: nlp.pipe 每批处理的文本数
+            n_process: nlp.pipe 的进程数（1 表示在当前进程内处理）
         """
         self.nlp = None
+        self.batch_size = batch_size
+        self.n_process = n_process
         
         if SPACY_AVAILABLE:
+            import spacy
+            
             try:
-                self.nlp = spacy.load(model_name)
+                self.nlp = spacy.load(model_name, exclude=NON_NER_COMPONENTS)
                 print(f"成功加载spaCy模型: {model_name}")
             except OSError:
                 print(f"警告: 未找到模型 {model_name}，尝试下载...")
@@ -47,7 +55,7 @@ class SpacyNERExtractor:
                     import subprocess
                     subprocess.run(['python', '-m', 'spacy', 'download', model_name], 
                                    check=True, capture_output=True)
-                    self.nlp = spacy.load(model_name)
+                    self.nlp = spacy.load(model_name, exclude=NON_NER_COMPONENTS)
                     print(f"成功下载并加载模型: {model_name}")
                 except:
                     print("警告: 无法下载模型，使用基础NER")
@@ -72,9 +80,28 @@ class SpacyNERExtractor:
         if not self.nlp:
             return []
         
-        entities = []
-        doc = self.nlp(text)
+        return self._doc_entities(self.nlp(text))
+    
+    def iter_entities_with_spacy(self, texts: List[str]) -> Iterator[List[Tuple[str, str]]]:
+        """
+        使用 nlp.pipe 批量提取命名实体，按输入顺序逐条返回
+        
+        Args:
+            texts: 文本列表
+            
+        Yields:
+            每条文本的 [(entity_text, entity_type), ...] 列表
+        """
+        if not self.nlp:
+            for _ in texts:
+                yield []
+            return
         
+        for doc in self.nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process):
+            yield self._doc_entities(doc)
+    
+    def _doc_entities(self, doc) -> List[Tuple[str, str]]:
+        entities = []
         for ent in doc.ents:
             if ent.label_ in self.relevant_entity_types:
                 # 清理实体文本
@@ -124,14 +151,18 @@ class SpacyNERExtractor:
             'count': 0
         })
         
-        for tweet in tweets:
-            text = tweet.get('text', '')
+        texts = [tweet.get('text', '') for tweet in tweets]
+        
+        # spaCy 结果按推文顺序流入下面的汇总
+        spacy_results = self.iter_entities_with_spacy(texts) if self.nlp else None
+        
+        for tweet, text in zip(tweets, texts):
             timestamp = parse_timestamp(tweet.get('createdAt', ''))
             engagement = tweet.get('favoriteCount', 0) + tweet.get('retweetCount', 0)
             
             # 方法1: 使用spaCy NER
             if self.nlp:
-                entities = self.extract_entities_with_spacy(text)
+                entities = next(spacy_results)
                 for entity_text, entity_type in entities:
                     # 标准化
                     normalized = self._normalize_entity(entity_text)
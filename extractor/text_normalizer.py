@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本规范化
+把符号和推文折叠到同一个规范形式，避免全角字母、零宽字符、西里尔 / 希腊仿冒字母绕过匹配
+
+特点:
+- NFKC 规范化（全角字母 / 数字 / $ 变为半角）
+- 去掉零宽字符，西里尔 / 希腊形近字母映射为拉丁字母（保留大小写）
+- 逐字符结果缓存成 str.translate 映射表，纯 ASCII 文本直接返回
+- 长度变化时同时返回位置映射，命中位置可以还原到原文
+"""
+
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# 零宽字符（常被插在 ticker 中间绕过过滤）
+ZERO_WIDTH_CHARS = frozenset('\u00ad\u180e\u200b\u200c\u200d\u2060\ufeff')
+
+# 与拉丁字母形近的西里尔 / 希腊字母（\u0400-\u052f 西里尔，\u0370-\u03ff 希腊）
+CONFUSABLES = {
+    # 西里尔大写
+    '\u0410': 'A', '\u0412': 'B', '\u0415': 'E', '\u0401': 'E', '\u041a': 'K', '\u041c': 'M',
+    '\u041d': 'H', '\u041e': 'O', '\u0420': 'P', '\u0421': 'C', '\u0422': 'T', '\u0423': 'Y',
+    '\u0425': 'X', '\u0405': 'S', '\u0406': 'I', '\u0408': 'J', '\u0500': 'D', '\u051a': 'Q',
+    '\u051c': 'W',
+    # 西里尔小写
+    '\u0430': 'a', '\u0435': 'e', '\u0451': 'e', '\u043e': 'o', '\u0440': 'p', '\u0441': 'c',
+    '\u0443': 'y', '\u0445': 'x', '\u0455': 's', '\u0456': 'i', '\u0458': 'j', '\u0501': 'd',
+    '\u051b': 'q', '\u051d': 'w', '\u04bb': 'h',
+    # 希腊大写
+    '\u0391': 'A', '\u0392': 'B', '\u0395': 'E', '\u0396': 'Z', '\u0397': 'H', '\u0399': 'I',
+    '\u039a': 'K', '\u039c': 'M', '\u039d': 'N', '\u039f': 'O', '\u03a1': 'P', '\u03a4': 'T',
+    '\u03a5': 'Y', '\u03a7': 'X',
+    # 希腊小写
+    '\u03bf': 'o', '\u03bd': 'v', '\u03b9': 'i', '\u03ba': 'k', '\u03c1': 'p', '\u03c4': 't',
+    '\u03c5': 'u', '\u03c7': 'x',
+}
+
+# 逐字符规范化结果缓存：只记录会变化的字符（ord -> 规范形式），可直接用于 str.translate
+_char_map: Dict[int, str] = {}
+# 规范化后长度不为 1 的字符（零宽字符、NFKC 展开为多个字符的连字 / 省略号等）
+_length_changing_chars: Set[str] = set()
+# 已计算过的字符
+_known_chars: Set[str] = set()
+
+
+def canonical_char(ch: str) -> str:
+    """
+    单个字符的规范形式
+
+    Args:
+        ch: 字符
+
+    Returns:
+        规范形式（可能为空字符串或多个字符）
+    """
+    if ch in ZERO_WIDTH_CHARS:
+        return ''
+    normalized = unicodedata.normalize('NFKC', ch)
+    return ''.join(CONFUSABLES.get(c, c) for c in normalized if c not in ZERO_WIDTH_CHARS)
+
+
+def _learn_chars(chars: Iterable[str]):
+    for ch in chars:
+        canonical = canonical_char(ch)
+        if canonical != ch:
+            _char_map[ord(ch)] = canonical
+            if len(canonical) != 1:
+                _length_changing_chars.add(ch)
+        _known_chars.add(ch)
+
+
+def canonicalize(text: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    一次遍历把文本转成规范形式
+
+    Args:
+        text: 原文
+
+    Returns:
+        (规范文本, 位置映射)，位置映射第 i 项为规范文本第 i 个字符在原文中的位置；
+        长度没有变化时位置一一对应，返回 None
+    """
+    if text.isascii():
+        return text, None
+
+    chars = set(text)
+    unknown = chars - _known_chars
+    if unknown:
+        _learn_chars(unknown)
+
+    if not (chars & _length_changing_chars):
+        return text.translate(_char_map), None
+
+    parts = []
+    positions = []
+    for i, ch in enumerate(text):
+        canonical = _char_map.get(ord(ch), ch)
+        parts.append(canonical)
+        positions.extend([i] * len(canonical))
+    return ''.join(parts), positions
+
+
+def original_span(positions: Optional[List[int]], start: int, end: int) -> Tuple[int, int]:
+    """
+    把规范文本中的区间还原为原文区间
+
+    Args:
+        positions: canonicalize() 返回的位置映射
+        start: 规范文本中的起点
+        end: 规范文本中的终点（不含）
+
+    Returns:
+        (原文起点, 原文终点)
+    """
+    if positions is None:
+        return start, end
+    return positions[start], positions[end - 1] + 1
@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已知 Token 索引快照
+RedisTokenMatcher 使用的内存索引：符号集合、详情、名称短语和 Aho-Corasick 自动机
+
+特点:
+- 符号与文本先做规范化（NFKC、零宽字符、形近字母），规范形式在构建时一次算好
+- token 名称（可含多个单词）建立短语自动机，忽略大小写并折叠空白，同样一次扫描
+- 快照构建完成后不再修改，匹配线程拿到引用即可无锁读取
+- 增删变更生成新的快照（共享基础数据，只复制很小的增量部分）
+- 全量刷新在后台构建新快照，完成后整体替换
+- 详情编码为一段连续的紧凑 JSON 字节（按符号排序 + 偏移数组），查询时才解码
+- 可保存为紧凑的磁盘快照文件，通过 mmap 加载（冷启动 / Redis 不可用时使用）
+"""
+
+import copy
+import json
+import mmap
+import os
+import string
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+
+from aho_corasick import AhoCorasickAutomaton
+from context_scorer import lower_preserving_length
+from text_normalizer import canonicalize, original_span
+
+
+# 自动机按 ASCII 大写折叠匹配（保持字符串长度不变，位置可直接映射回原文）
+ASCII_UPPER_TABLE = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+
+# $SYMBOL 中允许出现的字符（与原 $ 正则 [A-Za-z0-9\u4e00-\u9fff] 一致）
+def _is_cashtag_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum() or '\u4e00' <= ch <= '\u9fff'
+
+
+def _is_cjk_char(ch: str) -> bool:
+    return '\u4e00' <= ch <= '\u9fff'
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == '_')
+
+
+# 参与名称匹配的最短名称长度（折叠后），过短的名称误报太多
+MIN_NAME_LENGTH = 4
+
+
+def canonical_symbol(symbol: str) -> str:
+    """符号的规范形式（NFKC、去零宽字符、形近字母折叠，保留大小写）"""
+    return canonicalize(symbol)[0]
+
+
+def fold_name(name: str) -> str:
+    """名称的折叠形式：规范化后小写，连续空白合并为一个空格"""
+    return ' '.join(lower_preserving_length(canonicalize(name)[0]).split())
+
+
+def fold_text_for_names(text: str, canonical: Tuple[str, Optional[List[int]]] = None) -> Tuple[str, List[int]]:
+    """
+    一次遍历把文本折叠成与 fold_name() 一致的形式，并记录每个字符在原文中的位置
+
+    Args:
+        text: 原文
+        canonical: 已算好的 canonicalize(text) 结果（可选）
+
+    Returns:
+        (折叠后的文本, 折叠文本第 i 个字符对应的原文位置)
+    """
+    canonical_text, canonical_positions = canonical or canonicalize(text)
+
+    chars = []
+    positions = []
+    in_space = True
+    for i, ch in enumerate(lower_preserving_length(canonical_text)):
+        if ch.isspace():
+            if not in_space:
+                chars.append(' ')
+                positions.append(i)
+                in_space = True
+        else:
+            chars.append(ch)
+            positions.append(i)
+            in_space = False
+
+    if canonical_positions is not None:
+        positions = [canonical_positions[i] for i in positions]
+    return ''.join(chars), positions
+
+
+def iter_name_entries(names: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+    """
+    过滤并折叠 (名称, 符号) 对，跳过过短的名称和与符号本身相同的名称
+
+    Yields:
+        (折叠后的名称, 符号)
+    """
+    for name, symbol in names:
+        if not name:
+            continue
+        folded = fold_name(name)
+        if len(folded) >= MIN_NAME_LENGTH and folded != fold_name(symbol):
+            yield folded, symbol
+
+
+def build_name_automaton(name_entries: Iterable[Tuple[str, str]]) -> AhoCorasickAutomaton:
+    """
+    用 (折叠后的名称, 符号) 对构建名称短语自动机，值为同名的符号元组
+
+    Args:
+        name_entries: (折叠后的名称, 符号) 对
+
+    Returns:
+        构建好的自动机
+    """
+    symbols_by_name: Dict[str, List[str]] = {}
+    for folded, symbol in name_entries:
+        symbols = symbols_by_name.setdefault(folded, [])
+        if symbol not in symbols:
+            symbols.append(symbol)
+
+    return AhoCorasickAutomaton(
+        (folded, tuple(symbols)) for folded, symbols in symbols_by_name.items()
+    )
+
+
+def build_automaton(symbols: Iterable[str], canonical_forms: Iterable[str] = None) -> AhoCorasickAutomaton:
+    """
+    用已知符号构建自动机
+
+    自动机的关键词是规范形式再做 ASCII 大写折叠后的符号，值是折叠后相同的
+    (规范形式, 原始符号) 元组，命中后再按原有规则（$ 格式 / 大写单词 / 中文）逐一校验。
+
+    Args:
+        symbols: 标准化后的符号集合
+        canonical_forms: 与 symbols 顺序一致的规范形式（已预先计算时传入，例如来自磁盘快照）
+
+    Returns:
+        构建好的自动机
+    """
+    if canonical_forms is None:
+        canonical_forms = (canonical_symbol(symbol) for symbol in symbols)
+
+    variants_by_key: Dict[str, List[Tuple[str, str]]] = {}
+    for symbol, canonical in zip(symbols, canonical_forms):
+        variants_by_key.setdefault(canonical.translate(ASCII_UPPER_TABLE), []).append((canonical, symbol))
+
+    return AhoCorasickAutomaton(
+        (key, tuple(variants)) for key, variants in variants_by_key.items()
+    )
+
+
+class TokenIndex:
+    """已知 token 的不可变索引快照（基础数据 + 变更流增量）"""
+
+    def __init__(self, symbols: Iterable[str] = None, details: Dict[str, Dict] = None,
+                 canonical_forms: List[str] = None, source: str = 'redis',
+                 names: Iterable[Tuple[str, str]] = None, folded_names: Iterable[Tuple[str, str]] = None):
+        """
+        构建快照
+
+        Args:
+            symbols: 标准化后的符号集合
+            details: 符号 -> token 详情（任何支持 get() 的映射）
+            canonical_forms: 与 symbols 顺序一致的规范形式（可选，省去构建时的规范化计算）
+            source: 数据来源，'redis' 或 'snapshot'
+            names: (token 名称, 符号) 对；不传时取 details 中的 name 字段
+            folded_names: 已折叠过滤的 (名称, 符号) 对（来自磁盘快照，优先于 names）
+        """
+        start_time = time.perf_counter()
+
+        symbols = list(symbols or ())
+        self.symbols = frozenset(symbols)
+        self.details = details or {}
+        self.automaton = build_automaton(symbols, canonical_forms)
+        self.source = source
+
+        if folded_names is None:
+            if names is None:
+                names = ((self.details.get(symbol, {}).get('name'), symbol) for symbol in symbols)
+            folded_names = iter_name_entries(names)
+        self.names = frozenset(folded_names)
+        self.name_automaton = build_name_automaton(self.names)
+
+        # 两次全量刷新之间通过变更流产生的增量
+        self.added_symbols = frozenset()
+        self.added_details: Dict[str, Dict] = {}
+        self.removed_symbols = frozenset()
+        self.delta_automaton = AhoCorasickAutomaton()
+        self.added_names = frozenset()
+        self.delta_name_automaton = AhoCorasickAutomaton()
+
+        self.built_at = datetime.now()
+        self.build_seconds = time.perf_counter() - start_time
+
+    def __len__(self) -> int:
+        return len(self.symbols) - len(self.removed_symbols) + len(self.added_symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        if symbol in self.added_symbols:
+            return True
+        return symbol in self.symbols and symbol not in self.removed_symbols
+
+    def get_details(self, symbol: str) -> Optional[Dict]:
+        """
+        获取 token 详情
+
+        Args:
+            symbol: 标准化后的符号
+
+        Returns:
+            详情字典，不存在时返回 None
+        """
+        if symbol in self.added_details:
+            return self.added_details[symbol]
+        if symbol in self.removed_symbols:
+            return None
+        return self.details.get(symbol)
+
+    def with_added(self, symbol: str, token_data: Dict = None) -> 'TokenIndex':
+        """
+        返回加入一个符号后的新快照
+
+        Args:
+            symbol: 标准化后的符号
+            token_data: token 详情
+
+        Returns:
+            新快照（当前快照不变）
+        """
+        index = copy.copy(self)
+        index.removed_symbols = self.removed_symbols - {symbol}
+        if token_data:
+            index.added_details = {**self.added_details, symbol: token_data}
+
+        # 主自动机里没有的符号加入增量自动机（增量集合很小，直接重建）
+        if symbol not in self.symbols and symbol not in self.added_symbols:
+            index.added_symbols = self.added_symbols | {symbol}
+            index.delta_automaton = build_automaton(index.added_symbols)
+
+        # 新名称同样进入增量名称自动机
+        new_names = {entry for entry in iter_name_entries([((token_data or {}).get('name'), symbol)])
+                     if entry not in self.names and entry not in self.added_names}
+        if new_names:
+            index.added_names = self.added_names | new_names
+            index.delta_name_automaton = build_name_automaton(index.added_names)
+        return index
+
+    def with_removed(self, symbol: str) -> 'TokenIndex':
+        """
+        返回删除一个符号后的新快照
+
+        Args:
+            symbol: 标准化后的符号
+
+        Returns:
+            新快照（当前快照不变）
+        """
+        index = copy.copy(self)
+        index.added_details = {k: v for k, v in self.added_details.items() if k != symbol}
+        if symbol in self.added_symbols:
+            index.added_symbols = self.added_symbols - {symbol}
+            index.delta_automaton = build_automaton(index.added_symbols)
+        if symbol in self.symbols:
+            index.removed_symbols = self.removed_symbols | {symbol}
+        if any(entry_symbol == symbol for _, entry_symbol in self.added_names):
+            index.added_names = frozenset(entry for entry in self.added_names if entry[1] != symbol)
+            index.delta_name_automaton = build_name_automaton(index.added_names)
+        return index
+
+    def save_snapshot(self, path: str, source: Dict = None):
+        """
+        保存为磁盘快照文件（先写同目录下唯一命名的临时文件再替换，读取方不会看到写了一半的文件，
+        多个进程同时保存也不会互相覆盖临时文件）
+
+        文件布局（整数均为小端）:
+            头部: magic(8s) version(I) count(I) created_at(d) source_length(I)，随后是 source 的 JSON
+            偏移表: 符号 / 规范形式 / 详情 / 名称四段各 count+1 个 uint64（相对各自数据段起点）
+            数据段: UTF-8 符号、UTF-8 规范形式、紧凑 JSON 详情、换行分隔的折叠名称，按符号排序
+
+        Args:
+            path: 快照文件路径
+            source: 数据来源（Redis 地址、集合 key、key 前缀），加载时用来拒绝其他注册表的快照
+        """
+        symbols = sorted(symbol for symbol in self.symbols | self.added_symbols if symbol in self)
+        names_by_symbol: Dict[str, List[str]] = {}
+        for folded, symbol in sorted(self.names | self.added_names):
+            names_by_symbol.setdefault(symbol, []).append(folded)
+
+        blobs = []
+        for encode in (
+            lambda symbol: symbol.encode('utf-8'),
+            lambda symbol: canonical_symbol(symbol).encode('utf-8'),
+            lambda symbol: encode_details(self.get_details(symbol)),
+            lambda symbol: '\n'.join(names_by_symbol.get(symbol, ())).encode('utf-8'),
+        ):
+            offsets = array('Q', [0])
+            chunks = []
+            for symbol in symbols:
+                chunk = encode(symbol)
+                chunks.append(chunk)
+                offsets.append(offsets[-1] + len(chunk))
+            blobs.append((offsets, b''.join(chunks)))
+
+        if sys.byteorder != 'little':
+            for offsets, _ in blobs:
+                offsets.byteswap()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        source_bytes = json.dumps(source or {}, sort_keys=True).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=directory or None, prefix=os.path.basename(path) + '.',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, len(symbols), time.time(),
+                                              len(source_bytes)))
+                f.write(source_bytes)
+                for offsets, _ in blobs:
+                    f.write(offsets.tobytes())
+                for _, blob in blobs:
+                    f.write(blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load_snapshot(cls, path: str, source: Dict = None) -> 'TokenIndex':
+        """
+        通过 mmap 加载磁盘快照
+
+        符号和规范形式读入内存用于构建自动机，详情留在映射页中按需解码，
+        多个进程加载同一文件时共享这部分页面。
+
+        Args:
+            path: 快照文件路径
+            source: 期望的数据来源（None 表示不检查）；与保存时记录的不一致时拒绝加载
+
+        Returns:
+            索引快照
+        """
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, created_at, source_length = _SNAPSHOT_HEADER.unpack_from(buffer, 0)
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported token index snapshot: {path}")
+
+        position = _SNAPSHOT_HEADER.size
+        saved_source = json.loads(buffer[position:position + source_length].decode('utf-8'))
+        if source is not None and saved_source != source:
+            raise ValueError(f"Token index snapshot {path} was saved from {saved_source}, expected {source}")
+        position += source_length
+        offset_tables = []
+        for _ in range(4):
+            offsets = array('Q')
+            offsets.frombytes(buffer[position:position + (count + 1) * 8])
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+            offset_tables.append(offsets)
+            position += (count + 1) * 8
+
+        symbol_offsets, canonical_offsets, detail_offsets, name_offsets = offset_tables
+        symbol_base = position
+        canonical_base = symbol_base + symbol_offsets[-1]
+        detail_base = canonical_base + canonical_offsets[-1]
+        name_base = detail_base + detail_offsets[-1]
+
+        symbols = _split_blob(buffer[symbol_base:canonical_base], symbol_offsets)
+        canonical_forms = _split_blob(buffer[canonical_base:detail_base], canonical_offsets)
+        name_lists = _split_blob(buffer[name_base:name_base + name_offsets[-1]], name_offsets)
+        folded_names = [(folded, symbol) for symbol, names in zip(symbols, name_lists)
+                        for folded in names.split('\n') if folded]
+
+        details = PackedTokenDetails(buffer, symbols, detail_offsets, detail_base)
+        index = cls(symbols, details, canonical_forms=canonical_forms, source='snapshot',
+                    folded_names=folded_names)
+        index.built_at = datetime.fromtimestamp(created_at)
+        return index
+
+    def find_hits(self, text: str, canonical: Tuple[str, Optional[List[int]]] = None) -> Tuple[List, List, List]:
+        """
+        一次线性扫描找出所有已知符号的出现位置，并按三种匹配方法分类
+
+        文本先转为规范形式（与构建时的符号规范形式一致），分类规则作用在规范文本上，
+        命中的符号直接从自动机的值中取出，不再逐个做大小写 / 编码转换。
+
+        Args:
+            text: 原文
+            canonical: 已算好的 canonicalize(text) 结果（可选，例如来自 TweetDocument）
+
+        Returns:
+            (dollar_hits, word_hits, chinese_hits)，均为按位置排序的
+            (原文起点, 原文终点, 规范文本中的匹配, 符号) 列表
+        """
+        dollar_hits = []
+        word_hits = []
+        chinese_hits = []
+        seen_spans = set()
+
+        canonical_text, positions = canonical or canonicalize(text)
+        folded_text = canonical_text.translate(ASCII_UPPER_TABLE)
+        for automaton in (self.automaton, self.delta_automaton):
+            for start, end, variants in automaton.iter(folded_text):
+                match = canonical_text[start:end]
+                original_start, original_end = original_span(positions, start, end)
+
+                # 主自动机与增量自动机可能命中同一位置，只分类一次
+                if (start, end) not in seen_spans:
+                    seen_spans.add((start, end))
+
+                    before = canonical_text[start - 1] if start > 0 else ''
+                    after = canonical_text[end] if end < len(canonical_text) else ''
+
+                    # 方法1: $SYMBOL 格式 —— 紧跟 $ 且覆盖 $ 后的完整字符串；
+                    # 纯英文字母按大写形式查找，否则按原样查找
+                    if before == '$' and not (after and _is_cashtag_char(after)) and \
+                            all(_is_cashtag_char(ch) for ch in match):
+                        lookups = (match.upper(), match) if match.isascii() and match.isalpha() else (match,)
+                        symbol = self._resolve_variant(variants, lookups)
+                        if symbol is not None:
+                            dollar_hits.append((original_start, original_end, match, symbol))
+
+                    # 方法2: 纯英文大写单词 —— 与 \b([A-Z][A-Z0-9]{1,10})\b 等价
+                    if 2 <= len(match) <= 11 and 'A' <= match[0] <= 'Z' and \
+                            all('A' <= ch <= 'Z' or '0' <= ch <= '9' for ch in match) and \
+                            not (before.isalnum() or before == '_') and \
+                            not (after.isalnum() or after == '_'):
+                        symbol = self._resolve_variant(variants, (match,))
+                        if symbol is not None:
+                            word_hits.append((original_start, original_end, match, symbol))
+
+                # 方法3: 中文 token —— 规范文本逐字相同即可
+                for canonical, symbol in variants:
+                    if canonical == match and symbol in self and any(_is_cjk_char(ch) for ch in canonical):
+                        chinese_hits.append((original_start, original_end, match, symbol))
+
+        dollar_hits.sort()
+        word_hits.sort()
+        chinese_hits.sort()
+        return dollar_hits, word_hits, chinese_hits
+
+    def _resolve_variant(self, variants: Tuple[Tuple[str, str], ...], lookups: Tuple[str, ...]) -> Optional[str]:
+        """按顺序在 (规范形式, 符号) 中查找规范形式等于 lookups 之一且仍在索引中的符号"""
+        for lookup in lookups:
+            for canonical, symbol in variants:
+                if canonical == lookup and symbol in self:
+                    return symbol
+        return None
+
+    def find_name_hits(self, text: str, canonical: Tuple[str, Optional[List[int]]] = None) -> List[Tuple[int, int, str]]:
+        """
+        一次线性扫描找出所有 token 名称的出现位置（忽略大小写，空白数量不限）
+
+        名称两端是英文字母或数字时要求原文在该处是单词边界，避免命中更长单词的一部分。
+
+        Args:
+            text: 原文
+            canonical: 已算好的 canonicalize(text) 结果（可选）
+
+        Returns:
+            按位置排序的 (原文起点, 原文终点, 符号) 列表
+        """
+        if not len(self.name_automaton) and not len(self.delta_name_automaton):
+            return []
+
+        folded_text, positions = fold_text_for_names(text, canonical)
+        hits = set()
+        for automaton in (self.name_automaton, self.delta_name_automaton):
+            for start, end, symbols in automaton.iter(folded_text):
+                original_start = positions[start]
+                original_end = positions[end - 1] + 1
+
+                if _is_word_char(text[original_start]) and original_start > 0 and \
+                        _is_word_char(text[original_start - 1]):
+                    continue
+                if _is_word_char(text[original_end - 1]) and original_end < len(text) and \
+                        _is_word_char(text[original_end]):
+                    continue
+
+                for symbol in symbols:
+                    if symbol in self:
+                        hits.add((original_start, original_end, symbol))
+
+        return sorted(hits)
+
+
+_SNAPSHOT_MAGIC = b'NLPTIDX1'
+_SNAPSHOT_VERSION = 4
+_SNAPSHOT_HEADER = struct.Struct('<8sIIdI')
+
+
+def encode_details(token_data: Optional[Dict]) -> bytes:
+    """把 token 详情编码为紧凑 JSON 字节（空详情编码为空字节串）"""
+    if not token_data:
+        return b''
+    return json.dumps(token_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _split_blob(blob: bytes, offsets: array) -> List[str]:
+    return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+class PackedTokenDetails:
+    """
+    紧凑的 token 详情存储
+
+    所有详情按符号排序后编码为一段连续的 JSON 字节，另存一个偏移数组，
+    每个 token 只占几十字节而不是一个完整的 dict；查询时二分定位并解码。
+    buffer 可以是内存中的 bytes，也可以是磁盘快照的 mmap（多个进程共享页面）。
+    """
+
+    def __init__(self, buffer, symbols: List[str], offsets: array, base: int = 0):
+        """
+        Args:
+            buffer: 详情数据（bytes 或 mmap）
+            symbols: 已排序的符号列表（与详情一一对应）
+            offsets: 详情偏移表（count+1 项）
+            base: 详情数据段在 buffer 中的起点
+        """
+        self.buffer = buffer
+        self.symbols = symbols
+        self.offsets = offsets
+        self.base = base
+
+    @classmethod
+    def from_encoded(cls, encoded: Dict[str, bytes]) -> 'PackedTokenDetails':
+        """
+        从 符号 -> encode_details() 结果 构建
+
+        Args:
+            encoded: 符号 -> 编码后的详情
+
+        Returns:
+            紧凑详情存储
+        """
+        symbols = sorted(encoded)
+        offsets = array('Q', [0])
+        chunks = []
+        for symbol in symbols:
+            chunk = encoded[symbol]
+            chunks.append(chunk)
+            offsets.append(offsets[-1] + len(chunk))
+        return cls(b''.join(chunks), symbols, offsets)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return self.get(symbol) is not None
+
+    @property
+    def nbytes(self) -> int:
+        """详情数据的字节数"""
+        return self.offsets[-1] if len(self.offsets) else 0
+
+    def get(self, symbol: str, default: Dict = None) -> Optional[Dict]:
+        """
+        获取 token 详情（每次返回新解码的字典）
+
+        Args:
+            symbol: 标准化后的符号
+            default: 不存在时的返回值
+
+        Returns:
+            详情字典或 default
+        """
+        i = bisect_left(self.symbols, symbol)
+        if i == len(self.symbols) or self.symbols[i] != symbol:
+            return default
+
+        start = self.base + self.offsets[i]
+        end = self.base + self.offsets[i + 1]
+        if start == end:
+            return default
+        return json.loads(self.buffer[start:end].decode('utf-8'))
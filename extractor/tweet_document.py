@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推文预处理文档
+收到推文时一次性完成小写、分词、正则提取和关键词扫描，之后在检测流水线各阶段之间共享，
+避免 Redis 匹配、上下文评分、模式提取各自重复处理同一段文本
+
+特点:
+- 构建后只读，各阶段只读取不修改
+- 关键词只扫描一次（Aho-Corasick），各阶段按自己的关键词集合取子集
+- 主推文的规范化文本（NFKC / 形近字母折叠）直接供 RedisTokenMatcher 使用
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from context_scorer import ContextScorer, ContextScores, lower_preserving_length
+from text_normalizer import canonicalize
+
+
+# 与 RealtimeBERTAnalyzer 的模式一致
+CASHTAG_PATTERN = re.compile(r'\$([A-Z][A-Z0-9]{1,10})\b')
+UPPER_RUN_PATTERN = re.compile(r'\b([A-Z]{2,10})\b')
+WORD_PATTERN = re.compile(r'\S+')
+
+
+def extract_tweet_text(tweet_data: Dict) -> str:
+    """
+    取推文正文（兼容 text / full_text / 嵌套 status 几种格式）
+
+    Args:
+        tweet_data: 推文数据字典
+
+    Returns:
+        推文正文
+    """
+    status = tweet_data.get('status') or {}
+    return tweet_data.get('text') or tweet_data.get('full_text') or \
+        status.get('text') or status.get('full_text') or ''
+
+
+def build_combined_text(text: str, tweet_data: Dict) -> str:
+    """
+    合并正文、回复的原推文和引用推文
+
+    Args:
+        text: 推文正文
+        tweet_data: 推文数据字典
+
+    Returns:
+        合并后的文本
+    """
+    combined_text = text
+
+    # 添加 replyToStatus 内容
+    if tweet_data.get('replyToStatus'):
+        reply_text = tweet_data['replyToStatus'].get('text', '')
+        if reply_text:
+            combined_text += ' ' + reply_text
+
+    # 添加 quotedStatus 内容
+    if tweet_data.get('quotedStatus'):
+        quoted_text = tweet_data['quotedStatus'].get('text', '')
+        if quoted_text:
+            combined_text += ' ' + quoted_text
+
+    return combined_text
+
+
+class TweetDocument:
+    """一条推文的预处理结果（只读）"""
+
+    def __init__(self, tweet_data: Dict, keyword_scorer: ContextScorer = None):
+        """
+        预处理推文
+
+        Args:
+            tweet_data: 推文数据字典
+            keyword_scorer: 关键词扫描器，关键词应覆盖所有使用本文档的阶段；
+                            None 表示不预先扫描（各阶段自行扫描）
+        """
+        self.tweet_data = tweet_data
+        self.text = extract_tweet_text(tweet_data)
+        self.combined_text = build_combined_text(self.text, tweet_data)
+
+        # 合并文本的小写形式（长度不变，位置与原文一致）
+        self.lower_text = lower_preserving_length(self.combined_text)
+
+        # 合并文本的分词位置、$ 符号、大写词
+        self.word_spans: Tuple[Tuple[int, int], ...] = tuple(
+            match.span() for match in WORD_PATTERN.finditer(self.combined_text)
+        )
+        self.dollar_count = self.combined_text.count('$')
+        self.cashtags: Tuple[str, ...] = tuple(CASHTAG_PATTERN.findall(self.combined_text))
+        self.upper_runs: Tuple[str, ...] = tuple(UPPER_RUN_PATTERN.findall(self.combined_text))
+
+        # Twitter 官方识别的 $ 符号
+        self.entity_symbols: Tuple[str, ...] = tuple(
+            symbol_data.get('text', '')
+            for symbol_data in (tweet_data.get('entities') or {}).get('symbols', [])
+        )
+
+        # 正文的规范化形式（RedisTokenMatcher 在正文上匹配）
+        self.canonical_text, self.canonical_positions = canonicalize(self.text)
+
+        # 合并文本中所有关键词的位置
+        self.keyword_scorer = keyword_scorer
+        self.keyword_scores: Optional[ContextScores] = \
+            keyword_scorer.scan(self.combined_text) if keyword_scorer else None
+
+    @classmethod
+    def from_text(cls, text: str, keyword_scorer: ContextScorer = None) -> 'TweetDocument':
+        """
+        从纯文本构建（没有完整推文数据时使用）
+
+        Args:
+            text: 文本
+            keyword_scorer: 关键词扫描器
+
+        Returns:
+            推文文档
+        """
+        return cls({'text': text}, keyword_scorer)
+
+    @property
+    def word_count(self) -> int:
+        return len(self.word_spans)
+
+    def covers_keywords(self, keywords: Iterable[str]) -> bool:
+        """预先扫描的关键词是否包含给定的全部关键词"""
+        if self.keyword_scorer is None:
+            return False
+        return set(keywords) <= set(self.keyword_scorer.keywords)
+
+    def present_keywords(self) -> FrozenSet[str]:
+        """
+        合并文本中出现过的关键词（子串出现即算）
+
+        Returns:
+            关键词集合
+        """
+        if self.keyword_scores is None:
+            return frozenset()
+        keywords = self.keyword_scorer.keywords
+        return frozenset(keywords[i] for i in self.keyword_scores.prefix_counts)
+
+    def context_scores(self, keywords: Iterable[str], window: int, text_only: bool = True) -> Optional[ContextScores]:
+        """
+        取某个阶段关键词集合的位置表
+
+        Args:
+            keywords: 该阶段使用的关键词
+            window: 上下文窗口大小
+            text_only: 只统计正文部分（合并文本的开头就是正文）
+
+        Returns:
+            ContextScores；没有预先扫描或关键词不完整时返回 None
+        """
+        keywords = set(keywords)
+        if not self.covers_keywords(keywords):
+            return None
+
+        keyword_ids = [i for i, keyword in enumerate(self.keyword_scorer.keywords) if keyword in keywords]
+        return self.keyword_scores.restrict(
+            keyword_ids,
+            text_length=len(self.text) if text_only else None,
+            window=window
+        )
@@ -7,13 +7,16 @@ import csv
 import redis
 import sys
 
-# 配置
-REDIS_HOST = "127.0.0.1"
-REDIS_PORT = 6379
-REDIS_DB = 0
-REDIS_KEY_PREFIX = "nlpmeme:token:"
-REDIS_SET_KEY = "nlpmeme:tokens:all"
-CSV_FILE = "tokens_data.csv"
+from config import (
+    CSV_FILE,
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_KEY_PREFIX,
+    REDIS_SET_KEY,
+    REDIS_CHANGES_STREAM,
+    REDIS_CHANGES_MAXLEN,
+)
 
 
 def add_token(symbol, name, timestamp):
@@ -59,6 +62,10 @@ def add_token(symbol, name, timestamp):
         # 添加到集合
         redis_client.sadd(REDIS_SET_KEY, token_key_str)
         
+        # 发布到变更流，正在运行的匹配器会立即加载
+        redis_client.xadd(REDIS_CHANGES_STREAM, {"op": "add", "key": token_key_str, **token_data},
+                          maxlen=REDIS_CHANGES_MAXLEN, approximate=True)
+        
         print(f"✓ 已添加到 Redis: {redis_key}")
     except Exception as e:
         print(f"✗ Redis 添加失败: {e}")
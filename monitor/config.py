@@ -33,6 +33,9 @@ CACHE_SIZE = 10000  # 内存缓存的token数量，用于快速去重
 REDIS_HOST = "127.0.0.1"
 REDIS_PORT = 6379
 REDIS_DB = 0
-REDIS_KEY_PREFIX = "token:"
-REDIS_SET_KEY = "monitored_tokens"
+# token 注册表与变更流使用同一命名空间，与 RedisTokenMatcher 读取的 key 一致
+REDIS_KEY_PREFIX = "nlpmeme:token:"
+REDIS_SET_KEY = "nlpmeme:tokens:all"
+REDIS_CHANGES_STREAM = "nlpmeme:tokens:changes"  # token 增删变更流，RedisTokenMatcher 订阅后实时更新缓存
+REDIS_CHANGES_MAXLEN = 100000  # 变更流保留的最大消息数（近似裁剪）
 
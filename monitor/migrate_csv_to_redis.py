@@ -12,6 +12,8 @@ from config import (
     REDIS_DB,
     REDIS_KEY_PREFIX,
     REDIS_SET_KEY,
+    REDIS_CHANGES_STREAM,
+    REDIS_CHANGES_MAXLEN,
     CSV_FILE
 )
 
@@ -75,6 +77,10 @@ def migrate_csv_to_redis():
             # 添加到集合
             redis_client.sadd(REDIS_SET_KEY, token_key_str)
             
+            # 发布到变更流
+            redis_client.xadd(REDIS_CHANGES_STREAM, {"op": "add", "key": token_key_str, **token_data},
+                              maxlen=REDIS_CHANGES_MAXLEN, approximate=True)
+            
             migrated_count += 1
             
             if migrated_count % 10 == 0:
@@ -111,8 +117,12 @@ def clear_redis_data():
         decode_responses=True
     )
     
-    # 删除集合
+    # 通知匹配器删除（先删集合，匹配器收到事件时不会再查到残留的 key）
+    token_keys = redis_client.smembers(REDIS_SET_KEY)
     redis_client.delete(REDIS_SET_KEY)
+    for token_key_str in token_keys:
+        redis_client.xadd(REDIS_CHANGES_STREAM, {"op": "remove", "key": token_key_str},
+                          maxlen=REDIS_CHANGES_MAXLEN, approximate=True)
     
     # 删除所有 hash keys
     pattern = f"{REDIS_KEY_PREFIX}*"
@@ -34,7 +34,9 @@ from config import (
     REDIS_PORT,
     REDIS_DB,
     REDIS_KEY_PREFIX,
-    REDIS_SET_KEY
+    REDIS_SET_KEY,
+    REDIS_CHANGES_STREAM,
+    REDIS_CHANGES_MAXLEN
 )
 
 
@@ -313,7 +315,8 @@ class TokenMonitor:
                 
         if new_tokens:
             try:
-                # 保存到 Redis
+                # 保存到 Redis（一次 pipeline 提交）
+                pipe = self.redis_client.pipeline(transaction=False)
                 for symbol, name, ts in new_tokens:
                     token_key_str = f"{symbol}:{name}"
                     token_data = {
@@ -324,10 +327,14 @@ class TokenMonitor:
                     
                     # 存储到 Redis Hash
                     redis_key = f"{REDIS_KEY_PREFIX}{token_key_str}"
-                    self.redis_client.hset(redis_key, mapping=token_data)
+                    pipe.hset(redis_key, mapping=token_data)
                     
                     # 添加到集合（用于快速查询所有token）
-                    self.redis_client.sadd(REDIS_SET_KEY, token_key_str)
+                    pipe.sadd(REDIS_SET_KEY, token_key_str)
+                    
+                    # 发布到变更流，匹配器无需等待下次全量刷新
+                    self._publish_token_change(pipe, "add", token_key_str, token_data)
+                pipe.execute()
                 
                 # 同时保存到 CSV 作为备份
                 with open(self.csv_file, 'a', newline='', encoding='utf-8') as f:
@@ -339,6 +346,21 @@ class TokenMonitor:
             except Exception as e:
                 self.logger.error(f"保存数据失败: {e}")
                 
+    def _publish_token_change(self, pipe, op: str, token_key_str: str, token_data: Dict = None):
+        """
+        发布 token 增删事件到变更流
+        
+        Args:
+            pipe: Redis pipeline（与写入操作一起提交）
+            op: "add" 或 "remove"
+            token_key_str: token key，格式 "symbol:name"
+            token_data: token 详情（add 时附带）
+        """
+        fields = {"op": op, "key": token_key_str}
+        if token_data:
+            fields.update(token_data)
+        pipe.xadd(REDIS_CHANGES_STREAM, fields, maxlen=REDIS_CHANGES_MAXLEN, approximate=True)
+        
     async def _monitor_loop(self):
         """主监控循环"""
         self.logger.info("开始监控...")
@@ -24,8 +24,14 @@ sys.path.insert(0, os.path.join(project_root, 'audit'))
 
 # 导入模块
 from monitor.twitter_listener import TwitterListener
+from monitor.config import (REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_SET_KEY, REDIS_KEY_PREFIX,
+                            REDIS_CHANGES_STREAM)
 from extractor.realtime_bert_analyzer import RealtimeBERTAnalyzer
+from extractor.ner_cascade import NERGate
+from extractor.ner_cache import NERCache
 from extractor.redis_token_matcher import RedisTokenMatcher
+from extractor.context_scorer import ContextScorer
+from extractor.tweet_document import TweetDocument
 from audit.realtime_auditor import RealtimeAuditor
 
 
@@ -35,7 +41,12 @@ class RealtimeCADetector:
     def __init__(self, ws_url: str, use_bert: bool = True, use_ai: bool = True,
                  min_confidence: float = 0.5, min_context_score: float = 0.2,
                  auto_reconnect: bool = True, max_reconnect_attempts: int = 10,
-                 ping_interval: float = 30.0, ping_timeout: float = 10.0):
+                 ping_interval: float = 30.0, ping_timeout: float = 10.0,
+                 ner_batch_size: int = 8, ner_batch_wait_ms: float = 10.0,
+                 ner_backend: str = 'pytorch', ner_min_context: float = None,
+                 ner_cache_size: int = 10000, ner_cache_ttl: float = 3600.0, share_ner_cache: bool = False,
+                 ner_workers: int = 0, analysis_threads: int = 1, ner_service: str = None,
+                 tweet_queue_size: int = 1000):
         """
         初始化检测器
         
@@ -49,6 +60,17 @@ class RealtimeCADetector:
             max_reconnect_attempts: 最大重连次数
             ping_interval: 心跳间隔(秒)
             ping_timeout: 心跳超时时间(秒)
+            ner_batch_size: BERT 微批处理的最大批大小(不超过 analysis_threads，单线程时不启用)
+            ner_batch_wait_ms: BERT 微批处理的最长等待时间(毫秒)
+            ner_backend: BERT 推理后端 ('pytorch' 或 'onnx')
+            ner_min_context: 启用 NER 级联门控时的关键词密度阈值（None 表示每条推文都运行 BERT）
+            ner_cache_size: NER 结果缓存的条数（0 表示不缓存）
+            ner_cache_ttl: NER 结果缓存的有效期(秒)
+            share_ner_cache: 是否通过 Redis 在多个检测器进程间共享 NER 结果缓存
+            ner_workers: BERT 推理子进程数(0 表示在检测器进程内推理)
+            analysis_threads: 分析推文的工作线程数(监听线程只负责解析和入队)
+            ner_service: 本地 NER 推理服务地址(设置时不在本进程加载模型)
+            tweet_queue_size: 待分析推文队列的最大长度(满时丢弃最早的推文)
         """
         self.ws_url = ws_url
         self.use_bert = use_bert
@@ -58,9 +80,42 @@ class RealtimeCADetector:
         
         # 创建组件
         print("\n[Detector] Initializing components...")
-        self.analyzer = RealtimeBERTAnalyzer(use_gpu=False, use_bert=use_bert)
-        self.redis_matcher = RedisTokenMatcher()  # 初始化 Redis token matcher
+        # 初始化 Redis token matcher（与 monitor 写入方使用同一组 key）
+        self.redis_matcher = RedisTokenMatcher(
+            redis_host=REDIS_HOST,
+            redis_port=REDIS_PORT,
+            redis_db=REDIS_DB,
+            redis_set_key=REDIS_SET_KEY,
+            redis_key_prefix=REDIS_KEY_PREFIX,
+            redis_stream_key=REDIS_CHANGES_STREAM
+        )
+        
+        # NER 结果缓存（共享时复用 matcher 的 Redis 连接；命名空间由分析器按实际加载的模型和后端确定）
+        ner_cache = None
+        if ner_cache_size > 0:
+            ner_cache = NERCache(
+                max_entries=ner_cache_size,
+                ttl_seconds=ner_cache_ttl,
+                redis_client=self.redis_matcher.redis_client if share_ner_cache else None
+            )
+        
+        self.analyzer = RealtimeBERTAnalyzer(use_gpu=False, use_bert=use_bert,
+                                             ner_batch_size=ner_batch_size,
+                                             ner_batch_wait_ms=ner_batch_wait_ms,
+                                             ner_backend=ner_backend,
+                                             background_load=True,
+                                             ner_gate=NERGate(ner_min_context) if ner_min_context is not None else None,
+                                             ner_cache=ner_cache,
+                                             ner_workers=ner_workers,
+                                             ner_service=ner_service,
+                                             ner_callers=max(1, analysis_threads))
         self.auditor = RealtimeAuditor(use_ai=use_ai, rate_limit=1.5)
+        
+        # 推文预处理时一次扫描两个阶段用到的全部关键词
+        self.document_scorer = ContextScorer(
+            self.analyzer.crypto_keywords | self.redis_matcher.crypto_keywords,
+            window=self.redis_matcher.context_scorer.window
+        )
         self.listener = TwitterListener(ws_url, 
                                        on_tweet_callback=self.on_tweet_received,
                                        on_raw_message_callback=self.on_raw_message_received,
@@ -72,14 +127,22 @@ class RealtimeCADetector:
         # 已处理的代币集合(避免重复审计)
         self.processed_tokens = set()
         
+        # 推文分析队列(监听线程只入队，分析在工作线程中进行，不阻塞收包和心跳；
+        # 分析跟不上时丢弃最早的推文，保留最新的)
+        self.tweet_queue = queue.Queue(maxsize=max(1, tweet_queue_size))
+        self.analysis_thread_count = max(1, analysis_threads)
+        self.analysis_threads = []
+        
         # 审计队列(用于异步处理)
         self.audit_queue = queue.Queue()
         self.audit_thread = None
         self.running = False
         
-        # 统计信息
+        # 统计信息(监听、分析、审计线程共用，通过 _count 更新)
+        self._stats_lock = threading.Lock()
         self.stats = {
             'tweets_received': 0,
+            'tweets_dropped': 0,
             'tokens_extracted': 0,
             'tokens_audited': 0,
             'contracts_found': 0,
@@ -157,13 +220,66 @@ class RealtimeCADetector:
     
     def on_tweet_received(self, tweet_data: Dict):
         """
-        收到推文时的回调函数
+        收到推文时的回调函数（在监听线程中执行，只入队）
         
         Args:
             tweet_data: 推文数据字典
         """
-        self.stats['tweets_received'] += 1
+        item = (self._count('tweets_received'), tweet_data)
+        while True:
+            try:
+                self.tweet_queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                self.tweet_queue.get_nowait()
+                self.tweet_queue.task_done()
+            except queue.Empty:
+                continue
+            dropped = self._count('tweets_dropped')
+            if dropped == 1 or dropped % 100 == 0:
+                print(f"[Detector] Tweet queue full, dropped {dropped} oldest tweet(s) so far")
+    
+    def _count(self, key: str, amount: int = 1) -> int:
+        """
+        线程安全地累加一项统计
         
+        Args:
+            key: 统计项
+            amount: 增量
+            
+        Returns:
+            累加后的值
+        """
+        with self._stats_lock:
+            self.stats[key] += amount
+            return self.stats[key]
+    
+    def analysis_worker(self):
+        """推文分析工作线程"""
+        while self.running:
+            try:
+                tweet_number, tweet_data = self.tweet_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            
+            try:
+                self.process_tweet(tweet_data, tweet_number)
+            finally:
+                self.tweet_queue.task_done()
+    
+    def process_tweet(self, tweet_data: Dict, tweet_number: int = 0):
+        """
+        分析一条推文并把提取到的代币加入审计队列
+        
+        Args:
+            tweet_data: 推文数据字典
+            tweet_number: 推文序号(用于日志)
+        """
+        # 多个分析线程并发时，每条推文的输出先缓存，最后一次性打印，避免相互穿插
+        lines = []
+        log = lines.append
         try:
             # 从推文数据中提取真实的推文ID
             tweet_id = tweet_data.get('id') or tweet_data.get('id_str') or str(tweet_data.get('tweet_id', ''))
@@ -176,45 +292,47 @@ class RealtimeCADetector:
                 tweet_id = datetime.now().isoformat()
             
             # DEBUG: 打印完整的推文数据
-            print("\n" + "="*70)
-            print(f"[Detector] Processing tweet #{self.stats['tweets_received']}")
-            print(f"[Detector] Tweet ID: {tweet_id}")
-            print("="*70)
-            print("[DEBUG] Complete Tweet Data:")
-            print(json.dumps(tweet_data, indent=2, ensure_ascii=False))
-            print("-"*70)
+            log("\n" + "="*70)
+            log(f"[Detector] Processing tweet #{tweet_number}")
+            log(f"[Detector] Tweet ID: {tweet_id}")
+            log("="*70)
+            log("[DEBUG] Complete Tweet Data:")
+            log(json.dumps(tweet_data, indent=2, ensure_ascii=False))
+            log("-"*70)
             
-            # 提取推文文本用于 Redis 匹配
-            tweet_text = tweet_data.get('text') or tweet_data.get('full_text') or \
-                        tweet_data.get('status', {}).get('text') or \
-                        tweet_data.get('status', {}).get('full_text') or ''
+            # 预处理推文（正文、合并文本、分词、关键词位置），之后各阶段共用
+            document = TweetDocument(tweet_data, self.document_scorer)
             
-            # 第一步：使用 Redis matcher 快速检查是否包含已知 token
-            print("\n[Detector] Step 1: Checking against Redis known tokens...")
-            redis_matches = self.redis_matcher.match_tokens_in_text(tweet_text)
+            # 第一步：使用 Redis matcher 快速检查是否包含已知 token（匹配推文正文）
+            log("\n[Detector] Step 1: Checking against Redis known tokens...")
+            redis_matches = self.redis_matcher.match_document(document)
             
             if redis_matches:
-                print(f"[Detector] ✓ Found {len(redis_matches)} known token(s) from Redis:")
+                log(f"[Detector] ✓ Found {len(redis_matches)} known token(s) from Redis:")
                 for match in redis_matches:
-                    print(f"  - ${match['symbol']} ({match['match_type']}, "
-                          f"confidence: {match['confidence']:.2f}, "
-                          f"from Redis)")
+                    log(f"  - ${match['symbol']} ({match['match_type']}, "
+                        f"confidence: {match['confidence']:.2f}, "
+                        f"from Redis)")
                     
                     # 标记为高优先级
                     match['priority'] = 'high'
                     match['known_token'] = True
             else:
-                print("[Detector] No known tokens found in Redis")
+                log("[Detector] No known tokens found in Redis")
             
             # 第二步：使用 BERT/Pattern 分析提取新 token
-            print("\n[Detector] Step 2: Analyzing with BERT/Pattern extraction...")
-            analysis_result = self.analyzer.analyze_tweet(tweet_data)
+            log("\n[Detector] Step 2: Analyzing with BERT/Pattern extraction...")
+            analysis_result = self.analyzer.analyze_tweet(
+                tweet_data, document=document,
+                known_symbols=[match['symbol'] for match in redis_matches],
+                log=log
+            )
             
             # 提取代币
             bert_tokens = analysis_result.get('tokens', [])
             
             # 第三步：合并 Redis 匹配和 BERT 分析结果
-            print("\n[Detector] Step 3: Merging Redis matches with BERT results...")
+            log("\n[Detector] Step 3: Merging Redis matches with BERT results...")
             all_tokens = []
             seen_symbols = set()
             
@@ -243,37 +361,37 @@ class RealtimeCADetector:
                                 token.get('confidence', 0),
                                 bert_token.get('confidence', 0)
                             )
-                            print(f"[Detector] Updated confidence for ${symbol}: {token['confidence']:.2f}")
+                            log(f"[Detector] Updated confidence for ${symbol}: {token['confidence']:.2f}")
             
             if not all_tokens:
-                print("[Detector] No tokens found in this tweet")
+                log("[Detector] No tokens found in this tweet")
                 return
             
-            print(f"\n[Detector] Total {len(all_tokens)} unique token(s) after merging:")
+            log(f"\n[Detector] Total {len(all_tokens)} unique token(s) after merging:")
             for token_info in all_tokens:
                 is_known = "✓ KNOWN" if token_info.get('known_token', False) else "NEW"
                 priority = token_info.get('priority', 'normal').upper()
-                print(f"  - ${token_info['symbol']} [{is_known}] [{priority}] "
-                      f"(confidence: {token_info.get('confidence', 0):.2f}, "
-                      f"source: {token_info.get('source', 'unknown')})")
+                log(f"  - ${token_info['symbol']} [{is_known}] [{priority}] "
+                    f"(confidence: {token_info.get('confidence', 0):.2f}, "
+                    f"source: {token_info.get('source', 'unknown')})")
             
             # 第四步：过滤并加入审计队列
-            print("\n[Detector] Step 4: Filtering and queueing for audit...")
+            log("\n[Detector] Step 4: Filtering and queueing for audit...")
             for token_info in all_tokens:
                 # 已知 token（从 Redis 匹配）可以放宽阈值
                 is_known = token_info.get('known_token', False)
                 
                 if is_known:
                     # 已知 token，直接通过（降低阈值或跳过检查）
-                    print(f"[Detector] ✓ ${token_info['symbol']} is a known token, fast-tracking to audit")
+                    log(f"[Detector] ✓ ${token_info['symbol']} is a known token, fast-tracking to audit")
                 else:
                     # 新 token，需要检查阈值
                     confidence = token_info.get('confidence', 0)
                     context_score = token_info.get('context_score', 0)
                     
                     if (confidence < self.min_confidence and context_score < self.min_context_score):
-                        print(f"[Detector] Skipping ${token_info['symbol']} (below threshold: "
-                              f"confidence={confidence:.2f}, context={context_score:.2f})")
+                        log(f"[Detector] Skipping ${token_info['symbol']} (below threshold: "
+                            f"confidence={confidence:.2f}, context={context_score:.2f})")
                         continue
                 
                 # 不再检查是否已处理，每次都处理
@@ -282,7 +400,7 @@ class RealtimeCADetector:
                 #     continue
                 
                 # 加入审计队列
-                self.stats['tokens_extracted'] += 1
+                self._count('tokens_extracted')
                 
                 audit_task = {
                     'token': token_info['symbol'],
@@ -298,12 +416,14 @@ class RealtimeCADetector:
                 }
                 
                 self.audit_queue.put(audit_task)
-                print(f"[Detector] Added ${token_info['symbol']} to audit queue")
+                log(f"[Detector] Added ${token_info['symbol']} to audit queue")
             
         except Exception as e:
-            print(f"[Detector] Error processing tweet: {e}")
             import traceback
-            traceback.print_exc()
+            log(f"[Detector] Error processing tweet: {e}")
+            log(traceback.format_exc().rstrip())
+        finally:
+            print("\n".join(lines), flush=True)
     
     def audit_worker(self):
         """审计工作线程"""
@@ -337,10 +457,10 @@ class RealtimeCADetector:
                 
                 # 保存结果
                 self.results.append(audit_result)
-                self.stats['tokens_audited'] += 1
+                self._count('tokens_audited')
                 
                 if audit_result.get('contracts'):
-                    self.stats['contracts_found'] += len(audit_result['contracts'])
+                    self._count('contracts_found', len(audit_result['contracts']))
                 
                 # 保存到文件
                 if self.output_file:
@@ -449,6 +569,12 @@ class RealtimeCADetector:
         self.audit_thread.daemon = True
         self.audit_thread.start()
         
+        # 启动推文分析工作线程
+        for _ in range(self.analysis_thread_count):
+            analysis_thread = threading.Thread(target=self.analysis_worker, daemon=True)
+            analysis_thread.start()
+            self.analysis_threads.append(analysis_thread)
+        
         # 启动Twitter监听器
         self.listener.start(initial_users=users_to_monitor, daemon=False)
         
@@ -481,6 +607,10 @@ class RealtimeCADetector:
         # 停止监听器
         self.listener.stop()
         
+        # 等待已收到的推文分析完成
+        print("[Detector] Waiting for tweet queue to finish...")
+        self.tweet_queue.join()
+        
         # 等待审计队列完成
         print("[Detector] Waiting for audit queue to finish...")
         self.audit_queue.join()
@@ -489,6 +619,12 @@ class RealtimeCADetector:
         self.running = False
         if self.audit_thread:
             self.audit_thread.join(timeout=5)
+        for analysis_thread in self.analysis_threads:
+            analysis_thread.join(timeout=5)
+        
+        # 停止 Redis 变更流订阅和 BERT 微批处理线程
+        self.redis_matcher.close()
+        self.analyzer.close()
         
         # 打印最终统计
         self.print_stats()
@@ -500,11 +636,55 @@ class RealtimeCADetector:
         print("\n" + "="*70)
         print("[Detector] Statistics")
         print("="*70)
-        print(f"Tweets Received: {self.stats['tweets_received']}")
+        print(f"Tweets Received: {self.stats['tweets_received']} (dropped: {self.stats['tweets_dropped']})")
         print(f"Tokens Extracted: {self.stats['tokens_extracted']}")
         print(f"Tokens Audited: {self.stats['tokens_audited']}")
         print(f"Contracts Found: {self.stats['contracts_found']}")
         print(f"Queue Size: {self.audit_queue.qsize()}")
+        print(f"Tweet Queue Size: {self.tweet_queue.qsize()}")
+        
+        model_status = self.analyzer.get_model_status()
+        if model_status['state'] == 'ready':
+            print(f"BERT Model: ready ({model_status['backend']}, load: {model_status['load_seconds']}s, "
+                  f"warmup: {model_status['warmup_seconds']}s, since {model_status['ready_at']}, "
+                  f"pattern-only tweets before ready: {model_status['pattern_only_tweets']})")
+        elif model_status['state'] != 'disabled':
+            print(f"BERT Model: {model_status['state']} "
+                  f"(pattern-only tweets so far: {model_status['pattern_only_tweets']})")
+        
+        batch_stats = self.analyzer.get_ner_batch_stats()
+        if batch_stats:
+            print(f"NER Batches: {batch_stats['batches']} "
+                  f"(avg size: {batch_stats['avg_batch_size']}, "
+                  f"avg wait: {batch_stats['avg_queue_wait_ms']}ms, "
+                  f"avg inference: {batch_stats['avg_batch_process_ms']}ms)")
+            print(f"NER Batch Size Histogram: {batch_stats['batch_size_histogram']}")
+        
+        pool_stats = self.analyzer.get_ner_pool_stats()
+        if pool_stats:
+            print(f"NER Workers: {pool_stats['workers']} process(es) "
+                  f"(completed: {pool_stats['completed']}, failed: {pool_stats['failed']}, "
+                  f"pending: {pool_stats['pending']}, avg roundtrip: {pool_stats['avg_roundtrip_ms']}ms)")
+        
+        gate_stats = self.analyzer.get_ner_gate_stats()
+        if gate_stats:
+            print(f"NER Cascade: ran {gate_stats['ner_runs']}, skipped {gate_stats['ner_skipped']} "
+                  f"({gate_stats['ner_saved_ratio']:.1%} saved, decisions: {gate_stats['decisions']})")
+            print(f"NER Cascade Stage Hits: {gate_stats['stage_hits']}")
+        
+        service_stats = self.analyzer.get_ner_service_stats()
+        if service_stats:
+            print(f"NER Service: {service_stats['address']} "
+                  f"({'available' if service_stats['available'] else 'unavailable'}, "
+                  f"requests: {service_stats['requests']}, failures: {service_stats['failures']}, "
+                  f"timeouts: {service_stats['timeouts']})")
+        
+        cache_stats = self.analyzer.get_ner_cache_stats()
+        if cache_stats:
+            print(f"NER Cache: {cache_stats['hit_rate']:.1%} hit rate "
+                  f"(local hits: {cache_stats['local_hits']}, redis hits: {cache_stats['redis_hits']}, "
+                  f"misses: {cache_stats['misses']}, entries: {cache_stats['entries']}, "
+                  f"evictions: {cache_stats['evictions']})")
         print("="*70 + "\n")
 
 
@@ -555,6 +735,34 @@ Examples:
                        help='WebSocket ping interval in seconds (default: 30)')
     parser.add_argument('--ping-timeout', type=float, default=10.0,
                        help='WebSocket ping timeout in seconds (default: 10)')
+    parser.add_argument('--ner-batch-size', type=int, default=8,
+                       help='Max concurrent BERT requests merged into one batch, capped at --analysis-threads '
+                            '(a single analysis thread never batches; 1 = no batching, default: 8)')
+    parser.add_argument('--ner-batch-wait-ms', type=float, default=10.0,
+                       help='Max time the oldest BERT request waits for a batch to fill (default: 10)')
+    parser.add_argument('--ner-backend', choices=['pytorch', 'onnx'], default='pytorch',
+                       help='BERT inference backend; onnx exports an int8-quantized model on first use (default: pytorch)')
+    parser.add_argument('--ner-cascade', action='store_true',
+                       help='Only run BERT when keyword density passes --ner-min-context or cheap stages '
+                            '(cashtags, known tokens, Twitter symbols) found something')
+    parser.add_argument('--ner-min-context', type=float, default=0.1,
+                       help='Keyword density that always triggers BERT under --ner-cascade (default: 0.1)')
+    parser.add_argument('--ner-cache-size', type=int, default=10000,
+                       help='Texts kept in the BERT result cache (0 = no cache, default: 10000)')
+    parser.add_argument('--ner-cache-ttl', type=float, default=3600.0,
+                       help='BERT result cache TTL in seconds (default: 3600)')
+    parser.add_argument('--share-ner-cache', action='store_true',
+                       help='Share the BERT result cache with other detector processes via Redis')
+    parser.add_argument('--ner-workers', type=int, default=0,
+                       help='BERT inference worker processes, each loading its own copy of the model '
+                            '(0 = in-process, default: 0)')
+    parser.add_argument('--analysis-threads', type=int, default=None,
+                       help='Threads analysing queued tweets (default: --ner-workers, at least 1)')
+    parser.add_argument('--tweet-queue-size', type=int, default=1000,
+                       help='Max tweets waiting for analysis; the oldest are dropped when full (default: 1000)')
+    parser.add_argument('--ner-service', type=str, default=None,
+                       help='Use a shared NER service (extractor/ner_service.py) at this Unix socket path or '
+                            'host:port instead of loading the model; falls back to patterns while it is down')
     
     args = parser.parse_args()
     
@@ -574,7 +782,18 @@ Examples:
         auto_reconnect=not args.no_reconnect,
         max_reconnect_attempts=args.max_reconnect,
         ping_interval=args.ping_interval,
-        ping_timeout=args.ping_timeout
+        ping_timeout=args.ping_timeout,
+        ner_batch_size=args.ner_batch_size,
+        ner_batch_wait_ms=args.ner_batch_wait_ms,
+        ner_backend=args.ner_backend,
+        ner_min_context=args.ner_min_context if args.ner_cascade else None,
+        ner_cache_size=args.ner_cache_size,
+        ner_cache_ttl=args.ner_cache_ttl,
+        share_ner_cache=args.share_ner_cache,
+        ner_workers=args.ner_workers,
+        analysis_threads=args.analysis_threads or max(1, args.ner_workers),
+        ner_service=args.ner_service,
+        tweet_queue_size=args.tweet_queue_size
     )
     
     # 启动检测器
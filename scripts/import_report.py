@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入口模块导入耗时报告
+在独立的子进程中用 python -X importtime 导入每个入口模块，汇总导入总耗时、最慢的模块，
+以及是否加载了重量级的机器学习库（torch / transformers / spaCy ...）。
+这些库应当在真正请求模型时才导入，--no-bert --no-ai 启动时不应出现在报告里
+
+用法:
+    python scripts/import_report.py                        # 所有入口
+    python scripts/import_report.py --entry realtime_ca_detector --top 20
+    python scripts/import_report.py --check                # 有入口导入失败或在导入时加载了重量级库则返回非零
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTRACTOR_DIR = os.path.join(PROJECT_ROOT, 'extractor')
+
+# 入口名 -> (所在目录, 模块名)
+ENTRY_POINTS = {
+    'realtime_ca_detector': (PROJECT_ROOT, 'realtime_ca_detector'),
+    'ws_server': (PROJECT_ROOT, 'ws_server'),
+    'realtime_bert_analyzer': (EXTRACTOR_DIR, 'realtime_bert_analyzer'),
+    'ner_service': (EXTRACTOR_DIR, 'ner_service'),
+    'bert_extractor': (EXTRACTOR_DIR, 'bert_extractor'),
+    'spacy_ner_extractor': (EXTRACTOR_DIR, 'spacy_ner_extractor'),
+    'tfidf_extractor': (EXTRACTOR_DIR, 'tfidf_extractor'),
+    'keyword_extractor': (EXTRACTOR_DIR, 'keyword_extractor'),
+    'regex_extractor': (EXTRACTOR_DIR, 'regex_extractor'),
+    'rule_based_extractor': (EXTRACTOR_DIR, 'rule_based_extractor'),
+    'run_extractors': (EXTRACTOR_DIR, 'run_extractors'),
+}
+
+# 只应在请求模型时才导入的库
+HEAVY_MODULES = ('torch', 'transformers', 'optimum', 'onnxruntime', 'spacy', 'thinc', 'sklearn', 'tensorflow')
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def measure_entry(directory: str, module: str) -> Dict:
+    """
+    在子进程中导入一个入口模块并解析 -X importtime 输出
+
+    Args:
+        directory: 入口所在目录（作为工作目录和 sys.path[0]）
+        module: 模块名
+
+    Returns:
+        {total_ms, modules: [(模块, 自身 us, 累计 us)], heavy: [...], error}
+    """
+    code = f'import sys; sys.path.insert(0, {directory!r}); import {module}'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=directory,
+                             capture_output=True, text=True)
+
+    modules = []
+    total_us = 0
+    error_lines = []
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            if not line.startswith('import time:'):
+                error_lines.append(line)
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules.append((name, self_us, cumulative_us))
+        if len(indent) <= 1:  # 顶层导入（嵌套导入的缩进更深）
+            total_us += cumulative_us
+
+    loaded = {name.split('.')[0] for name, _, _ in modules}
+    return {
+        'total_ms': total_us / 1000,
+        'modules': modules,
+        'heavy': [name for name in HEAVY_MODULES if name in loaded],
+        'error': ((error_lines[-1] if error_lines else f'exit code {process.returncode}')
+                  if process.returncode != 0 else None),
+    }
+
+
+def print_report(name: str, result: Dict, top: int):
+    """打印一个入口的报告"""
+    print(f"\n{name}: {result['total_ms']:.1f} ms, {len(result['modules'])} modules")
+    if result['error']:
+        print(f"  import failed: {result['error']}")
+    print(f"  heavy ML imports: {', '.join(result['heavy']) if result['heavy'] else 'none'}")
+    slowest = sorted(result['modules'], key=lambda m: -m[1])[:top]
+    for module, self_us, cumulative_us in slowest:
+        print(f"  {self_us / 1000:>8.1f} ms self {cumulative_us / 1000:>9.1f} ms cumulative  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time report for each entry point')
+    parser.add_argument('--entry', action='append', choices=sorted(ENTRY_POINTS),
+                        help='只报告指定入口（可重复，默认全部）')
+    parser.add_argument('--top', type=int, default=10, help='每个入口列出自身耗时最长的多少个模块（默认 10）')
+    parser.add_argument('--check', action='store_true', help='有入口导入失败或在导入时加载了重量级库则返回非零')
+    args = parser.parse_args()
+
+    results: Dict[str, Dict] = {}
+    for name in args.entry or list(ENTRY_POINTS):
+        directory, module = ENTRY_POINTS[name]
+        results[name] = measure_entry(directory, module)
+        print_report(name, results[name], args.top)
+
+    print("\n" + "=" * 70)
+    print(f"{'Entry point':<26}{'Import(ms)':>12}  Heavy ML imports")
+    print("=" * 70)
+    offenders: List[str] = []
+    failed: List[str] = []
+    for name, result in results.items():
+        status = 'import failed' if result['error'] else (', '.join(result['heavy']) or '-')
+        print(f"{name:<26}{result['total_ms']:>12.1f}  {status}")
+        if result['error']:
+            failed.append(name)
+        if result['heavy']:
+            offenders.append(name)
+    print("=" * 70)
+
+    # 导入失败的入口没有跑完整个模块，报告里“没有重量级库”不代表它真的干净
+    for name in failed:
+        print(f"Import failed, heavy-import check incomplete: {name}: {results[name]['error']}")
+    if offenders:
+        print(f"Heavy ML libraries imported at module load by: {', '.join(offenders)}")
+
+    if args.check and (offenders or failed):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：extractor 内部使用平铺导入（from utils import ...），把目录加入 sys.path"""
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'extractor'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'monitor'))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""微批处理测试：已知的调用方都在排队时立即推理，不等到 max_wait_ms"""
+
+import threading
+import time
+
+from ner_batcher import MicroBatcher
+
+
+def test_single_caller_does_not_wait_for_the_deadline():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=500, max_concurrency=1)
+    start = time.monotonic()
+    for i in range(5):
+        assert batcher(i) == i
+    elapsed = time.monotonic() - start
+    batcher.close()
+    assert elapsed < 0.5
+
+
+def test_batch_flushes_once_every_caller_is_queued():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=500, max_concurrency=4)
+    barrier = threading.Barrier(4)
+
+    def caller(i):
+        barrier.wait()
+        assert batcher(i) == i
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(4)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    stats = batcher.get_stats()
+    batcher.close()
+
+    assert elapsed < 0.5
+    assert stats['items'] == 4
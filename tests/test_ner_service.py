@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""NER 推理服务测试：用假 pipeline 在 Unix socket 上起服务（模型和后端握手、缓存命名空间、超时与连接失败的区分）"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from ner_cache import NERCache
+from ner_service import NERService, NERServiceClient, NERServiceUnavailable
+
+
+def fake_pipeline(texts, batch_size=1):
+    if 'slow' in texts:
+        time.sleep(1)
+    return [[{'word': text.split()[0], 'entity_group': 'ORG', 'score': 0.9, 'start': 0, 'end': 1}]
+            for text in texts]
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = NERService(fake_pipeline, f'unix:{tmp_path}/ner.sock', model_name='dslim/bert-base-NER',
+                         backend='ONNX int8, CPU')
+    thread = threading.Thread(target=service.server.serve_forever, daemon=True)
+    thread.start()
+    yield service
+    service.server.shutdown()
+    service.close()
+
+
+def test_client_learns_service_model_and_backend(service):
+    client = NERServiceClient(service.address)
+    assert client.namespace is None  # 连接前不知道服务端加载了什么
+
+    assert client('PEPE to the moon')[0]['word'] == 'PEPE'
+    assert client.namespace == 'dslim/bert-base-NER:ONNX int8, CPU'
+    assert client.get_stats()['backend'] == 'ONNX int8, CPU'
+    client.close()
+
+
+def test_cache_entries_are_separated_by_namespace():
+    cache = NERCache(max_entries=10, ttl_seconds=60, namespace='model:PyTorch, CPU')
+    cache.put('PEPE to the moon', [{'word': 'PEPE'}], 'model:ONNX int8, CPU')
+
+    assert cache.get('PEPE to the moon', 'model:ONNX int8, CPU') == [{'word': 'PEPE'}]
+    assert cache.get('PEPE to the moon', 'model:PyTorch, CPU') is None
+    assert cache.get('PEPE to the moon') is None
+
+
+def test_slow_response_fails_only_that_request(service):
+    client = NERServiceClient(service.address, timeout=0.3)
+    with pytest.raises(TimeoutError):
+        client('slow')
+    assert client.get_stats()['available']
+    assert client.get_stats()['timeouts'] == 1
+
+    time.sleep(1)
+    assert client('WIF again')[0]['word'] == 'WIF'
+    client.close()
+
+
+def test_refused_connection_marks_service_down(tmp_path):
+    client = NERServiceClient(f'unix:{tmp_path}/missing.sock', retry_interval=60)
+    with pytest.raises(NERServiceUnavailable):
+        client('PEPE')
+    assert not client.get_stats()['available']
+
+
+def test_second_service_does_not_take_over_a_live_socket(service):
+    with pytest.raises(RuntimeError):
+        NERService(fake_pipeline, service.address)
+
+    client = NERServiceClient(service.address)
+    assert client('PEPE still here')[0]['word'] == 'PEPE'
+    client.close()
+
+
+def test_stale_socket_file_is_replaced(tmp_path):
+    path = tmp_path / 'ner.sock'
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()  # 文件还在，但没有进程监听
+    assert path.exists()
+
+    service = NERService(fake_pipeline, f'unix:{path}')
+    service.close()
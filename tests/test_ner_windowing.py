@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""长文本窗口测试：分词器没有设置上限（int(1e30) 哨兵值）时按模型位置编码长度切窗口，offset 指回原文"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from onnx_ner import NER_MAX_WINDOW, configure_windowing, ner_window_length
+
+SENTINEL = int(1e30)
+
+
+def test_sentinel_max_length_is_clamped_to_position_embeddings():
+    tokenizer = SimpleNamespace(model_max_length=SENTINEL)
+
+    stride = configure_windowing(tokenizer, SimpleNamespace(max_position_embeddings=128), stride=128)
+    assert tokenizer.model_max_length == 128
+    assert stride == 64  # stride 必须小于窗口长度
+
+    tokenizer = SimpleNamespace(model_max_length=SENTINEL)
+    assert ner_window_length(tokenizer, SimpleNamespace(max_position_embeddings=514)) == NER_MAX_WINDOW
+    assert ner_window_length(tokenizer, SimpleNamespace()) == NER_MAX_WINDOW
+    assert ner_window_length(SimpleNamespace(model_max_length=256), SimpleNamespace(max_position_embeddings=512)) == 256
+
+
+def test_long_text_is_split_and_offsets_point_into_the_original_text(tmp_path):
+    transformers = pytest.importorskip('transformers')
+
+    words = ['pepe', 'to', 'the', 'moon', 'buy', 'now', 'wif', 'bonk']
+    vocab = tmp_path / 'vocab.txt'
+    vocab.write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words) + '\n')
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(vocab))
+    assert tokenizer.model_max_length > 10 ** 20  # 没有设置上限
+
+    text = ' '.join(words[i % len(words)] for i in range(200))
+    stride = configure_windowing(tokenizer, SimpleNamespace(max_position_embeddings=32), stride=8)
+
+    # 与 TokenClassificationPipeline 预处理时的调用相同
+    encoded = tokenizer(text, truncation=True, return_overflowing_tokens=True, stride=stride,
+                        return_offsets_mapping=True, return_special_tokens_mask=True)
+    windows = encoded['input_ids']
+    assert len(windows) > 1
+    assert all(len(window) <= 32 for window in windows)
+
+    for offsets, special in zip(encoded['offset_mapping'], encoded['special_tokens_mask']):
+        for (start, end), is_special in zip(offsets, special):
+            if not is_special:
+                assert text[start:end] in words
+    last_end = max(end for start, end in encoded['offset_mapping'][-1])
+    assert last_end == len(text)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""NER 推理进程池测试：子进程自行加载假模型，进程池损坏后重建，调用有超时"""
+
+import os
+import signal
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from ner_workers import NERProcessPool
+
+
+def fake_pipeline(text):
+    if text == 'sleep':
+        time.sleep(5)
+    return [{'word': text.split()[0], 'entity_group': 'ORG', 'score': 0.9}]
+
+
+def fake_loader():
+    return fake_pipeline, 'fake, CPU'
+
+
+@pytest.fixture
+def pool():
+    pool = NERProcessPool(fake_loader, workers=1, warmup_text='warmup text', restart_interval=0.0)
+    yield pool
+    pool.close()
+
+
+def test_workers_load_the_model_themselves(pool):
+    assert pool.start(timeout=60) == 'fake, CPU'
+    assert pool('PEPE to the moon')[0]['word'] == 'PEPE'
+
+
+def test_pool_is_rebuilt_after_a_worker_dies(pool):
+    pool.start(timeout=60)
+    for pid in list(pool.executor._processes):
+        os.kill(pid, signal.SIGKILL)
+    time.sleep(0.5)
+
+    assert pool('WIF again', timeout=60)[0]['word'] == 'WIF'
+    assert pool.get_stats()['restarts'] == 1
+
+
+def test_call_times_out(pool):
+    pool.start(timeout=60)
+    with pytest.raises(TimeoutError):
+        pool('sleep', timeout=0.2)
+    assert pool.get_stats()['timeouts'] == 1
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""RedisTokenMatcher 回归测试（fakeredis）"""
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from redis_token_matcher import RedisTokenMatcher
+
+
+PADDING = ' filler' * 12  # 让两处出现的上下文窗口（前后 50 字符）互不重叠
+
+
+def make_matcher(*token_keys):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    for token_key in token_keys:
+        symbol, name = token_key.split(':', 1)
+        client.sadd('nlpmeme:tokens:all', token_key)
+        client.hset(f'nlpmeme:token:{token_key}', mapping={'name': name, 'symbol': symbol})
+    return RedisTokenMatcher(redis_client=client, subscribe_changes=False, snapshot_path=None)
+
+
+def word_matches(matcher, text):
+    return [t for t in matcher.match_tokens_in_text(text, auto_refresh=False) if t['match_type'] == 'word']
+
+
+@pytest.mark.parametrize('text', [
+    'BNB is here.' + PADDING + ' buy BNB token pump now',
+    'buy BNB token pump now.' + PADDING + ' BNB is here.',
+])
+def test_word_symbol_scored_at_best_occurrence(text):
+    # 同一符号多次出现时取上下文最好的一处，与出现顺序无关，且只报告一次
+    matches = word_matches(make_matcher('BNB:bnb'), text)
+    assert len(matches) == 1
+    assert matches[0]['context_score'] == 1.0
+    assert matches[0]['confidence'] == pytest.approx(0.9)
+
+
+def test_word_symbol_without_context_at_any_occurrence_is_skipped():
+    matches = word_matches(make_matcher('BNB:bnb'), 'BNB is here.' + PADDING + ' BNB again')
+    assert matches == []
+
+
+def test_substring_inside_other_text_does_not_lend_its_context():
+    # 原实现按第一个不区分大小写的子串位置打分（这里是中文里的 "够BNB冲"，并不是独立单词），
+    # 会把那里的关键词算到结尾的 #BNB 上；现在只按真正匹配到的出现位置打分
+    text = '买入代币交易不够BNB冲狗吗' + PADDING + ' #BNB'
+    assert word_matches(make_matcher('BNB:bnb'), text) == []
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""token 变更流测试：写入方发布的事件在匹配器下一次全量刷新后仍然保留（fakeredis）"""
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+import config
+from redis_token_matcher import RedisTokenMatcher
+
+
+def make_matcher(client):
+    return RedisTokenMatcher(
+        redis_client=client,
+        redis_set_key=config.REDIS_SET_KEY,
+        redis_key_prefix=config.REDIS_KEY_PREFIX,
+        redis_stream_key=config.REDIS_CHANGES_STREAM,
+        subscribe_changes=False,
+        snapshot_path=None,
+    )
+
+
+def apply_stream(matcher, client):
+    # 与变更流消费线程相同的处理，只是同步执行
+    for message_id, fields in client.xrange(config.REDIS_CHANGES_STREAM, min='(' + matcher.last_change_id):
+        matcher._apply_change(fields)
+        matcher.last_change_id = message_id
+
+
+def matched_symbols(matcher, text):
+    return {t['symbol'] for t in matcher.match_tokens_in_text(text, auto_refresh=False)}
+
+
+def test_monitor_namespace_matches_matcher_defaults():
+    matcher = RedisTokenMatcher.__init__.__defaults__
+    assert config.REDIS_SET_KEY in matcher
+    assert config.REDIS_KEY_PREFIX in matcher
+    assert config.REDIS_CHANGES_STREAM in matcher
+
+
+def test_manually_added_token_survives_full_refresh(monkeypatch, tmp_path):
+    import add_token_manual
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(add_token_manual.redis, 'Redis', lambda **kwargs: client)
+    monkeypatch.chdir(tmp_path)  # add_token 同时追加 CSV
+
+    matcher = make_matcher(client)
+    assert add_token_manual.add_token('KITTY', 'kitty', '2025-10-31T00:00:00')
+
+    apply_stream(matcher, client)
+    assert 'KITTY' in matched_symbols(matcher, 'just aped $KITTY')
+
+    assert matcher._refresh_cache()
+    assert 'KITTY' in matched_symbols(matcher, 'just aped $KITTY')
+
+
+def test_monitor_saved_token_survives_full_refresh(tmp_path):
+    pytest.importorskip('aiohttp')
+    import logging
+    from collections import deque
+
+    from token_monitor import TokenMonitor
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monitor = TokenMonitor.__new__(TokenMonitor)  # 跳过日志 / 信号处理 / 连接检查
+    monitor.redis_client = client
+    monitor.csv_file = str(tmp_path / 'tokens.csv')
+    monitor.seen_tokens = set()
+    monitor.token_cache = deque(maxlen=100)
+    monitor.stats = {'total_saved': 0, 'total_duplicates': 0}
+    monitor.logger = logging.getLogger('test_token_monitor')
+
+    matcher = make_matcher(client)
+    monitor._save_tokens([('DOGGO', 'doggo')])
+
+    apply_stream(matcher, client)
+    assert 'DOGGO' in matched_symbols(matcher, 'buy $DOGGO')
+
+    assert matcher._refresh_cache()
+    assert 'DOGGO' in matched_symbols(matcher, 'buy $DOGGO')
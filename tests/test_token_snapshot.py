@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""索引磁盘快照测试：记录来源并拒绝其他注册表的快照、并发保存不会写坏文件、批量回溯同步加载"""
+
+import os
+import threading
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from redis_token_matcher import RedisTokenMatcher
+from token_index import TokenIndex
+
+SOURCE = {'redis': '127.0.0.1:6379/0', 'set_key': 'nlpmeme:tokens:all', 'key_prefix': 'nlpmeme:token:'}
+
+
+def test_snapshot_from_another_registry_is_rejected(tmp_path):
+    path = str(tmp_path / 'index.snapshot')
+    TokenIndex(['PEPE']).save_snapshot(path, SOURCE)
+
+    assert 'PEPE' in TokenIndex.load_snapshot(path, SOURCE)
+    with pytest.raises(ValueError):
+        TokenIndex.load_snapshot(path, dict(SOURCE, key_prefix='other:token:'))
+
+
+def test_concurrent_saves_do_not_tear_the_snapshot(tmp_path):
+    path = str(tmp_path / 'index.snapshot')
+    indexes = [TokenIndex([f'TOKEN{i}{j}' for j in range(500)]) for i in range(4)]
+
+    def save(index):
+        for _ in range(10):
+            index.save_snapshot(path, SOURCE)
+
+    threads = [threading.Thread(target=save, args=(index,)) for index in indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    loaded = TokenIndex.load_snapshot(path, SOURCE)
+    assert any(set(loaded.symbols) == set(index.symbols) for index in indexes)
+    assert os.listdir(tmp_path) == ['index.snapshot']
+
+
+def test_batch_matcher_loads_from_redis_instead_of_a_stale_snapshot(tmp_path):
+    path = str(tmp_path / 'index.snapshot')
+    client = fakeredis.FakeRedis(decode_responses=True)
+    client.sadd('nlpmeme:tokens:all', 'WIF:dogwifhat')
+
+    stale = RedisTokenMatcher(redis_client=client, subscribe_changes=False, snapshot_path=None)
+    TokenIndex(['OLD']).save_snapshot(path, stale._snapshot_source())
+
+    matcher = RedisTokenMatcher(redis_client=client, subscribe_changes=False, snapshot_path=path,
+                                background_refresh=False)
+    assert matcher.index.source == 'redis'
+    assert 'WIF' in matcher.index and 'OLD' not in matcher.index
+
+
+class UnreachableRedis:
+    def ping(self):
+        raise ConnectionError('Connection refused')
+
+
+def test_batch_matcher_falls_back_to_snapshot_when_redis_is_down(tmp_path, capsys):
+    path = str(tmp_path / 'index.snapshot')
+    matcher = RedisTokenMatcher(redis_client=UnreachableRedis(), subscribe_changes=False, snapshot_path=None)
+    TokenIndex(['OLD']).save_snapshot(path, matcher._snapshot_source())
+
+    matcher = RedisTokenMatcher(redis_client=UnreachableRedis(), subscribe_changes=False, snapshot_path=path,
+                                background_refresh=False)
+    assert 'OLD' in matcher.index
+    assert 'Redis unavailable' in capsys.readouterr().out